@@ -0,0 +1,87 @@
+import csv
+import json
+from typing import Any, AsyncIterator, List, Tuple
+
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = []
+
+    def add_error(self, row: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(BulkRowError(row=row, error=error))
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[bytes]:
+    tail = b''
+    async for chunk in request.stream():
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r')
+    if tail:
+        yield tail.rstrip(b'\r')
+
+
+async def iter_records(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+        Построчно читает тело запроса в формате NDJSON (по умолчанию) или CSV
+        (Content-Type: text/csv, первая строка - заголовок). Пустые ячейки CSV -> None.
+        Возвращает (номер строки с 1, запись или исключение разбора).
+    """
+    is_csv = request.headers.get('content-type', '').startswith('text/csv')
+    header = None
+    row = 0
+    async for raw in _iter_lines(request):
+        if not raw.strip():
+            continue
+        if is_csv and header is None:
+            header = next(csv.reader([raw.decode('utf-8-sig')]))
+            continue
+        row += 1
+        try:
+            line = raw.decode('utf-8')
+            if is_csv:
+                values = next(csv.reader([line]))
+                if len(values) != len(header):
+                    raise ValueError(f"ожидалось {len(header)} колонок, получено {len(values)}")
+                yield row, {key: value or None for key, value in zip(header, values)}
+            else:
+                yield row, json.loads(line)
+        except ValueError as e:
+            yield row, e
+
+
+async def iter_chunks(request: Request, schema: type[BaseModel], result: BulkImportResult) -> AsyncIterator[List[Tuple[int, BaseModel]]]:
+    """
+        Валидирует записи схемой и отдаёт их пачками по CHUNK_SIZE; ошибки разбора и
+        валидации сразу попадают в отчёт.
+    """
+    chunk: List[Tuple[int, BaseModel]] = []
+    async for row, record in iter_records(request):
+        if isinstance(record, Exception):
+            result.add_error(row, f"Некорректная строка: {record}")
+            continue
+        try:
+            chunk.append((row, schema.model_validate(record)))
+        except ValidationError as e:
+            result.add_error(row, "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
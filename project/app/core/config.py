@@ -9,6 +9,48 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    # Пул соединений: на под приходится до DB_POOL_SIZE + DB_MAX_OVERFLOW соединений
+    # на процесс, сумма по всем процессам должна укладываться в max_connections Postgres
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Кэш подготовленных выражений asyncpg на соединение; 0 - для pgbouncer в transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Бюджет SQL-выражений на HTTP-запрос (см. app.core.query_budget)
+    QUERY_BUDGET: int = 20
+    QUERY_REPEAT_THRESHOLD: int = 5
+    QUERY_BUDGET_STRICT: bool = False
+    DASHBOARD_CACHE_TTL: float = 30.0
+    OCCUPANCY_RECONCILE_INTERVAL: float = 60.0
+    # Помесячные секции parking_sessions и payments (см. app.core.partitions)
+    PARTITION_MONTHS_AHEAD: int = 3
+    # 0 - хранить все секции; иначе секции старше N месяцев отсоединяются
+    PARTITION_RETENTION_MONTHS: int = 0
+    # False - только отсоединять: таблица остаётся в БД для архивации
+    PARTITION_RETENTION_DROP: bool = True
+    PARTITION_MAINTENANCE_INTERVAL: float = 3600.0
+    # Холодный архив в Parquet (см. app.modules.reports.archive): каталог общий для
+    # архиватора и всех процессов API
+    ARCHIVE_DIR: str = "archive"
+    # Архивируются закрытые сессии и платежи месяцев старше N месяцев
+    ARCHIVE_AFTER_MONTHS: int = 12
+    ARCHIVE_COMPRESSION: str = "zstd"
+    # Production-сервер (serve.py)
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    # 0 - по числу доступных процессу CPU
+    WEB_WORKERS: int = 0
+    # Дольше idle-таймаута балансировщика (обычно 60 c): иначе он отправит запрос
+    # в соединение, которое сервер уже закрывает, и клиент получит 502
+    WEB_KEEPALIVE_TIMEOUT: int = 75
+    # Сколько ждать завершения запросов в обработке после SIGTERM
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    WEB_BACKLOG: int = 2048
+    # Адреса (через запятую, допускаются подсети CIDR), чьим X-Forwarded-For/-Proto
+    # верить; '*' - любым, только если до сервера нельзя достучаться в обход прокси
+    WEB_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -20,4 +62,9 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def LISTEN_DATABASE_URL(self) -> str:
+        # DSN для прямого asyncpg-соединения (LISTEN/NOTIFY)
+        return self.DATABASE_URL.replace("postgresql+psycopg2", "postgresql")
+
 settings = Settings()
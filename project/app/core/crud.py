@@ -0,0 +1,44 @@
+from typing import Any, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import Base
+
+ModelT = TypeVar("ModelT", bound=Base)
+
+
+def changed_fields(data: BaseModel) -> dict[str, Any]:
+    """
+        Поля частичного обновления: только явно переданные и не None.
+    """
+    return data.model_dump(exclude_none=True)
+
+
+async def insert_returning(db: AsyncSession, model: Type[ModelT], values: dict[str, Any]) -> ModelT:
+    """
+        INSERT ... RETURNING всех колонок: объект приходит заполненным (id, created_at),
+        refresh после commit не нужен (expire_on_commit=False).
+    """
+    result = await db.execute(insert(model).values(**values).returning(model))
+    return result.scalar_one()
+
+
+async def update_returning(db: AsyncSession, model: Type[ModelT], object_id: int,
+                           values: dict[str, Any]) -> Optional[ModelT]:
+    """
+        Частичное обновление одним UPDATE ... WHERE id = :id RETURNING без предварительного SELECT.
+        None, если строки нет.
+    """
+    if not values:
+        return await db.get(model, object_id)
+    result = await db.execute(
+        update(model).where(model.id == object_id).values(**values).returning(model)
+        .execution_options(synchronize_session=False))
+    return result.scalar_one_or_none()
+
+
+async def delete_returning(db: AsyncSession, model: Type[ModelT], object_id: int) -> bool:
+    result = await db.execute(delete(model).where(model.id == object_id).returning(model.id))
+    return result.scalar_one_or_none() is not None
@@ -3,8 +3,20 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from .pool import MeteredPool
 
-engine = create_async_engine(settings.DATABASE_URL.replace("postgresql+psycopg2", "postgresql+asyncpg"), future=True)
+engine = create_async_engine(
+    settings.DATABASE_URL.replace("postgresql+psycopg2", "postgresql+asyncpg")
+    + f"?prepared_statement_cache_size={settings.DB_STATEMENT_CACHE_SIZE}",
+    future=True,
+    poolclass=MeteredPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 Base = declarative_base()
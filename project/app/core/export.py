@@ -0,0 +1,74 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Literal
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from app.core.db import AsyncSessionLocal
+
+EXPORT_BATCH_SIZE = 2000
+
+ExportFormat = Literal['csv', 'ndjson']
+
+
+def _json_default(value):
+    # datetime orjson пишет в ISO 8601 сам
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Не сериализуется: {type(value)}")
+
+
+async def _export_rows(query: Select, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    # Собственная сессия: генератор работает уже после выхода из обработчика запроса
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue().encode()
+        async for partition in result.partitions():
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                    for row in partition)
+                yield buffer.getvalue().encode()
+            else:
+                yield b''.join(
+                    orjson.dumps(dict(zip(columns, row)), default=_json_default) + b'\n'
+                    for row in partition)
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(query: Select, fmt: ExportFormat, name: str, gzip: bool = False) -> StreamingResponse:
+    """
+        Потоковая выгрузка результата запроса серверным курсором: в памяти держится
+        не больше одной пачки строк независимо от объёма выгрузки.
+    """
+    body = _export_rows(query, fmt)
+    media_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{name}.{fmt}"
+    if gzip:
+        body = _gzip(body)
+        media_type = 'application/gzip'
+        filename += '.gz'
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
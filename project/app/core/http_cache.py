@@ -0,0 +1,30 @@
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+        If-None-Match совпадает с текущим ETag (сравнение слабое, как требует RFC 9110 для GET).
+    """
+    header = request.headers.get('if-none-match')
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    headers = {'ETag': etag}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def set_etag(response: Response, etag: Optional[str], cache_control: Optional[str] = None) -> None:
+    if not etag:
+        return
+    response.headers['ETag'] = etag
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
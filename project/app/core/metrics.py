@@ -0,0 +1,146 @@
+"""
+    Метрики Prometheus: латентность маршрутов, запросы в обработке и время SQL-выражений
+    с меткой модуля (parking, payments, reports, ...).
+
+    При нескольких воркерах uvicorn нужно задать PROMETHEUS_MULTIPROC_DIR (пустой каталог,
+    общий для воркеров) до старта процессов: каждый воркер пишет значения в свои mmap-файлы,
+    а /metrics в любом воркере агрегирует их через MultiProcessCollector.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.responses import Response
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['module', 'method', 'route', 'status'], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'HTTP-запросы в обработке',
+    ['module'], multiprocess_mode='livesum')
+DB_STATEMENT_LATENCY = Histogram(
+    'db_statement_duration_seconds', 'Время выполнения SQL-выражения',
+    ['module', 'operation'], buckets=LATENCY_BUCKETS)
+
+# scope текущего запроса: роутер дописывает в него endpoint, по модулю которого
+# (app.modules.<module>.views) и определяется метка module
+_current_scope: ContextVar[Optional[dict]] = ContextVar('metrics_scope', default=None)
+_endpoint_modules: dict = {}
+# Префикс пути -> модуль по уже обработанным запросам: метка для gauge нужна до маршрутизации.
+# Записываются только запросы, нашедшие маршрут, и только если префикс не содержит параметров
+# шаблона - словарь ограничен числом маршрутов, сканеры и 404 его не растят
+_prefix_modules: dict = {}
+
+
+def _module_of(endpoint) -> str:
+    module = _endpoint_modules.get(endpoint)
+    if module is None:
+        parts = getattr(endpoint, '__module__', '').split('.')
+        module = parts[2] if len(parts) > 2 and parts[:2] == ['app', 'modules'] else 'core'
+        _endpoint_modules[endpoint] = module
+    return module
+
+
+def _path_prefix(path: str) -> str:
+    # /api/v1/parking-sessions/5 -> /api/v1/parking-sessions
+    return '/'.join(path.split('/', 4)[:4])
+
+
+def _static_prefix(path: str, template: str) -> Optional[str]:
+    """
+        Префикс пути, если он не попадает на параметры шаблона маршрута. Шаблон маршрута
+        из подключённого роутера - без префикса роутера (/clients/{clients_id}), поэтому
+        сегменты сопоставляются с конца пути.
+    """
+    parts = path.split('/')
+    template_parts = template.split('/')
+    offset = len(parts) - len(template_parts)
+    for index in range(min(len(parts), 4)):
+        if index >= offset and '{' in template_parts[index - offset]:
+            return None
+    return _path_prefix(path)
+
+
+def current_module() -> str:
+    scope = _current_scope.get()
+    return _module_of(scope.get('endpoint')) if scope is not None else 'background'
+
+
+class MetricsMiddleware:
+    """
+        Чистое ASGI-middleware (без BaseHTTPMiddleware): тело ответа не оборачивается.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] == '/metrics':
+            await self.app(scope, receive, send)
+            return
+        in_flight = REQUESTS_IN_FLIGHT.labels(_prefix_modules.get(_path_prefix(scope['path']), 'core'))
+        token = _current_scope.set(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            _current_scope.reset(token)
+            module = _module_of(scope.get('endpoint'))
+            # Шаблон маршрута (/clients/{clients_id}), а не сырой путь - чтобы не плодить серии
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            if route != 'unmatched':
+                prefix = _static_prefix(scope['path'], route)
+                if prefix is not None:
+                    _prefix_modules[prefix] = module
+            REQUEST_LATENCY.labels(module, scope['method'], route, status_code).observe(elapsed)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else 'UNKNOWN'
+    DB_STATEMENT_LATENCY.labels(current_module(), operation).observe(elapsed)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def metrics_response() -> Response:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    # Убирает livesum-gauge завершившегося воркера из агрегата
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Mapping, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError(cursor)
+        values = []
+        for column, value in zip(columns, payload):
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+
+def paginate(query: Select, columns: Sequence, cursor: Optional[str], limit: int, descending: bool = False) -> Select:
+    """
+        Keyset-пагинация: сортировка по columns и выборка строк строго после курсора.
+        Берём limit + 1 строку, чтобы понять, есть ли следующая страница.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        query = query.where(key < tuple_(*values) if descending else key > tuple_(*values))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows: Sequence, columns: Sequence, limit: int) -> tuple[list, Optional[str]]:
+    """
+        rows - ORM-объекты или строки Result.mappings().
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit:
+        return items, None
+    last = items[-1]
+    if isinstance(last, Mapping):
+        return items, encode_cursor([last[c.key] for c in columns])
+    return items, encode_cursor([getattr(last, c.key) for c in columns])
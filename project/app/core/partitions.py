@@ -0,0 +1,200 @@
+"""
+    Помесячные секции parking_sessions (по time_in) и payments (по time).
+
+    Секция месяца называется <таблица>_ГГГГ_ММ, строки вне существующих секций попадают
+    в <таблица>_default. Обслуживание (при старте и раз в PARTITION_MAINTENANCE_INTERVAL
+    в каждом процессе API, под advisory lock - выполняет один из них):
+    - создаёт секции на PARTITION_MONTHS_AHEAD месяцев вперёд; строки нового месяца,
+      уже попавшие в default, переносятся в его секцию;
+    - при PARTITION_RETENTION_MONTHS > 0 отсоединяет секции старше срока хранения и,
+      если PARTITION_RETENTION_DROP, удаляет их. Отсоединённая таблица сохраняет имя
+      и больше не участвует в запросах. Секции сессий с открытыми сессиями не трогаются.
+      При удалении секции сессий их id снимаются с реестра parking_session_ids; если на
+      них ещё ссылаются платежи, секция остаётся до следующего обслуживания.
+      Суточные роллапы (reports.rollups) при этом сохраняются.
+
+    python -m app.core.partitions - однократное обслуживание (например, из CronJob).
+"""
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Optional
+
+import asyncpg
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Таблица -> ключ секционирования
+PARTITIONED_TABLES = {'parking_sessions': 'time_in', 'payments': 'time'}
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$')
+# Один ключ advisory lock на обслуживание секций во всех процессах
+MAINTENANCE_LOCK = 0x70617274
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f'{table}_{month:%Y_%m}'
+
+
+def parent_table(relation: str) -> str:
+    """
+        Имя секционированной таблицы по имени секции (parking_sessions_2026_01 -> parking_sessions).
+    """
+    match = PARTITION_NAME.match(relation)
+    if match and match['table'] in PARTITIONED_TABLES:
+        return match['table']
+    if relation.endswith('_default') and relation[:-len('_default')] in PARTITIONED_TABLES:
+        return relation[:-len('_default')]
+    return relation
+
+
+async def attached_months(connection: asyncpg.Connection, table: str) -> dict[date, str]:
+    rows = await connection.fetch("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+    """, table)
+    months = {}
+    for row in rows:
+        match = PARTITION_NAME.match(row['relname'])
+        if match and match['table'] == table:
+            months[date(int(match['year']), int(match['month']), 1)] = row['relname']
+    return months
+
+
+async def create_partition(connection: asyncpg.Connection, table: str, month: date) -> str:
+    """
+        Создаёт секцию месяца. Строки этого месяца из default-секции переносятся в неё
+        в той же транзакции: иначе PostgreSQL не даст присоединить пересекающуюся секцию.
+    """
+    name = partition_name(table, month)
+    column = PARTITIONED_TABLES[table]
+    following = add_months(month, 1)
+    async with connection.transaction():
+        await connection.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+        moved = await connection.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default WHERE {column} >= $1 AND {column} < $2 RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, month, following)
+        # Индексы таблицы создаются на секции при присоединении
+        await connection.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{following}')")
+    rows = int(moved.rsplit(' ', 1)[-1])
+    if rows:
+        logger.warning("В секцию %s перенесено %d строк из %s_default", name, rows, table)
+    return name
+
+
+async def ensure_partitions(connection: asyncpg.Connection, table: str, first: date, last: date) -> list[str]:
+    """
+        Секции всех месяцев с first по last включительно; возвращает созданные.
+    """
+    existing = await attached_months(connection, table)
+    created = []
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            created.append(await create_partition(connection, table, month))
+        month = add_months(month, 1)
+    return created
+
+
+async def detach_expired(connection: asyncpg.Connection, table: str, before: date, drop: bool,
+                         empty_only: bool = False) -> list[str]:
+    """
+        Отсоединяет (и при drop удаляет) секции месяцев раньше before. С empty_only -
+        только пустые: секции, строки которых перенесены в архив (reports.archive).
+    """
+    removed = []
+    for month, name in sorted((await attached_months(connection, table)).items()):
+        if month >= before:
+            break
+        if table == 'parking_sessions' and await connection.fetchval(
+                f'SELECT EXISTS (SELECT 1 FROM {name} WHERE time_out IS NULL)'):
+            logger.warning("Секция %s не отсоединена: в ней есть открытые сессии", name)
+            continue
+        # DETACH берёт эксклюзивную блокировку таблицы: не ждать долгих запросов,
+        # секция отсоединится при следующем обслуживании
+        try:
+            async with connection.transaction():
+                await connection.execute("SET LOCAL lock_timeout = '5s'")
+                if empty_only:
+                    # Секция блокируется до проверки: строка не появится между проверкой и DETACH
+                    await connection.execute(f'LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE')
+                    if await connection.fetchval(f'SELECT EXISTS (SELECT 1 FROM {name})'):
+                        continue
+                await connection.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                if drop:
+                    if table == 'parking_sessions':
+                        # DROP не вызывает триггеры реестра; внешний ключ платежей проверяется при commit
+                        await connection.execute(f'DELETE FROM parking_session_ids WHERE id IN (SELECT id FROM {name})')
+                    await connection.execute(f'DROP TABLE {name}')
+        except asyncpg.exceptions.ForeignKeyViolationError:
+            logger.warning("Секция %s не удалена: на её сессии ссылаются платежи", name)
+            continue
+        removed.append(name)
+    return removed
+
+
+@dataclass
+class MaintenanceResult:
+    created: list = field(default_factory=list)
+    detached: list = field(default_factory=list)
+    skipped: bool = False
+
+
+async def maintain(dsn: str, today: Optional[date] = None) -> MaintenanceResult:
+    result = MaintenanceResult()
+    current = month_start(today or datetime.utcnow().date())
+    connection = await asyncpg.connect(dsn)
+    try:
+        if not await connection.fetchval('SELECT pg_try_advisory_lock($1)', MAINTENANCE_LOCK):
+            result.skipped = True
+            return result
+        try:
+            for table in PARTITIONED_TABLES:
+                result.created += await ensure_partitions(
+                    connection, table, current, add_months(current, settings.PARTITION_MONTHS_AHEAD))
+            if settings.PARTITION_RETENTION_MONTHS > 0:
+                # Платежи - раньше сессий: иначе платежи того же месяца не дадут удалить его сессии
+                for table in sorted(PARTITIONED_TABLES, key=lambda table: table != 'payments'):
+                    result.detached += await detach_expired(
+                        connection, table, add_months(current, -settings.PARTITION_RETENTION_MONTHS),
+                        settings.PARTITION_RETENTION_DROP)
+        finally:
+            await connection.execute('SELECT pg_advisory_unlock($1)', MAINTENANCE_LOCK)
+    finally:
+        await connection.close()
+    if result.created or result.detached:
+        logger.info("Секции: созданы %s, отсоединены %s", result.created, result.detached)
+    return result
+
+
+async def maintain_forever(dsn: str, interval: float) -> None:
+    while True:
+        try:
+            await maintain(dsn)
+        except Exception:
+            logger.exception("Ошибка обслуживания секций")
+        await asyncio.sleep(interval)
+
+
+if __name__ == '__main__':
+    outcome = asyncio.run(maintain(settings.LISTEN_DATABASE_URL))
+    if outcome.skipped:
+        print("Обслуживание выполняет другой процесс")
+    else:
+        print(f"создано: {', '.join(outcome.created) or '-'}; отсоединено: {', '.join(outcome.detached) or '-'}")
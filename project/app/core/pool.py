@@ -0,0 +1,70 @@
+import bisect
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .config import settings
+
+# Границы корзин гистограммы ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolWaitHistogram:
+    """
+        Время получения соединения из пула: ожидание свободного соединения
+        и, при росте пула, установка нового.
+    """
+
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.timeouts = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        # Накопительные счётчики, как в гистограммах Prometheus
+        cumulative, running = {}, 0
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            running += count
+            cumulative[bound] = running
+        return {
+            'count': running,
+            'sum': round(self.total, 6),
+            'timeouts': self.timeouts,
+            'buckets': cumulative,
+        }
+
+
+pool_wait = PoolWaitHistogram()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """
+        QueuePool, замеряющий время выдачи соединения в pool_wait.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_wait.timeouts += 1
+            raise
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+
+def pool_stats(pool: MeteredPool) -> dict:
+    return {
+        'size': pool.size(),
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'wait': pool_wait.snapshot(),
+    }
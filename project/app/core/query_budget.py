@@ -0,0 +1,128 @@
+"""
+    Бюджет SQL-запросов на HTTP-запрос.
+
+    Middleware считает выражения и время в БД за запрос, добавляет заголовок Server-Timing,
+    пишет в лог запросы сверх бюджета и повторы одного и того же SQL (признак N+1 из-за
+    ленивой загрузки relationship). Бюджет по умолчанию - QUERY_BUDGET, для отдельного
+    эндпоинта объявляется декоратором @query_budget(n); @query_budget(None) снимает проверки
+    (массовая загрузка, где число выражений растёт с размером тела).
+
+    В тестовом режиме (QUERY_BUDGET_STRICT=true) выражение сверх бюджета не выполняется:
+    поднимается QueryBudgetExceeded, и запрос завершается ошибкой.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(statements: Optional[int]):
+    """
+        Объявляет бюджет SQL-выражений для эндпоинта. Ставится под декоратором роутера.
+    """
+    def decorator(endpoint):
+        endpoint.__query_budget__ = statements
+        return endpoint
+    return decorator
+
+
+@dataclass
+class RequestQueries:
+    scope: dict
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    @property
+    def budget(self) -> Optional[int]:
+        return getattr(self.scope.get('endpoint'), '__query_budget__', settings.QUERY_BUDGET)
+
+    def over_budget(self) -> bool:
+        budget = self.budget
+        return budget is not None and self.count > budget
+
+    def repeated(self) -> list:
+        if self.budget is None:
+            return []
+        return [(sql, n) for sql, n in self.statements.items() if n >= settings.QUERY_REPEAT_THRESHOLD]
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar('request_queries', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if queries is None:
+        return
+    queries.count += 1
+    queries.statements[statement] += 1
+    if settings.QUERY_BUDGET_STRICT and queries.over_budget():
+        raise QueryBudgetExceeded(
+            f"{queries.scope['method']} {queries.scope['path']}: "
+            f"выражение #{queries.count} при бюджете {queries.budget}: {statement[:200]}")
+    context._budget_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if queries is not None:
+        queries.duration += time.perf_counter() - context._budget_started
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class QueryBudgetMiddleware:
+    """
+        Server-Timing: db - число выражений и время в БД до начала ответа, app - время обработчика.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries(scope)
+        token = _current.set(queries)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', (
+                    f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries", '
+                    f'app;dur={(time.perf_counter() - started) * 1000:.1f}'))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(scope, queries)
+
+    @staticmethod
+    def _report(scope: dict, queries: RequestQueries) -> None:
+        if queries.over_budget():
+            logger.warning("%s %s: %d SQL-выражений при бюджете %d (%.1f мс в БД)",
+                           scope['method'], scope['path'], queries.count, queries.budget, queries.duration * 1000)
+        for statement, repeats in queries.repeated():
+            logger.warning("Возможный N+1 в %s %s: %d одинаковых выражений: %s",
+                           scope['method'], scope['path'], repeats, statement[:200])
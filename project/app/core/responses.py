@@ -0,0 +1,42 @@
+"""
+    Быстрый путь сериализации ответов.
+
+    ORJSONResponse - класс ответа по умолчанию: orjson вместо json.dumps. Списки строятся
+    из Result.mappings() по колонкам схемы ответа и отдаются через rows_response без
+    повторной валидации Pydantic: типы колонок уже совпадают с полями схемы, а JSON
+    получается тем же, что дал бы response_model (Decimal - строкой, datetime - ISO 8601).
+"""
+from decimal import Decimal
+from typing import Any, Mapping, Sequence
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    # Pydantic в JSON-режиме отдаёт Decimal строкой, без потери точности
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def columns_of(model, schema: type[BaseModel]) -> list:
+    """
+        Колонки таблицы модели в порядке полей схемы ответа - для select(*columns_of(...)).
+    """
+    return [model.__table__.c[name] for name in schema.model_fields]
+
+
+def rows_response(rows: Sequence[Mapping], response: Response) -> ORJSONResponse:
+    """
+        Ответ со списком строк; заголовки, выставленные обработчиком в response
+        (курсор, ETag), переносятся в него.
+    """
+    return ORJSONResponse([dict(row) for row in rows], headers=dict(response.headers))
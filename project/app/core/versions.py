@@ -0,0 +1,162 @@
+"""
+    Версии таблиц для условных GET (ETag / If-None-Match).
+
+    Запись через utils модуля увеличивает версию своей таблицы в table_versions в той же
+    транзакции и отправляет NOTIFY table_versions. Процессы держат версии в памяти и
+    обновляют их по уведомлениям, поэтому ETag списка или карточки вычисляется без
+    обращения к БД, и ответ 304 не занимает соединение из пула. Кэши, зависящие от таблицы,
+    регистрируются через on_change и перечитываются по уведомлению в фоне, а не в запросе.
+"""
+import asyncio
+import logging
+from hashlib import blake2b
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+from fastapi import Request
+from sqlalchemy import String, cast, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.table_versions import TableVersion
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_CHANNEL = 'table_versions'
+# Клиент обязан перепроверять ответ (If-None-Match) при каждом запросе
+VERSIONED_CACHE_CONTROL = 'private, no-cache'
+
+_PENDING_KEY = 'pending_table_versions'
+
+
+class TableVersions:
+    """
+        Версии таблиц в памяти процесса. Значение только растёт: уведомление, пришедшее
+        позже commit в этом же процессе, не откатывает версию назад.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._versions: Dict[str, int] = {}
+        self._refreshers: Dict[str, List[Callable[[AsyncSession], Awaitable[None]]]] = {}
+
+    def on_change(self, table: str, refresh: Callable[[AsyncSession], Awaitable[None]]) -> None:
+        """
+            refresh(db) вызывается listen_for_versions при уведомлении о новой версии таблицы
+            и после переподключения LISTEN.
+        """
+        self._refreshers.setdefault(table, []).append(refresh)
+
+    def refreshers(self, table: str) -> List[Callable[[AsyncSession], Awaitable[None]]]:
+        return self._refreshers.get(table, [])
+
+    def watched(self) -> List[str]:
+        return list(self._refreshers)
+
+    def get(self, table: str) -> Optional[int]:
+        return self._versions.get(table)
+
+    def set(self, table: str, version: int) -> None:
+        if version > self._versions.get(table, 0):
+            self._versions[table] = version
+
+    async def load(self, db: AsyncSession) -> None:
+        rows = (await db.execute(select(TableVersion.table_name, TableVersion.version))).all()
+        for table, version in rows:
+            self.set(table, version)
+        self.loaded = True
+
+    async def bump(self, db: AsyncSession, table: str) -> None:
+        """
+            Вызывается непосредственно перед commit: строка версии блокируется до конца
+            транзакции, так что порядок версий совпадает с порядком commit записей.
+        """
+        bumped = (
+            update(TableVersion)
+            .where(TableVersion.table_name == table)
+            .values(version=TableVersion.version + 1)
+            .returning(TableVersion.version)
+            .cte('bumped')
+        )
+        # NOTIFY доставляется слушателям только после commit транзакции
+        version = (await db.execute(select(
+            bumped.c.version,
+            func.pg_notify(VERSIONS_CHANNEL, table + ':' + cast(bumped.c.version, String)),
+        ))).scalar_one()
+        db.sync_session.info.setdefault(_PENDING_KEY, {})[table] = version
+
+    def etag(self, table: str, request: Request) -> Optional[str]:
+        """
+            ETag ответа GET: версия таблицы + путь и параметры запроса (страница, фильтры).
+            None, пока версии не загружены, - тогда ответ отдаётся без ETag.
+        """
+        version = self._versions.get(table) if self.loaded else None
+        if version is None:
+            return None
+        url = f'{request.url.path}?{request.url.query}'.encode()
+        return f'"{table}.{version}.{blake2b(url, digest_size=8).hexdigest()}"'
+
+
+table_versions = TableVersions()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_versions(session: Session) -> None:
+    for table, version in session.info.pop(_PENDING_KEY, {}).items():
+        table_versions.set(table, version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_versions(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+async def listen_for_versions(dsn: str, session_factory, retry_interval: float = 5.0) -> None:
+    """
+        LISTEN table_versions на отдельном соединении; payload - "<таблица>:<версия>".
+        После переподключения версии перечитываются целиком, так как уведомления
+        за время разрыва потеряны.
+    """
+    refreshing = set()
+
+    async def refresh(tables):
+        for table in tables:
+            for refresher in table_versions.refreshers(table):
+                try:
+                    async with session_factory() as db:
+                        await refresher(db)
+                except Exception:
+                    logger.exception("Ошибка обновления кэша таблицы %s", table)
+
+    async def reload():
+        try:
+            async with session_factory() as db:
+                await table_versions.load(db)
+        except Exception:
+            logger.exception("Ошибка загрузки версий таблиц")
+        await refresh(table_versions.watched())
+
+    def on_notify(connection, pid, channel, payload):
+        table, _, version = payload.rpartition(':')
+        table_versions.set(table, int(version))
+        if table_versions.refreshers(table):
+            task = asyncio.create_task(refresh([table]))
+            refreshing.add(task)
+            task.add_done_callback(refreshing.discard)
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(VERSIONS_CHANNEL, on_notify)
+            await reload()
+            while not connection.is_closed():
+                await asyncio.sleep(retry_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Соединение LISTEN для версий таблиц потеряно")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_interval)
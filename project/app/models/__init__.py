@@ -3,9 +3,12 @@ from .clients import Client
 from .vehicles import Vehicle
 from .parking_space import ParkingSpace
 from .tariff import Tariff
-from .parking_session import ParkingSession
+from .parking_session import ParkingSession, ParkingSessionId
 from .payment_method import PaymentMethod
 from .payments import Payment
+from .rollups import DailyRevenue, DailySessions
+from .table_versions import TableVersion
+from .archive import ArchiveFile
 
 __all__ = [
     "VehicleType",
@@ -14,6 +17,11 @@ __all__ = [
     "ParkingSpace",
     "Tariff",
     "ParkingSession",
+    "ParkingSessionId",
     "PaymentMethod",
-    "Payment"
+    "Payment",
+    "DailyRevenue",
+    "DailySessions",
+    "TableVersion",
+    "ArchiveFile"
 ]
\ No newline at end of file
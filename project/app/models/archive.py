@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index, func
+from app.core.db import Base
+
+class ArchiveFile(Base):
+    __tablename__ = "archive_files"
+    __table_args__ = (
+        Index("ix_archive_files_table_name_month", "table_name", "month"),
+    )
+
+    # Путь относительно ARCHIVE_DIR
+    path = Column(String(255), primary_key=True)
+    table_name = Column(String(63), nullable=False)
+    month = Column(Date, nullable=False)
+    rows = Column(Integer, nullable=False)
+    # Границы строк файла: time_in..time_out для сессий, time для платежей, day для роллапов
+    min_time = Column(DateTime, nullable=False)
+    max_time = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
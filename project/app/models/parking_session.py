@@ -1,16 +1,29 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, DECIMAL, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.db import Base
 
 class ParkingSession(Base):
     __tablename__ = "parking_sessions"
+    __table_args__ = (
+        Index("ix_parking_sessions_open_space_id", "space_id", postgresql_where=text("time_out IS NULL")),
+        Index("ix_parking_sessions_open_vehicle_id", "vehicle_id", postgresql_where=text("time_out IS NULL")),
+        Index("ix_parking_sessions_closed_time_out", "time_out",
+              postgresql_include=["time_in", "total_cost"],
+              postgresql_where=text("time_out IS NOT NULL AND total_cost IS NOT NULL")),
+        Index("ix_parking_sessions_time_in_id", "time_in", "id"),
+        Index("ix_parking_sessions_vehicle_id_id", "vehicle_id", "id"),
+        Index("ix_parking_sessions_space_id_id", "space_id", "id"),
+        # Помесячные секции по time_in, см. app.core.partitions
+        {"postgresql_partition_by": "RANGE (time_in)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False)
     space_id = Column(Integer, ForeignKey("parking_spaces.id"), nullable=False)
     tariff_id = Column(Integer, ForeignKey("tariffs.id"), nullable=False)
-    time_in = Column(DateTime, nullable=False)
+    # Первичный ключ в БД - (id, time_in): он обязан включать ключ секционирования
+    time_in = Column(DateTime, primary_key=True)
     time_out = Column(DateTime)
     total_cost = Column(DECIMAL(10, 2))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -18,4 +31,18 @@ class ParkingSession(Base):
     vehicle = relationship("Vehicle", back_populates="parking_sessions")
     parking_space = relationship("ParkingSpace", back_populates="parking_sessions")
     tariff = relationship("Tariff", back_populates="parking_sessions")
-    payments = relationship("Payment", back_populates="parking_session")
\ No newline at end of file
+    payments = relationship("Payment", back_populates="parking_session",
+                            primaryjoin="ParkingSession.id == foreign(Payment.session_id)")
+
+    # Объекты по-прежнему идентифицируются по id: db.get(ParkingSession, session_id);
+    # уникальность id в БД держит parking_session_ids
+    __mapper_args__ = {"primary_key": [id]}
+
+
+# Реестр id сессий: уникальный ключ, на который ссылаются платежи (у секционированной
+# parking_sessions первичный ключ - (id, time_in)). Заполняется триггерами parking_sessions;
+# id сессий, перенесённых в архив, остаются (см. reports.archive)
+class ParkingSessionId(Base):
+    __tablename__ = "parking_session_ids"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
\ No newline at end of file
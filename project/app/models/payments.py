@@ -1,17 +1,29 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.db import Base
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_session_id", "session_id"),
+        Index("ix_payments_time_id", "time", "id"),
+        # Помесячные секции по time, см. app.core.partitions
+        {"postgresql_partition_by": "RANGE (time)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("parking_sessions.id"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Внешний ключ на реестр id (на секционированную parking_sessions можно сослаться только
+    # вместе с time_in); отложенный - проверяется при commit
+    session_id = Column(Integer, ForeignKey("parking_session_ids.id", deferrable=True, initially="DEFERRED"),
+                        nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     method_id = Column(Integer, ForeignKey("payment_methods.id"), nullable=False)
-    time = Column(DateTime, nullable=False)
+    time = Column(DateTime, primary_key=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    parking_session = relationship("ParkingSession", back_populates="payments")
-    payment_method = relationship("PaymentMethod", back_populates="payments")
\ No newline at end of file
+    parking_session = relationship("ParkingSession", back_populates="payments",
+                                   primaryjoin="foreign(Payment.session_id) == ParkingSession.id")
+    payment_method = relationship("PaymentMethod", back_populates="payments")
+
+    __mapper_args__ = {"primary_key": [id]}
\ No newline at end of file
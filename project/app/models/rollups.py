@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Date, DECIMAL
+from app.core.db import Base
+
+class DailyRevenue(Base):
+    __tablename__ = "daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    tariff_id = Column(Integer, primary_key=True)
+    vehicle_type_id = Column(Integer, primary_key=True)
+    revenue = Column(DECIMAL(18, 6), nullable=False, default=0)
+
+class DailySessions(Base):
+    __tablename__ = "daily_sessions"
+
+    day = Column(Date, primary_key=True)
+    tariff_id = Column(Integer, primary_key=True)
+    vehicle_type_id = Column(Integer, primary_key=True)
+    sessions_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.db import Base
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(63), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
@@ -11,7 +11,7 @@ class Vehicle(Base):
     license_plate = Column(String(20), nullable=False, unique=True)
     color = Column(String(30), nullable=False)
     type_id = Column(Integer, ForeignKey("vehicle_types.id"), nullable=False)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
 
     vehicle_type = relationship("VehicleType", back_populates="vehicles")
     client = relationship("Client", back_populates="vehicles")
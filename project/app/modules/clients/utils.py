@@ -2,6 +2,8 @@ from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.crud import changed_fields, insert_returning, update_returning
+from app.core.versions import table_versions
 from app.models.clients import Client
 from app.modules.clients.schemas import ClientsCreate, ClientsUpdate
 from typing import Optional, List
@@ -9,10 +11,9 @@ from typing import Optional, List
 
 async def create_clients(data: ClientsCreate, db: AsyncSession) -> Optional[Client]:
     try:
-        db_client = Client(name=data.name, surname=data.surname, phone=data.phone)
-        db.add(db_client)
+        db_client = await insert_returning(db, Client, dict(name=data.name, surname=data.surname, phone=data.phone))
+        await table_versions.bump(db, 'clients')
         await db.commit()
-        await db.refresh(db_client)
         return db_client
     except Exception as e:
         await db.rollback()
@@ -26,16 +27,9 @@ async def get_client_id(db: AsyncSession, client_id: int) -> Optional[Client]:
     return client
 
 async def update_clients(db: AsyncSession, clients_id: int, data: ClientsUpdate) -> Optional[Client]:
-    clients = await get_client_id(db, clients_id)
+    clients = await update_returning(db, Client, clients_id, changed_fields(data))
     if not clients:
         return None
-    if data.name is not None:
-        clients.name = data.name
-    if data.surname is not None:
-        clients.surname = data.surname
-    if data.phone is not None:
-        clients.phone = data.phone
-    db.add(clients)
+    await table_versions.bump(db, 'clients')
     await db.commit()
-    await db.refresh(clients)
     return clients
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
 from fastapi.params import Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Literal
 
 from app.core.db import get_db
+from app.core.http_cache import etag_matches, not_modified, set_etag
+from app.core.versions import table_versions, VERSIONED_CACHE_CONTROL
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, split_page
+from app.core.responses import columns_of, rows_response
 from app.modules.clients.schemas import ClientsCreate, ClientsUpdate, ClientsOut
 from app.modules.clients import utils
 
@@ -14,17 +19,35 @@ router = APIRouter(prefix='/clients', tags=['Clients'])
 @router.post('/', response_model=ClientsOut, status_code=status.HTTP_200_OK)
 async def create_clients(data: ClientsCreate, db: AsyncSession = Depends(get_db)):
     client = await utils.create_clients(data, db)
-    return ClientsOut.model_validate(client)
+    return client
 
 @router.get('/', response_model=list[ClientsOut])
-async def get_clients(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Client))
-    clients = result.scalars().all()
-    return clients
+async def get_clients(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    order: Literal['asc', 'desc'] = Query('asc', description="Направление сортировки"),
+    db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('clients', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
+    keys = [Client.id]
+    result = await db.execute(paginate(select(*columns_of(Client, ClientsOut)), keys, cursor, limit, order == 'desc'))
+    clients, next_cursor = split_page(result.mappings().all(), keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
+    return rows_response(clients, response)
 
 @router.get('/{clients_id}', response_model=ClientsOut)
-async def get_client(clients_id: int, db: AsyncSession = Depends(get_db)):
+async def get_client(clients_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('clients', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
     clients = await utils.get_client_id(db, clients_id)
+    if clients:
+        set_etag(response, etag, VERSIONED_CACHE_CONTROL)
     return clients
 
 @router.put('/{clients_id}', status_code=status.HTTP_204_NO_CONTENT)
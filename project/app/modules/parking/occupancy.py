@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+import asyncpg
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.parking_space import ParkingSpace
+from app.models.parking_session import ParkingSession
+
+logger = logging.getLogger(__name__)
+
+# Триггеры parking_sessions и parking_spaces рассылают изменения занятости: [метод, аргументы...]
+OCCUPANCY_CHANNEL = 'occupancy'
+NOTIFIED_METHODS = {'occupy', 'release', 'add_space', 'remove_space'}
+
+
+class OccupancyIndex:
+    """
+        Занятость парковочных мест в памяти процесса. Для каждого типа ТС хранится
+        битовая карта: бит i установлен, если i-е место этого типа занято открытой сессией.
+        Процесс, записавший изменение, обновляет индекс сразу после commit; остальные
+        процессы получают его по NOTIFY occupancy (listen_for_occupancy). Повтор
+        изменения ничего не меняет, поэтому своё же уведомление безопасно. Индекс
+        периодически сверяется с БД.
+
+        Изменения, пришедшие, пока load() ждёт ответа БД, записываются в журнал и повторяются
+        на загруженном состоянии. Открытые сессии хранятся по id, поэтому повтор изменения,
+        уже попавшего в выборку из БД, ничего не меняет.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._slots: Dict[int, List[Optional[int]]] = {}
+        self._position: Dict[int, tuple[int, int]] = {}
+        self._numbers: Dict[int, str] = {}
+        self._occupied: Dict[int, int] = {}
+        self._open_sessions: Dict[int, Set[int]] = {}
+        self._journals: List[list] = []
+
+    def _set_bit(self, space_id: int, occupied: bool) -> None:
+        position = self._position.get(space_id)
+        if position is None:
+            return
+        type_id, bit = position
+        if occupied:
+            self._occupied[type_id] |= 1 << bit
+        else:
+            self._occupied[type_id] &= ~(1 << bit)
+
+    def _record(self, *change) -> None:
+        for journal in self._journals:
+            journal.append(change)
+
+    def add_space(self, space_id: int, type_id: int, number: str) -> None:
+        self._record('add_space', space_id, type_id, number)
+        position = self._position.get(space_id)
+        if position is not None and position[0] == type_id:
+            # Тип не изменился - место остаётся в своём слоте
+            self._numbers[space_id] = number
+            return
+        if position is not None:
+            self.remove_space(space_id)
+        slots = self._slots.setdefault(type_id, [])
+        self._occupied.setdefault(type_id, 0)
+        self._position[space_id] = (type_id, len(slots))
+        self._numbers[space_id] = number
+        slots.append(space_id)
+        self._set_bit(space_id, bool(self._open_sessions.get(space_id)))
+
+    def remove_space(self, space_id: int) -> None:
+        self._record('remove_space', space_id)
+        position = self._position.pop(space_id, None)
+        self._numbers.pop(space_id, None)
+        if position is None:
+            return
+        type_id, bit = position
+        # Слот освобождается, но не переиспользуется до следующей сверки
+        self._slots[type_id][bit] = None
+        self._occupied[type_id] |= 1 << bit
+
+    def occupy(self, space_id: int, session_id: int) -> None:
+        self._record('occupy', space_id, session_id)
+        self._open_sessions.setdefault(space_id, set()).add(session_id)
+        self._set_bit(space_id, True)
+
+    def release(self, space_id: int, session_id: int) -> None:
+        self._record('release', space_id, session_id)
+        sessions = self._open_sessions.get(space_id)
+        if sessions is None:
+            return
+        sessions.discard(session_id)
+        if sessions:
+            return
+        del self._open_sessions[space_id]
+        self._set_bit(space_id, False)
+
+    def free_counts(self) -> Dict[int, tuple[int, int]]:
+        """
+            {type_id: (всего мест, свободно)}
+        """
+        counts = {}
+        for type_id, slots in self._slots.items():
+            total = sum(1 for space_id in slots if space_id is not None)
+            free = len(slots) - bin(self._occupied[type_id]).count('1')
+            counts[type_id] = (total, free)
+        return counts
+
+    def free_total(self) -> int:
+        return sum(free for _, free in self.free_counts().values())
+
+    def next_free(self, type_id: int) -> Optional[tuple[int, str]]:
+        slots = self._slots.get(type_id)
+        if not slots:
+            return None
+        free_bits = ~self._occupied[type_id] & ((1 << len(slots)) - 1)
+        if not free_bits:
+            return None
+        space_id = slots[(free_bits & -free_bits).bit_length() - 1]
+        return space_id, self._numbers[space_id]
+
+    async def load(self, db: AsyncSession) -> None:
+        journal = []
+        self._journals.append(journal)
+        try:
+            spaces = (await db.execute(
+                select(ParkingSpace.id, ParkingSpace.type_id, ParkingSpace.number).order_by(ParkingSpace.id)
+            )).all()
+            open_sessions = (await db.execute(
+                select(ParkingSession.space_id, ParkingSession.id).where(ParkingSession.time_out.is_(None))
+            )).all()
+        finally:
+            self._journals.remove(journal)
+        fresh = OccupancyIndex()
+        for space_id, session_id in open_sessions:
+            fresh._open_sessions.setdefault(space_id, set()).add(session_id)
+        for space_id, type_id, number in spaces:
+            fresh.add_space(space_id, type_id, number)
+        # Между последним await и заменой состояния другие корутины не выполняются
+        for method, *args in journal:
+            getattr(fresh, method)(*args)
+        fresh._journals = self._journals
+        self.__dict__.update(fresh.__dict__)
+        self.loaded = True
+
+
+occupancy = OccupancyIndex()
+
+
+async def reconcile_forever(session_factory, interval: float) -> None:
+    """
+        Периодическая сверка индекса с БД: исправляет расхождения от уведомлений,
+        потерянных при разрыве соединения, и записей без триггеров (session_replication_role).
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await occupancy.load(db)
+        except Exception:
+            logger.exception("Ошибка сверки индекса занятости")
+
+
+async def listen_for_occupancy(dsn: str, session_factory, retry_interval: float = 5.0) -> None:
+    """
+        LISTEN occupancy на отдельном соединении: изменения занятости из других процессов
+        применяются к индексу без обращения к БД. После переподключения индекс
+        перечитывается целиком, так как уведомления за время разрыва потеряны.
+    """
+    async def reload():
+        try:
+            async with session_factory() as db:
+                await occupancy.load(db)
+        except Exception:
+            logger.exception("Ошибка загрузки индекса занятости")
+
+    def on_notify(connection, pid, channel, payload):
+        method, *args = orjson.loads(payload)
+        if method in NOTIFIED_METHODS:
+            getattr(occupancy, method)(*args)
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(OCCUPANCY_CHANNEL, on_notify)
+            await reload()
+            while not connection.is_closed():
+                await asyncio.sleep(retry_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Соединение LISTEN для индекса занятости потеряно")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_interval)
@@ -0,0 +1,203 @@
+"""
+    Пакетный пересчёт total_cost закрытых сессий (после изменения тарифа или исправления
+    правил расчёта). Сессии читаются чанками по id, стоимость считается векторно в NumPy
+    в целых копейках, изменившиеся суммы записываются одним UPDATE ... FROM unnest на чанк.
+    python -m app.modules.parking.repricing [--tariff-id N] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+                                            [--daily-cap] [--apply]
+    Без --apply выполняется dry-run: печатается отчёт о расхождениях, БД не меняется.
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import select, update, func, cast, bindparam, BigInteger, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.parking_session import ParkingSession
+from app.models.tariff import Tariff
+from app.modules.reports import rollups
+from app.modules.reports.cache import dashboard_cache
+
+REPRICE_CHUNK_SIZE = 50000
+MAX_REPORTED_CHANGES = 20
+
+MICROSECONDS_PER_HOUR = 3600 * 1000000
+HOURS_PER_DAY = 24
+
+
+def compute_costs(durations_us: np.ndarray, hour_cents: np.ndarray, day_cents: np.ndarray,
+                  daily_cap: bool = False) -> np.ndarray:
+    """
+        Стоимость в копейках: каждый начатый час оплачивается полностью.
+        С daily_cap каждые полные сутки стоят price_per_day, а остаток суток
+        оплачивается по часам, но не дороже price_per_day.
+    """
+    hours = -(-durations_us // MICROSECONDS_PER_HOUR)
+    if not daily_cap:
+        return hours * hour_cents
+    days, rest = np.divmod(hours, HOURS_PER_DAY)
+    return days * day_cents + np.minimum(rest * hour_cents, day_cents)
+
+
+def _to_cents(value) -> int:
+    return int((Decimal(value) * 100).to_integral_value())
+
+
+def _from_cents(value) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+@dataclass
+class RepricingChange:
+    session_id: int
+    old_cost: Optional[Decimal]
+    new_cost: Decimal
+
+
+@dataclass
+class RepricingReport:
+    dry_run: bool
+    daily_cap: bool
+    scanned: int = 0
+    changed: int = 0
+    old_total: Decimal = Decimal('0.00')
+    new_total: Decimal = Decimal('0.00')
+    elapsed: float = 0.0
+    changes: List[RepricingChange] = field(default_factory=list)
+
+    @property
+    def delta(self) -> Decimal:
+        return self.new_total - self.old_total
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data['delta'] = self.delta
+        return data
+
+
+class _TariffTable:
+    """
+        Цены тарифов в виде массивов, индексируемых tariff_id.
+    """
+
+    def __init__(self, rows):
+        size = max((tariff_id for tariff_id, _, _ in rows), default=0) + 1
+        self.hour_cents = np.zeros(size, dtype=np.int64)
+        self.day_cents = np.zeros(size, dtype=np.int64)
+        for tariff_id, price_per_hour, price_per_day in rows:
+            self.hour_cents[tariff_id] = _to_cents(price_per_hour)
+            self.day_cents[tariff_id] = _to_cents(price_per_day)
+
+
+def _chunk_query(conditions: list, after_id: int, chunk_size: int):
+    duration_us = cast(func.extract('epoch', ParkingSession.time_out - ParkingSession.time_in) * 1000000, BigInteger)
+    # NULL стоимость кодируется как -1, чтобы такие сессии всегда попадали в пересчёт
+    old_cents = func.coalesce(cast(ParkingSession.total_cost * 100, BigInteger), -1)
+    return select(
+        ParkingSession.id, ParkingSession.tariff_id, duration_us, old_cents
+    ).where(
+        # Сессии с time_out <= time_in API не тарифицирует (calculate_parking_cost их отклоняет),
+        # пересчёт оставляет их стоимость как есть
+        ParkingSession.time_out.isnot(None), ParkingSession.time_out > ParkingSession.time_in,
+        ParkingSession.id > after_id, *conditions
+    ).order_by(ParkingSession.id).limit(chunk_size)
+
+
+def _bulk_update_costs():
+    values = func.unnest(
+        bindparam('ids', type_=ARRAY(Integer)), bindparam('costs', type_=ARRAY(Numeric(10, 2)))
+    ).table_valued('id', 'cost').render_derived(name='v')
+    return update(ParkingSession).where(
+        ParkingSession.id == values.c.id
+    ).values(total_cost=values.c.cost).execution_options(synchronize_session=False)
+
+
+async def reprice_sessions(db: AsyncSession, tariff_id: Optional[int] = None,
+                           start: Optional[date] = None, end: Optional[date] = None,
+                           daily_cap: bool = False, dry_run: bool = True,
+                           chunk_size: int = REPRICE_CHUNK_SIZE) -> RepricingReport:
+    """
+        Пересчитывает стоимость закрытых сессий с time_out в [start, end).
+        При записи роллапы выручки корректируются в той же транзакции, что и UPDATE чанка:
+        вклад изменённых сессий вычитается до обновления и добавляется после.
+    """
+    started = time.perf_counter()
+    report = RepricingReport(dry_run=dry_run, daily_cap=daily_cap)
+    tariffs = _TariffTable((await db.execute(
+        select(Tariff.id, Tariff.price_per_hour, Tariff.price_per_day)
+    )).all())
+
+    conditions = []
+    if tariff_id is not None:
+        conditions.append(ParkingSession.tariff_id == tariff_id)
+    if start:
+        conditions.append(ParkingSession.time_out >= datetime.combine(start, datetime.min.time()))
+    if end:
+        conditions.append(ParkingSession.time_out < datetime.combine(end, datetime.min.time()))
+
+    after_id = 0
+    while True:
+        rows = (await db.execute(_chunk_query(conditions, after_id, chunk_size))).all()
+        if not rows:
+            break
+        ids, tariff_ids, durations_us, old_cents = (np.array(column, dtype=np.int64) for column in zip(*rows))
+        after_id = int(ids[-1])
+
+        new_cents = compute_costs(durations_us, tariffs.hour_cents[tariff_ids], tariffs.day_cents[tariff_ids], daily_cap)
+        changed = new_cents != old_cents
+
+        report.scanned += len(ids)
+        report.changed += int(changed.sum())
+        report.old_total += _from_cents(old_cents[old_cents >= 0].sum())
+        report.new_total += _from_cents(new_cents.sum())
+        for i in np.flatnonzero(changed)[:MAX_REPORTED_CHANGES - len(report.changes)]:
+            report.changes.append(RepricingChange(
+                session_id=int(ids[i]),
+                old_cost=_from_cents(old_cents[i]) if old_cents[i] >= 0 else None,
+                new_cost=_from_cents(new_cents[i]),
+            ))
+
+        if dry_run or not changed.any():
+            continue
+        changed_ids = ids[changed].tolist()
+        changed_costs = [_from_cents(c) for c in new_cents[changed]]
+        await rollups.apply_sessions(db, changed_ids, -1)
+        await db.execute(_bulk_update_costs(), {'ids': changed_ids, 'costs': changed_costs})
+        await rollups.apply_sessions(db, changed_ids, 1)
+        await db.commit()
+
+    if not dry_run and report.changed:
+        dashboard_cache.invalidate()
+    report.elapsed = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def main() -> None:
+    from app.core.db import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Пакетный пересчёт стоимости закрытых сессий")
+    parser.add_argument('--tariff-id', type=int, default=None, help="Только сессии этого тарифа")
+    parser.add_argument('--start', type=date.fromisoformat, default=None, help="Первый день выезда (включительно)")
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help="Последний день выезда (не включительно)")
+    parser.add_argument('--daily-cap', action='store_true', help="Ограничивать стоимость суток ценой price_per_day")
+    parser.add_argument('--chunk-size', type=int, default=REPRICE_CHUNK_SIZE)
+    parser.add_argument('--apply', action='store_true', help="Записать новые суммы (по умолчанию dry-run)")
+    args = parser.parse_args()
+    async with AsyncSessionLocal() as db:
+        report = await reprice_sessions(
+            db, args.tariff_id, args.start, args.end,
+            daily_cap=args.daily_cap, dry_run=not args.apply, chunk_size=args.chunk_size,
+        )
+    await engine.dispose()
+    print(json.dumps(report.as_dict(), default=str, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
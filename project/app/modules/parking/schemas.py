@@ -22,6 +22,18 @@ class ParkingSpaceOut(ParkingSpace):
     class Config:
         from_attributes = True
 
+class FreeSpacesByType(BaseModel):
+    type_id: int
+    type_name: Optional[str] = None
+    total: int
+    free: int
+
+class NextFreeSpace(BaseModel):
+    space_id: int
+    number: str
+    type_id: int
+    type_name: Optional[str] = None
+
 # Tariff schemas
 class Tariff(BaseModel):
     name: str
@@ -67,6 +79,10 @@ class ParkingSessionUpdate(BaseModel):
     time_out: Optional[datetime] = None
     total_cost: Optional[Decimal] = None
 
+class ParkingCheckOut(BaseModel):
+    license_plate: str
+    time_out: Optional[datetime] = None
+
 class ParkingSessionOut(ParkingSession):
     id: int
     created_at: datetime
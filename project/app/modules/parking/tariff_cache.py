@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional
+
+import asyncpg
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.tariff import Tariff
+
+logger = logging.getLogger(__name__)
+
+TARIFF_CHANNEL = 'tariffs_changed'
+
+
+class TariffPrices(NamedTuple):
+    price_per_hour: Decimal
+    price_per_day: Decimal
+
+
+class TariffCache:
+    """
+        Цены тарифов в памяти процесса. Тарифы меняются редко, поэтому расчёт стоимости
+        при выезде не ходит в БД за тарифом. Каждое изменение увеличивает version;
+        другие процессы узнают об изменениях через LISTEN/NOTIFY и перечитывают кэш.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.loaded = False
+        self._prices: Dict[int, TariffPrices] = {}
+
+    def get(self, tariff_id: int) -> Optional[TariffPrices]:
+        return self._prices.get(tariff_id)
+
+    def put(self, tariff: Tariff) -> None:
+        self._prices[tariff.id] = TariffPrices(tariff.price_per_hour, tariff.price_per_day)
+        self.version += 1
+
+    def remove(self, tariff_id: int) -> None:
+        self._prices.pop(tariff_id, None)
+        self.version += 1
+
+    async def load(self, db: AsyncSession) -> None:
+        rows = (await db.execute(select(Tariff.id, Tariff.price_per_hour, Tariff.price_per_day))).all()
+        self._prices = {tariff_id: TariffPrices(hour, day) for tariff_id, hour, day in rows}
+        self.version += 1
+        self.loaded = True
+
+
+tariff_cache = TariffCache()
+
+
+async def notify_tariff_changed(db: AsyncSession, tariff_id: int) -> None:
+    # NOTIFY доставляется слушателям только после commit транзакции
+    await db.execute(select(func.pg_notify(TARIFF_CHANNEL, str(tariff_id))))
+
+
+async def listen_for_changes(dsn: str, session_factory, retry_interval: float = 5.0) -> None:
+    """
+        Держит отдельное соединение с LISTEN tariffs_changed и перечитывает кэш при
+        каждом уведомлении. После переподключения кэш перечитывается целиком, так как
+        уведомления за время разрыва потеряны.
+    """
+    async def reload():
+        try:
+            async with session_factory() as db:
+                await tariff_cache.load(db)
+        except Exception:
+            logger.exception("Ошибка перезагрузки кэша тарифов")
+
+    def on_notify(connection, pid, channel, payload):
+        asyncio.get_running_loop().create_task(reload())
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(TARIFF_CHANNEL, on_notify)
+            await reload()
+            while not connection.is_closed():
+                await asyncio.sleep(retry_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Соединение LISTEN для кэша тарифов потеряно")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_interval)
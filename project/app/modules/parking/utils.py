@@ -1,4 +1,6 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
+from sqlalchemy import select, insert, update, func, extract, bindparam, case, DateTime
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 import math
 from datetime import datetime
@@ -7,10 +9,18 @@ from decimal import Decimal
 from app.models.parking_space import ParkingSpace
 from app.models.tariff import Tariff
 from app.models.parking_session import ParkingSession
+from app.models.vehicles import Vehicle
+from app.core.crud import changed_fields, insert_returning, update_returning, delete_returning
+from app.core.bulk import BulkImportResult, iter_chunks
+from app.core.versions import table_versions
+from app.modules.reports import rollups
+from app.modules.reports.cache import dashboard_cache
+from app.modules.parking.occupancy import occupancy
+from app.modules.parking.tariff_cache import tariff_cache, notify_tariff_changed
 from app.modules.parking.schemas import (
     ParkingSpaceCreate, ParkingSpaceUpdate,
     TariffCreate, TariffUpdate,
-    ParkingSessionCreate, ParkingSessionUpdate
+    ParkingSessionCreate, ParkingSessionUpdate, ParkingCheckOut
 )
 from typing import Optional
 
@@ -24,13 +34,13 @@ def to_naive_datetime(dt: datetime) -> datetime:
 
 async def create_parking_space(data: ParkingSpaceCreate, db: AsyncSession) -> Optional[ParkingSpace]:
     try:
-        db_parking_space = ParkingSpace(
+        db_parking_space = await insert_returning(db, ParkingSpace, dict(
             number=data.number,
             type_id=data.type_id
-        )
-        db.add(db_parking_space)
+        ))
+        await table_versions.bump(db, 'parking_spaces')
         await db.commit()
-        await db.refresh(db_parking_space)
+        occupancy.add_space(db_parking_space.id, db_parking_space.type_id, db_parking_space.number)
         return db_parking_space
     except Exception as e:
         await db.rollback()
@@ -44,35 +54,32 @@ async def get_parking_space_id(db: AsyncSession, parking_space_id: int) -> Optio
     return parking_space
 
 async def update_parking_space(db: AsyncSession, parking_space_id: int, data: ParkingSpaceUpdate) -> Optional[ParkingSpace]:
-    parking_space = await get_parking_space_id(db, parking_space_id)
+    parking_space = await update_returning(db, ParkingSpace, parking_space_id, changed_fields(data))
     if not parking_space:
         return None
-    if data.number is not None:
-        parking_space.number = data.number
-    if data.type_id is not None:
-        parking_space.type_id = data.type_id
-    db.add(parking_space)
+    await table_versions.bump(db, 'parking_spaces')
     await db.commit()
-    await db.refresh(parking_space)
+    occupancy.add_space(parking_space.id, parking_space.type_id, parking_space.number)
     return parking_space
 
 async def delete_parking_space(db: AsyncSession, parking_space_id: int) -> bool:
-    parking_space = await get_parking_space_id(db, parking_space_id)
-    if not parking_space:
+    if not await delete_returning(db, ParkingSpace, parking_space_id):
         return False
-    await db.delete(parking_space)
+    await table_versions.bump(db, 'parking_spaces')
     await db.commit()
+    occupancy.remove_space(parking_space_id)
     return True
 
 async def create_tariff(data: TariffCreate, db: AsyncSession) -> Optional[Tariff]:
     try:
-        db_tariff = Tariff(
+        db_tariff = await insert_returning(db, Tariff, dict(
             name=data.name,
             price_per_hour=data.price_per_hour,
-            price_per_day=data.price_per_day)
-        db.add(db_tariff)
+            price_per_day=data.price_per_day))
+        await notify_tariff_changed(db, db_tariff.id)
+        await table_versions.bump(db, 'tariffs')
         await db.commit()
-        await db.refresh(db_tariff)
+        tariff_cache.put(db_tariff)
         return db_tariff
     except Exception as e:
         await db.rollback()
@@ -86,41 +93,33 @@ async def get_tariff_id(db: AsyncSession, tariff_id: int) -> Optional[Tariff]:
     return tariff
 
 async def update_tariff(db: AsyncSession, tariff_id: int, data: TariffUpdate) -> Optional[Tariff]:
-    tariff = await get_tariff_id(db, tariff_id)
+    tariff = await update_returning(db, Tariff, tariff_id, changed_fields(data))
     if not tariff:
         return None
-    if data.name is not None:
-        tariff.name = data.name
-    if data.price_per_hour is not None:
-        tariff.price_per_hour = data.price_per_hour
-    if data.price_per_day is not None:
-        tariff.price_per_day = data.price_per_day
-    db.add(tariff)
+    await notify_tariff_changed(db, tariff.id)
+    await table_versions.bump(db, 'tariffs')
     await db.commit()
-    await db.refresh(tariff)
+    dashboard_cache.invalidate()
+    tariff_cache.put(tariff)
     return tariff
 
 async def delete_tariff(db: AsyncSession, tariff_id: int) -> bool:
-    tariff = await get_tariff_id(db, tariff_id)
-    if not tariff:
+    if not await delete_returning(db, Tariff, tariff_id):
         return False
-    await db.delete(tariff)
+    await notify_tariff_changed(db, tariff_id)
+    await table_versions.bump(db, 'tariffs')
     await db.commit()
+    tariff_cache.remove(tariff_id)
     return True
 
 async def create_parking_session(data: ParkingSessionCreate, db: AsyncSession) -> Optional[ParkingSession]:
     try:
         time_in = to_naive_datetime(data.time_in)
         time_out = to_naive_datetime(data.time_out) if data.time_out else None
-        db_session = ParkingSession(
-            vehicle_id=data.vehicle_id,
-            space_id=data.space_id,
-            tariff_id=data.tariff_id,
-            time_in=time_in,
-            time_out=time_out)
+        total_cost = None
         if time_out and time_in:
             try:
-                db_session.total_cost = await calculate_parking_cost(
+                total_cost = await calculate_parking_cost(
                     time_in,
                     time_out,
                     data.tariff_id,
@@ -129,10 +128,19 @@ async def create_parking_session(data: ParkingSessionCreate, db: AsyncSession) -
             except HTTPException as e:
                 await db.rollback()
                 raise e
-        
-        db.add(db_session)
+
+        db_session = await insert_returning(db, ParkingSession, dict(
+            vehicle_id=data.vehicle_id,
+            space_id=data.space_id,
+            tariff_id=data.tariff_id,
+            time_in=time_in,
+            time_out=time_out,
+            total_cost=total_cost))
+        await rollups.apply_session(db, db_session.id)
         await db.commit()
-        await db.refresh(db_session)
+        dashboard_cache.invalidate()
+        if db_session.time_out is None:
+            occupancy.occupy(db_session.space_id, db_session.id)
         return db_session
     except HTTPException:
         raise
@@ -143,6 +151,22 @@ async def create_parking_session(data: ParkingSessionCreate, db: AsyncSession) -
             detail=f"Ошибка при создании сессии парковки: {str(e)}"
         )
 
+def parking_sessions_filter(start_date: Optional[datetime], end_date: Optional[datetime],
+                            vehicle_id: Optional[int] = None, space_id: Optional[int] = None,
+                            is_open: Optional[bool] = None) -> list:
+    conditions = []
+    if start_date:
+        conditions.append(ParkingSession.time_in >= to_naive_datetime(start_date))
+    if end_date:
+        conditions.append(ParkingSession.time_in <= to_naive_datetime(end_date))
+    if vehicle_id is not None:
+        conditions.append(ParkingSession.vehicle_id == vehicle_id)
+    if space_id is not None:
+        conditions.append(ParkingSession.space_id == space_id)
+    if is_open is not None:
+        conditions.append(ParkingSession.time_out.is_(None) if is_open else ParkingSession.time_out.isnot(None))
+    return conditions
+
 async def get_parking_session_id(db: AsyncSession, session_id: int) -> Optional[ParkingSession]:
     session = await db.get(ParkingSession, session_id)
     return session
@@ -155,49 +179,181 @@ async def calculate_parking_cost(time_in: datetime, time_out: datetime, tariff_i
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Время выхода должно быть позже времени входа"
         )
-    tariff = await get_tariff_id(db, tariff_id)
-    if not tariff:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Тариф не найден"
-        )
-    time_diff = time_out_naive - time_in_naive
-    hours = time_diff.total_seconds() / 3600
+    prices = tariff_cache.get(tariff_id)
+    if prices is None:
+        tariff = await get_tariff_id(db, tariff_id)
+        if not tariff:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Тариф не найден"
+            )
+        tariff_cache.put(tariff)
+        prices = tariff_cache.get(tariff_id)
+    return parking_cost(time_in_naive, time_out_naive, prices.price_per_hour)
+
+def parking_cost_sql(time_in, time_out, price_per_hour):
+    # То же правило, что в parking_cost, но выражением SQL для UPDATE ... RETURNING
+    return func.ceil(extract('epoch', time_out - time_in) / 3600) * price_per_hour
+
+def parking_cost(time_in: datetime, time_out: datetime, price_per_hour: Decimal) -> Decimal:
+    # Каждый начатый час оплачивается полностью
+    hours = (time_out - time_in).total_seconds() / 3600
     hours_rounded = math.ceil(hours)
-    cost = Decimal(str(hours_rounded)) * Decimal(str(tariff.price_per_hour))
-    
-    return cost
+    return Decimal(str(hours_rounded)) * Decimal(str(price_per_hour))
 
 async def update_parking_session(db: AsyncSession, session_id: int, data: ParkingSessionUpdate) -> Optional[ParkingSession]:
-    session = await get_parking_session_id(db, session_id)
-    if not session:
+    values = changed_fields(data)
+    if not values:
+        return await get_parking_session_id(db, session_id)
+    for key in ('time_in', 'time_out'):
+        if key in values:
+            values[key] = to_naive_datetime(values[key])
+    # Автоматически рассчитываем стоимость, если time_out установлен и total_cost не передан;
+    # при time_out <= time_in стоимость остаётся прежней
+    if 'time_out' in values and 'total_cost' not in values:
+        time_in = values.get('time_in', ParkingSession.time_in)
+        time_out = bindparam('time_out_value', values['time_out'], type_=DateTime)
+        price_per_hour = select(Tariff.price_per_hour).where(
+            Tariff.id == values.get('tariff_id', ParkingSession.tariff_id)).scalar_subquery()
+        values['total_cost'] = case(
+            (time_out > time_in, parking_cost_sql(time_in, time_out, price_per_hour)),
+            else_=ParkingSession.total_cost)
+
+    # Строка блокируется до вычитания вклада в роллапы: иначе два параллельных обновления
+    # вычтут один и тот же прежний вклад. Прежние time_out и space_id - для индекса занятости
+    old = (await db.execute(select(ParkingSession.time_out, ParkingSession.space_id).where(
+        ParkingSession.id == session_id).with_for_update())).first()
+    if old is None:
+        await db.rollback()
         return None
-    if data.vehicle_id is not None:
-        session.vehicle_id = data.vehicle_id
-    if data.space_id is not None:
-        session.space_id = data.space_id
-    if data.tariff_id is not None:
-        session.tariff_id = data.tariff_id
-    if data.time_in is not None:
-        session.time_in = to_naive_datetime(data.time_in)
-    if data.time_out is not None:
-        session.time_out = to_naive_datetime(data.time_out)
-        # Автоматически рассчитываем стоимость, если time_out установлен и total_cost не передан
-        if data.total_cost is None and session.time_out and session.time_in:
-            try:
-                session.total_cost = await calculate_parking_cost(
-                    session.time_in, 
-                    session.time_out, 
-                    session.tariff_id, 
-                    db
-                )
-            except HTTPException:
-                pass
+    old_time_out, old_space_id = old
+    # Поля, от которых зависят суточные роллапы отчетов
+    affects_rollups = bool(values.keys() & {'vehicle_id', 'tariff_id', 'time_in', 'time_out', 'total_cost'})
+    if affects_rollups:
+        await rollups.apply_session(db, session_id, -1)
+    result = await db.execute(
+        update(ParkingSession).where(ParkingSession.id == session_id).values(**values)
+        .returning(ParkingSession)
+        .execution_options(synchronize_session=False))
+    session = result.scalar_one()
+    if affects_rollups:
+        await rollups.apply_session(db, session.id)
+    await db.commit()
+    dashboard_cache.invalidate()
+    if old_time_out is None:
+        occupancy.release(old_space_id, session.id)
+    if session.time_out is None:
+        occupancy.occupy(session.space_id, session.id)
+    return session
 
-    if data.total_cost is not None:
-        session.total_cost = data.total_cost
-    db.add(session)
+async def check_out_by_plate(db: AsyncSession, data: ParkingCheckOut) -> Optional[Row]:
+    """
+        Выезд по номеру ТС: закрытие последней открытой сессии и расчёт стоимости
+        (каждый начатый час по price_per_hour тарифа) одним UPDATE ... RETURNING.
+        Условие time_out IS NULL перепроверяется под блокировкой строки, поэтому
+        повторный выезд того же ТС в гонке не закроет сессию дважды. Если строка не
+        обновлена, второй запрос отличает время выхода не позже входа (400) от
+        отсутствия открытой сессии (None).
+    """
+    time_out_value = to_naive_datetime(data.time_out) or datetime.utcnow()
+    time_out = bindparam('time_out', time_out_value, type_=DateTime)
+    vehicle_id = select(Vehicle.id).where(Vehicle.license_plate == data.license_plate).scalar_subquery()
+    # MATERIALIZED: открытые сессии ТС берутся по частичному индексу, иначе планировщик
+    # может выбрать обратный проход по индексу time_in ради ORDER BY ... LIMIT 1
+    open_sessions = select(ParkingSession.id, ParkingSession.time_in).where(
+        ParkingSession.vehicle_id == vehicle_id,
+        ParkingSession.time_out.is_(None)
+    ).cte('open_sessions').prefix_with('MATERIALIZED')
+    open_session_id = select(open_sessions.c.id).order_by(
+        open_sessions.c.time_in.desc()).limit(1).scalar_subquery()
+    query = update(ParkingSession).where(
+        ParkingSession.id == open_session_id,
+        ParkingSession.time_out.is_(None),
+        ParkingSession.time_in < time_out,
+        Tariff.id == ParkingSession.tariff_id
+    ).values(
+        time_out=time_out,
+        total_cost=parking_cost_sql(ParkingSession.time_in, time_out, Tariff.price_per_hour)
+    ).returning(*ParkingSession.__table__.columns).execution_options(synchronize_session=False)
+    session = (await db.execute(query)).first()
+    if session is None:
+        time_in = (await db.execute(select(func.max(ParkingSession.time_in)).where(
+            ParkingSession.vehicle_id == vehicle_id,
+            ParkingSession.time_out.is_(None)
+        ))).scalar()
+        if time_in is not None and time_out_value <= time_in:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Время выхода должно быть позже времени входа"
+            )
+        return None
+    # До закрытия у сессии не было выручки, счётчик сессий по дню въезда не меняется
+    await rollups.apply_revenue(db, [session.id])
     await db.commit()
-    await db.refresh(session)
+    dashboard_cache.invalidate()
+    occupancy.release(session.space_id, session.id)
     return session
 
+async def bulk_create_parking_sessions(request: Request, db: AsyncSession) -> BulkImportResult:
+    """
+        Массовая загрузка сессий из NDJSON/CSV: проверка ссылок и расчёт стоимости
+        выполняются на всю пачку, вставка - одним многострочным INSERT на пачку.
+    """
+    result = BulkImportResult()
+    async for chunk in iter_chunks(request, ParkingSessionCreate, result):
+        vehicle_ids = (await db.execute(
+            select(Vehicle.id).where(Vehicle.id.in_({data.vehicle_id for _, data in chunk})))).scalars().all()
+        space_ids = (await db.execute(
+            select(ParkingSpace.id).where(ParkingSpace.id.in_({data.space_id for _, data in chunk})))).scalars().all()
+        prices = dict((await db.execute(
+            select(Tariff.id, Tariff.price_per_hour).where(Tariff.id.in_({data.tariff_id for _, data in chunk})))).all())
+        vehicle_ids, space_ids = set(vehicle_ids), set(space_ids)
+
+        rows, row_numbers = [], []
+        for row, data in chunk:
+            if data.vehicle_id not in vehicle_ids:
+                result.add_error(row, "Транспортное средство не найдено")
+                continue
+            if data.space_id not in space_ids:
+                result.add_error(row, "Парковочное место не найдено")
+                continue
+            if data.tariff_id not in prices:
+                result.add_error(row, "Тариф не найден")
+                continue
+            time_in = to_naive_datetime(data.time_in)
+            time_out = to_naive_datetime(data.time_out)
+            total_cost = None
+            if time_out:
+                if time_out <= time_in:
+                    result.add_error(row, "Время выхода должно быть позже времени входа")
+                    continue
+                total_cost = parking_cost(time_in, time_out, prices[data.tariff_id])
+            rows.append({
+                'vehicle_id': data.vehicle_id,
+                'space_id': data.space_id,
+                'tariff_id': data.tariff_id,
+                'time_in': time_in,
+                'time_out': time_out,
+                'total_cost': total_cost,
+            })
+            row_numbers.append(row)
+        if not rows:
+            continue
+        try:
+            inserted = (await db.execute(insert(ParkingSession.__table__).returning(
+                ParkingSession.id, ParkingSession.space_id, ParkingSession.time_out), rows)).all()
+            ids = [session.id for session in inserted]
+            await rollups.apply_sessions(db, ids)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for row in row_numbers:
+                result.add_error(row, f"Ошибка при вставке пачки: {str(e)}")
+            continue
+        result.inserted += len(ids)
+        for session in inserted:
+            if session.time_out is None:
+                occupancy.occupy(session.space_id, session.id)
+    if result.inserted:
+        dashboard_cache.invalidate()
+    return result
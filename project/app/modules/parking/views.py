@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional, Literal
 
 from app.core.db import get_db
+from app.core.http_cache import etag_matches, not_modified, set_etag
+from app.core.versions import table_versions, VERSIONED_CACHE_CONTROL
+from app.core.bulk import BulkImportResult
+from app.core.query_budget import query_budget
+from app.core.export import ExportFormat, export_response
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, split_page
+from app.core.responses import columns_of, rows_response
 from app.modules.parking.schemas import (
-    ParkingSpaceCreate, ParkingSpaceUpdate, ParkingSpaceOut,
+    ParkingSpaceCreate, ParkingSpaceUpdate, ParkingSpaceOut, FreeSpacesByType, NextFreeSpace,
     TariffCreate, TariffUpdate, TariffOut,
-    ParkingSessionCreate, ParkingSessionUpdate, ParkingSessionOut
+    ParkingSessionCreate, ParkingSessionUpdate, ParkingSessionOut, ParkingCheckOut
 )
 from app.modules.parking import utils
+from app.modules.parking.occupancy import occupancy
+from app.modules.references.cache import references
 
 from app.models import ParkingSpace, Tariff, ParkingSession
 
@@ -19,19 +30,56 @@ session_router = APIRouter(prefix='/parking-sessions', tags=['Parking Sessions']
 @router.post('/', response_model=ParkingSpaceOut, status_code=status.HTTP_200_OK)
 async def create_parking_space(data: ParkingSpaceCreate, db: AsyncSession = Depends(get_db)):
     parking_space = await utils.create_parking_space(data, db)
-    return ParkingSpaceOut.model_validate(parking_space)
+    return parking_space
 
 @router.get('/', response_model=list[ParkingSpaceOut])
-async def get_parking_spaces(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(ParkingSpace))
-    parking_spaces = result.scalars().all()
-    return parking_spaces
+async def get_parking_spaces(
+    request: Request,
+    response: Response,
+    type_id: Optional[int] = Query(None, description="Тип транспортного средства"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    order: Literal['asc', 'desc'] = Query('asc', description="Направление сортировки"),
+    db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('parking_spaces', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
+    query = select(*columns_of(ParkingSpace, ParkingSpaceOut))
+    if type_id is not None:
+        query = query.where(ParkingSpace.type_id == type_id)
+    keys = [ParkingSpace.id]
+    result = await db.execute(paginate(query, keys, cursor, limit, order == 'desc'))
+    parking_spaces, next_cursor = split_page(result.mappings().all(), keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
+    return rows_response(parking_spaces, response)
+
+@router.get('/free', response_model=list[FreeSpacesByType])
+async def get_free_spaces():
+    return [
+        FreeSpacesByType(type_id=type_id, type_name=references.vehicle_types.name(type_id), total=total, free=free)
+        for type_id, (total, free) in sorted(occupancy.free_counts().items())
+    ]
+
+@router.get('/free/next', response_model=NextFreeSpace)
+async def get_next_free_space(type_id: int = Query(..., description="Тип транспортного средства")):
+    space = occupancy.next_free(type_id)
+    if not space:
+        raise HTTPException(404, 'No free parking space for this vehicle type')
+    space_id, number = space
+    return NextFreeSpace(space_id=space_id, number=number, type_id=type_id,
+                         type_name=references.vehicle_types.name(type_id))
 
 @router.get('/{parking_space_id}', response_model=ParkingSpaceOut)
-async def get_parking_space(parking_space_id: int, db: AsyncSession = Depends(get_db)):
+async def get_parking_space(parking_space_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('parking_spaces', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
     parking_space = await utils.get_parking_space_id(db, parking_space_id)
     if not parking_space:
         raise HTTPException(404, 'Parking space not found')
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
     return parking_space
 
 @router.put('/{parking_space_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -52,19 +100,27 @@ async def delete_parking_space(parking_space_id: int, db: AsyncSession = Depends
 @tariff_router.post('/', response_model=TariffOut, status_code=status.HTTP_200_OK)
 async def create_tariff(data: TariffCreate, db: AsyncSession = Depends(get_db)):
     tariff = await utils.create_tariff(data, db)
-    return TariffOut.model_validate(tariff)
+    return tariff
 
 @tariff_router.get('/', response_model=list[TariffOut])
-async def get_tariffs(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Tariff))
-    tariffs = result.scalars().all()
-    return tariffs
+async def get_tariffs(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('tariffs', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
+    result = await db.execute(select(*columns_of(Tariff, TariffOut)))
+    tariffs = result.mappings().all()
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
+    return rows_response(tariffs, response)
 
 @tariff_router.get('/{tariff_id}', response_model=TariffOut)
-async def get_tariff(tariff_id: int, db: AsyncSession = Depends(get_db)):
+async def get_tariff(tariff_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('tariffs', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
     tariff = await utils.get_tariff_id(db, tariff_id)
     if not tariff:
         raise HTTPException(404, 'Tariff not found')
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
     return tariff
 
 @tariff_router.put('/{tariff_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -85,13 +141,47 @@ async def delete_tariff(tariff_id: int, db: AsyncSession = Depends(get_db)):
 @session_router.post('/', response_model=ParkingSessionOut, status_code=status.HTTP_200_OK)
 async def create_parking_session(data: ParkingSessionCreate, db: AsyncSession = Depends(get_db)):
     session = await utils.create_parking_session(data, db)
-    return ParkingSessionOut.model_validate(session)
+    return session
+
+@session_router.post('/check-out', response_model=ParkingSessionOut)
+@query_budget(2)
+async def check_out_parking_session(data: ParkingCheckOut, db: AsyncSession = Depends(get_db)):
+    session = await utils.check_out_by_plate(db, data)
+    if not session:
+        raise HTTPException(404, 'Open parking session not found')
+    return session
 
 @session_router.get('/', response_model=list[ParkingSessionOut])
-async def get_parking_sessions(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(ParkingSession))
-    sessions = result.scalars().all()
-    return sessions
+async def get_parking_sessions(
+    response: Response,
+    start_date: Optional[datetime] = Query(None, description="Время въезда не раньше"),
+    end_date: Optional[datetime] = Query(None, description="Время въезда не позже"),
+    vehicle_id: Optional[int] = Query(None, description="Транспортное средство"),
+    space_id: Optional[int] = Query(None, description="Парковочное место"),
+    is_open: Optional[bool] = Query(None, description="true - активные сессии, false - закрытые"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    sort: Literal['id', 'time_in'] = Query('id', description="Поле сортировки"),
+    order: Literal['asc', 'desc'] = Query('asc', description="Направление сортировки"),
+    db: AsyncSession = Depends(get_db)):
+    query = select(*columns_of(ParkingSession, ParkingSessionOut)).where(
+        *utils.parking_sessions_filter(start_date, end_date, vehicle_id, space_id, is_open))
+    keys = [ParkingSession.time_in, ParkingSession.id] if sort == 'time_in' else [ParkingSession.id]
+    result = await db.execute(paginate(query, keys, cursor, limit, order == 'desc'))
+    sessions, next_cursor = split_page(result.mappings().all(), keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows_response(sessions, response)
+
+@session_router.get('/export')
+async def export_parking_sessions(
+    start_date: Optional[datetime] = Query(None, description="Время въезда не раньше"),
+    end_date: Optional[datetime] = Query(None, description="Время въезда не позже"),
+    format: ExportFormat = Query('csv', description="Формат: csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip")):
+    query = select(*ParkingSession.__table__.columns).where(
+        *utils.parking_sessions_filter(start_date, end_date)).order_by(ParkingSession.id)
+    return export_response(query, format, 'parking_sessions', gzip)
 
 @session_router.get('/{session_id}', response_model=ParkingSessionOut)
 async def get_parking_session(session_id: int, db: AsyncSession = Depends(get_db)):
@@ -107,3 +197,10 @@ async def update_parking_session(session_id: int, data: ParkingSessionUpdate, db
         raise HTTPException(404, 'Parking session not found')
     return session
 
+@session_router.post('/bulk', response_model=BulkImportResult)
+@query_budget(None)
+async def bulk_create_parking_sessions(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+        Тело запроса - NDJSON (по строке JSON на запись) или CSV с заголовком (Content-Type: text/csv).
+    """
+    return await utils.bulk_create_parking_sessions(request, db)
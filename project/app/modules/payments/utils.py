@@ -1,10 +1,15 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
+from sqlalchemy import select, insert, func, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from app.models.payments import Payment
 from app.models.parking_session import ParkingSession
+from app.core.crud import changed_fields, update_returning
+from app.modules.references.cache import references
+from app.core.bulk import BulkImportResult, iter_chunks
 from app.modules.payments.schemas import PaymentCreate, PaymentUpdate
+from app.modules.reports.cache import dashboard_cache
 from typing import Optional
 
 
@@ -18,30 +23,29 @@ def to_naive_datetime(dt: datetime) -> datetime:
 async def create_payment(data: PaymentCreate, db: AsyncSession) -> Optional[Payment]:
     try:
 
-        session = await db.get(ParkingSession, data.session_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Сессия парковки не найдена"
-            )
-        amount = data.amount
-        if amount is None:
-            if session.total_cost is None:
+        # Сумма по умолчанию берётся из total_cost сессии прямо в INSERT ... SELECT:
+        # проверка сессии и вставка - один запрос
+        amount = func.coalesce(literal(data.amount, Payment.amount.type), ParkingSession.total_cost)
+        source = select(
+            ParkingSession.id, amount, literal(data.method_id), literal(to_naive_datetime(data.time), Payment.time.type)
+        ).where(ParkingSession.id == data.session_id, amount.isnot(None))
+        result = await db.execute(
+            insert(Payment).from_select(['session_id', 'amount', 'method_id', 'time'], source).returning(Payment))
+        db_payment = result.scalar_one_or_none()
+        if db_payment is None:
+            await db.rollback()
+            session = await db.get(ParkingSession, data.session_id)
+            if not session:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Сумма платежа не указана и не может быть получена из сессии (total_cost не установлен)"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Сессия парковки не найдена"
                 )
-            amount = session.total_cost
-        
-        db_payment = Payment(
-            session_id=data.session_id,
-            amount=amount,
-            method_id=data.method_id,
-            time=to_naive_datetime(data.time)
-        )
-        db.add(db_payment)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Сумма платежа не указана и не может быть получена из сессии (total_cost не установлен)"
+            )
         await db.commit()
-        await db.refresh(db_payment)
+        dashboard_cache.invalidate()
         return db_payment
     except HTTPException:
         raise
@@ -52,24 +56,83 @@ async def create_payment(data: PaymentCreate, db: AsyncSession) -> Optional[Paym
             detail=f"Ошибка при создании платежа: {str(e)}"
         )
 
+def payments_filter(start_date: Optional[datetime], end_date: Optional[datetime],
+                    session_id: Optional[int] = None, method_id: Optional[int] = None) -> list:
+    conditions = []
+    if start_date:
+        conditions.append(Payment.time >= to_naive_datetime(start_date))
+    if end_date:
+        conditions.append(Payment.time <= to_naive_datetime(end_date))
+    if session_id is not None:
+        conditions.append(Payment.session_id == session_id)
+    if method_id is not None:
+        conditions.append(Payment.method_id == method_id)
+    return conditions
+
 async def get_payment_id(db: AsyncSession, payment_id: int) -> Optional[Payment]:
     payment = await db.get(Payment, payment_id)
     return payment
 
 async def update_payment(db: AsyncSession, payment_id: int, data: PaymentUpdate) -> Optional[Payment]:
-    payment = await get_payment_id(db, payment_id)
+    values = changed_fields(data)
+    if 'time' in values:
+        values['time'] = to_naive_datetime(values['time'])
+    # Внешний ключ на реестр id сессий отложенный и сработает только при commit;
+    # отсутствующая сессия - 404 до записи
+    if 'session_id' in values and not await db.scalar(
+            select(select(ParkingSession.id).where(ParkingSession.id == values['session_id']).exists())):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Сессия парковки не найдена"
+        )
+    payment = await update_returning(db, Payment, payment_id, values)
     if not payment:
         return None
-    if data.session_id is not None:
-        payment.session_id = data.session_id
-    if data.amount is not None:
-        payment.amount = data.amount
-    if data.method_id is not None:
-        payment.method_id = data.method_id
-    if data.time is not None:
-        payment.time = to_naive_datetime(data.time)
-    db.add(payment)
     await db.commit()
-    await db.refresh(payment)
     return payment
 
+async def bulk_create_payments(request: Request, db: AsyncSession) -> BulkImportResult:
+    """
+        Массовая загрузка платежей из NDJSON/CSV. Сумма без значения берётся из
+        total_cost сессии, сессии и способы оплаты проверяются одним запросом на пачку.
+    """
+    result = BulkImportResult()
+    await references.ensure_loaded(db)
+    async for chunk in iter_chunks(request, PaymentCreate, result):
+        session_costs = dict((await db.execute(
+            select(ParkingSession.id, ParkingSession.total_cost).where(
+                ParkingSession.id.in_({data.session_id for _, data in chunk})))).all())
+
+        rows, row_numbers = [], []
+        for row, data in chunk:
+            if data.session_id not in session_costs:
+                result.add_error(row, "Сессия парковки не найдена")
+                continue
+            if data.method_id not in references.payment_methods:
+                result.add_error(row, "Способ оплаты не найден")
+                continue
+            amount = data.amount if data.amount is not None else session_costs[data.session_id]
+            if amount is None:
+                result.add_error(row, "Сумма платежа не указана и не может быть получена из сессии (total_cost не установлен)")
+                continue
+            rows.append({
+                'session_id': data.session_id,
+                'amount': amount,
+                'method_id': data.method_id,
+                'time': to_naive_datetime(data.time),
+            })
+            row_numbers.append(row)
+        if not rows:
+            continue
+        try:
+            await db.execute(insert(Payment.__table__), rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for row in row_numbers:
+                result.add_error(row, f"Ошибка при вставке пачки: {str(e)}")
+            continue
+        result.inserted += len(rows)
+    if result.inserted:
+        dashboard_cache.invalidate()
+    return result
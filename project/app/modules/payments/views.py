@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional, Literal
 
 from app.core.db import get_db
+from app.core.bulk import BulkImportResult
+from app.core.query_budget import query_budget
+from app.core.export import ExportFormat, export_response
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, split_page
+from app.core.responses import columns_of, rows_response
 from app.modules.payments.schemas import PaymentCreate, PaymentUpdate, PaymentOut
 from app.modules.payments import utils
 
@@ -11,15 +18,39 @@ from app.models import Payment
 router = APIRouter(prefix='/payments', tags=['Payments'])
 
 @router.post('/', response_model=PaymentOut, status_code=status.HTTP_200_OK)
+@query_budget(2)
 async def create_payment(data: PaymentCreate, db: AsyncSession = Depends(get_db)):
     payment = await utils.create_payment(data, db)
-    return PaymentOut.model_validate(payment)
+    return payment
 
 @router.get('/', response_model=list[PaymentOut])
-async def get_payments(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Payment))
-    payments = result.scalars().all()
-    return payments
+async def get_payments(
+    response: Response,
+    start_date: Optional[datetime] = Query(None, description="Время платежа не раньше"),
+    end_date: Optional[datetime] = Query(None, description="Время платежа не позже"),
+    session_id: Optional[int] = Query(None, description="Сессия парковки"),
+    method_id: Optional[int] = Query(None, description="Способ оплаты"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    order: Literal['asc', 'desc'] = Query('asc', description="Направление сортировки"),
+    db: AsyncSession = Depends(get_db)):
+    query = select(*columns_of(Payment, PaymentOut)).where(*utils.payments_filter(start_date, end_date, session_id, method_id))
+    keys = [Payment.id]
+    result = await db.execute(paginate(query, keys, cursor, limit, order == 'desc'))
+    payments, next_cursor = split_page(result.mappings().all(), keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows_response(payments, response)
+
+@router.get('/export')
+async def export_payments(
+    start_date: Optional[datetime] = Query(None, description="Время платежа не раньше"),
+    end_date: Optional[datetime] = Query(None, description="Время платежа не позже"),
+    format: ExportFormat = Query('csv', description="Формат: csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip")):
+    query = select(*Payment.__table__.columns).where(
+        *utils.payments_filter(start_date, end_date)).order_by(Payment.id)
+    return export_response(query, format, 'payments', gzip)
 
 @router.get('/{payment_id}', response_model=PaymentOut)
 async def get_payment(payment_id: int, db: AsyncSession = Depends(get_db)):
@@ -35,3 +66,10 @@ async def update_payment(payment_id: int, data: PaymentUpdate, db: AsyncSession
         raise HTTPException(404, 'Payment not found')
     return payment
 
+@router.post('/bulk', response_model=BulkImportResult)
+@query_budget(None)
+async def bulk_create_payments(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+        Тело запроса - NDJSON (по строке JSON на запись) или CSV с заголовком (Content-Type: text/csv).
+    """
+    return await utils.bulk_create_payments(request, db)
@@ -0,0 +1,52 @@
+"""
+    Справочники (типы ТС, способы оплаты) в памяти процесса. Меняются только
+    seed-миграциями, то есть с выкладкой, поэтому загружаются один раз при старте.
+    Ответы API сериализуются заранее, ETag - хэш тела.
+"""
+import hashlib
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import VehicleType, PaymentMethod
+
+REFERENCES_CACHE_CONTROL = 'public, max-age=3600'
+
+
+class ReferenceTable:
+
+    def __init__(self, rows=()):
+        self.names: Dict[int, str] = dict(rows)
+        self.body = json.dumps(
+            [{'id': id, 'name': name} for id, name in sorted(self.names.items())],
+            ensure_ascii=False, separators=(',', ':')).encode()
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=12).hexdigest()}"'
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.names
+
+    def name(self, id: int) -> Optional[str]:
+        return self.names.get(id)
+
+
+class ReferenceData:
+
+    def __init__(self):
+        self.loaded = False
+        self.vehicle_types = ReferenceTable()
+        self.payment_methods = ReferenceTable()
+
+    async def load(self, db: AsyncSession) -> None:
+        self.vehicle_types = ReferenceTable((await db.execute(select(VehicleType.id, VehicleType.name))).all())
+        self.payment_methods = ReferenceTable((await db.execute(select(PaymentMethod.id, PaymentMethod.name))).all())
+        self.loaded = True
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        # Для процессов без lifespan (скрипты, ASGI-транспорт в проверках)
+        if not self.loaded:
+            await self.load(db)
+
+
+references = ReferenceData()
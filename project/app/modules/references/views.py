@@ -1,22 +1,28 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_db
+from app.core.http_cache import etag_matches, not_modified
 from app.modules.references.schemas import VehicleTypeOut, PaymentMethodOut
-from app.models import VehicleType, PaymentMethod
+from app.modules.references.cache import references, ReferenceTable, REFERENCES_CACHE_CONTROL
 
 router = APIRouter(prefix='/references', tags=['References'])
 
+
+def reference_response(request: Request, table: ReferenceTable) -> Response:
+    if etag_matches(request, table.etag):
+        return not_modified(table.etag, REFERENCES_CACHE_CONTROL)
+    return Response(table.body, media_type='application/json', headers={
+        'ETag': table.etag,
+        'Cache-Control': REFERENCES_CACHE_CONTROL,
+    })
+
 @router.get('/vehicle-types', response_model=list[VehicleTypeOut])
-async def get_vehicle_types(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(VehicleType))
-    vehicle_types = result.scalars().all()
-    return vehicle_types
+async def get_vehicle_types(request: Request, db: AsyncSession = Depends(get_db)):
+    await references.ensure_loaded(db)
+    return reference_response(request, references.vehicle_types)
 
 @router.get('/payment-methods', response_model=list[PaymentMethodOut])
-async def get_payment_methods(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(PaymentMethod))
-    payment_methods = result.scalars().all()
-    return payment_methods
-
+async def get_payment_methods(request: Request, db: AsyncSession = Depends(get_db)):
+    await references.ensure_loaded(db)
+    return reference_response(request, references.payment_methods)
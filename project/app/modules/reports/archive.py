@@ -0,0 +1,422 @@
+"""
+    Холодный архив закрытых сессий и платежей в Parquet.
+
+    python -m app.modules.reports.archive [--before ГГГГ-ММ] переносит закрытые сессии
+    (по месяцу time_in) и платежи (по месяцу time) всех месяцев раньше before - по
+    умолчанию старше ARCHIVE_AFTER_MONTHS - в файлы
+    ARCHIVE_DIR/<таблица>/month=ГГГГ-ММ/part-<uuid>.parquet (колоночный формат, сжатие
+    ARCHIVE_COMPRESSION, строки отсортированы по ключу секционирования).
+
+    Каждый месяц переносится одной транзакцией: строки удаляются из БД, а файлы
+    регистрируются в archive_files. Отчёты читают только зарегистрированные файлы, так что
+    файл, записанный до сбоя перед commit, не учитывается дважды - его удаляет следующий
+    запуск. Опустевшие секции после переноса удаляются.
+
+    Суточные роллапы вклад архивных сессий сохраняют, поэтому выручка и сессии по
+    интервалам (get_revenue_by_period, get_sessions_by_period) читаются из них как раньше.
+    Вклад месяца пишется и в архив (daily_revenue/, daily_sessions/), rollups.rebuild
+    добавляет его после пересчёта по parking_sessions. Выручка и количество сессий за
+    период складываются из БД и архивных файлов, пересекающихся с периодом по границам
+    времени из archive_files.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Date, DateTime, Integer, Numeric, String, Table, delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.partitions import MAINTENANCE_LOCK, PARTITIONED_TABLES, add_months, detach_expired, month_start
+from app.core.versions import table_versions
+from app.models.archive import ArchiveFile
+from app.models.parking_session import ParkingSession, ParkingSessionId
+from app.models.payments import Payment
+from app.models.rollups import DailyRevenue, DailySessions
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TABLES: Dict[str, Table] = {
+    'parking_sessions': ParkingSession.__table__,
+    'payments': Payment.__table__,
+    'daily_revenue': DailyRevenue.__table__,
+    'daily_sessions': DailySessions.__table__,
+}
+# Одновременно работает один архиватор
+ARCHIVE_LOCK = 0x61726368
+ROW_GROUP_SIZE = 65536
+REVENUE_SCALE = Decimal(1).scaleb(-DailyRevenue.revenue.type.scale)
+
+
+def arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision, column_type.scale)
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, String):
+        return pa.string()
+    raise TypeError(f"Нет типа Parquet для {column}")
+
+
+def arrow_schema(table: Table) -> pa.Schema:
+    return pa.schema([pa.field(column.name, arrow_type(column), nullable=bool(column.nullable))
+                      for column in table.columns])
+
+
+def month_directory(table_name: str, month: date) -> str:
+    return f'{table_name}/month={month:%Y-%m}'
+
+
+def write_parquet(table_name: str, month: date, rows: list) -> str:
+    """
+        Записывает строки (в порядке колонок таблицы) в новый файл месяца и возвращает путь
+        относительно ARCHIVE_DIR. Файл пишется под временным именем и переименовывается
+        после fsync: под именем part-*.parquet лежат только целые файлы.
+    """
+    schema = arrow_schema(ARCHIVED_TABLES[table_name])
+    arrays = [pa.array(values, type=schema.field(index).type) for index, values in enumerate(zip(*rows))]
+    data = pa.Table.from_arrays(arrays, schema=schema)
+    path = f'{month_directory(table_name, month)}/part-{uuid.uuid4().hex}.parquet'
+    target = Path(settings.ARCHIVE_DIR) / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_suffix('.tmp')
+    pq.write_table(data, temporary, compression=settings.ARCHIVE_COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    with open(temporary, 'rb') as written:
+        os.fsync(written.fileno())
+    os.replace(temporary, target)
+    return path
+
+
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            (Path(settings.ARCHIVE_DIR) / path).unlink()
+        except FileNotFoundError:
+            pass
+
+
+@dataclass(frozen=True)
+class ArchivedFile:
+    path: str
+    min_time: datetime
+    max_time: datetime
+
+
+class ArchiveManifest:
+    """
+        Список файлов archive_files в памяти процесса. Загружается при старте и перечитывается
+        в фоне по NOTIFY новой версии archive_files (архиватор увеличивает её при commit).
+        Запрос читает список сам, только если версия успела смениться раньше фонового
+        обновления или версии таблиц не загружены.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._files: Dict[str, List[ArchivedFile]] = {}
+
+    async def load(self, db: AsyncSession) -> None:
+        # Версия - до чтения: файл, добавленный между ними, приведёт к лишнему перечитыванию, но не к пропуску
+        version = table_versions.get('archive_files') if table_versions.loaded else None
+        rows = (await db.execute(select(
+            ArchiveFile.table_name, ArchiveFile.path, ArchiveFile.min_time, ArchiveFile.max_time
+        ).order_by(ArchiveFile.month, ArchiveFile.path))).all()
+        files: Dict[str, List[ArchivedFile]] = {}
+        for row in rows:
+            files.setdefault(row.table_name, []).append(ArchivedFile(row.path, row.min_time, row.max_time))
+        self._files, self.version = files, version
+
+    async def files(self, db: AsyncSession, table_name: str) -> List[ArchivedFile]:
+        version = table_versions.get('archive_files') if table_versions.loaded else None
+        if version is None or version != self.version:
+            await self.load(db)
+        return self._files.get(table_name, [])
+
+    async def overlapping(self, db: AsyncSession, table_name: str,
+                          start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+        return [
+            str(Path(settings.ARCHIVE_DIR) / file.path)
+            for file in await self.files(db, table_name)
+            if (end is None or file.min_time <= end) and (start is None or file.max_time >= start)
+        ]
+
+
+manifest = ArchiveManifest()
+table_versions.on_change('archive_files', manifest.load)
+
+
+def _closed_revenue(paths: List[str], start: Optional[datetime], end: Optional[datetime]) -> Tuple[Decimal, int]:
+    # Тот же фильтр, что reports.utils.closed_sessions_filter
+    condition = ds.field('time_out').is_valid() & ds.field('total_cost').is_valid()
+    if start:
+        condition &= ds.field('time_out') >= start
+    if end:
+        condition &= ds.field('time_in') <= end
+    costs = ds.dataset(paths, format='parquet').to_table(columns=['total_cost'], filter=condition)['total_cost']
+    total = pc.sum(costs).as_py()
+    return total or Decimal(0), len(costs)
+
+
+def _started_count(paths: List[str], start: Optional[datetime], end: Optional[datetime]) -> int:
+    # Тот же фильтр, что reports.utils.sessions_started_filter
+    condition = ds.field('time_in').is_valid()
+    if start:
+        condition &= ds.field('time_in') >= start
+    if end:
+        condition &= ds.field('time_in') <= end
+    return ds.dataset(paths, format='parquet').count_rows(filter=condition)
+
+
+def _period_summary(paths: List[str], start: Optional[datetime], end: Optional[datetime]) -> Tuple[Decimal, int, int]:
+    return (*_closed_revenue(paths, start, end), _started_count(paths, start, end))
+
+
+async def revenue_summary(db: AsyncSession, start: Optional[datetime], end: Optional[datetime]) -> Tuple[Decimal, int]:
+    """
+        Выручка и количество оплаченных архивных сессий, пересекающихся с периодом.
+    """
+    paths = await manifest.overlapping(db, 'parking_sessions', start, end)
+    if not paths:
+        return Decimal(0), 0
+    return await asyncio.to_thread(_closed_revenue, paths, start, end)
+
+
+async def sessions_count(db: AsyncSession, start: Optional[datetime], end: Optional[datetime]) -> int:
+    """
+        Количество архивных сессий с въездом в период.
+    """
+    # min_time файла сессий - самый ранний въезд, max_time - самый поздний выезд (не раньше въезда)
+    paths = await manifest.overlapping(db, 'parking_sessions', start, end)
+    if not paths:
+        return 0
+    return await asyncio.to_thread(_started_count, paths, start, end)
+
+
+async def period_summary(db: AsyncSession, start: Optional[datetime], end: Optional[datetime]) -> Tuple[Decimal, int, int]:
+    """
+        revenue_summary и sessions_count за один проход по списку файлов - для дашборда.
+    """
+    paths = await manifest.overlapping(db, 'parking_sessions', start, end)
+    if not paths:
+        return Decimal(0), 0, 0
+    return await asyncio.to_thread(_period_summary, paths, start, end)
+
+
+def _rollup_rows(table_name: str, paths: List[str], start: Optional[date], end: Optional[date]) -> List[dict]:
+    condition = ds.field('day').is_valid()
+    if start:
+        condition &= ds.field('day') >= start
+    if end:
+        condition &= ds.field('day') < end
+    data = ds.dataset(paths, format='parquet').to_table(filter=condition)
+    # Вклад сессий месяца заходит в дни следующего, у которого свой файл: ключи складываются
+    keys = ['day', 'tariff_id', 'vehicle_type_id']
+    value = [name for name in data.column_names if name not in keys][0]
+    summed = data.group_by(keys).aggregate([(value, 'sum')]).rename_columns(keys + [value])
+    return summed.to_pylist()
+
+
+async def rollup_rows(db: AsyncSession, table_name: str, start: Optional[date], end: Optional[date]) -> List[dict]:
+    """
+        Вклад архивных сессий в суточный роллап table_name за дни [start, end).
+    """
+    paths = await manifest.overlapping(
+        db, table_name,
+        datetime.combine(start, time.min) if start else None,
+        datetime.combine(end, time.min) if end else None)
+    if not paths:
+        return []
+    return await asyncio.to_thread(_rollup_rows, table_name, paths, start, end)
+
+
+@dataclass
+class ArchiveResult:
+    # (месяц, сессий, платежей) по перенесённым месяцам
+    months: list = field(default_factory=list)
+    files: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    dropped: list = field(default_factory=list)
+    skipped: bool = False
+
+
+async def _lock(db: AsyncSession) -> bool:
+    # Блокировка до конца транзакции: commit месяца отпускает её
+    return await db.scalar(select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK)))
+
+
+async def remove_orphans(db: AsyncSession) -> List[str]:
+    """
+        Удаляет файлы, не попавшие в archive_files (запись прервана до commit).
+        Вызывается под блокировкой архиватора.
+    """
+    registered = set((await db.scalars(select(ArchiveFile.path))).all())
+    root = Path(settings.ARCHIVE_DIR)
+    orphans = [
+        path.relative_to(root).as_posix()
+        for table_name in ARCHIVED_TABLES
+        for path in (root / table_name).glob('month=*/part-*')
+        if path.relative_to(root).as_posix() not in registered
+    ]
+    remove_files(orphans)
+    return orphans
+
+
+async def archive_month(db: AsyncSession, month: date) -> Optional[Tuple[int, int, List[str]]]:
+    """
+        Переносит закрытые сессии и платежи месяца одной транзакцией. None - архиватор
+        уже работает в другом процессе.
+    """
+    from app.modules.reports import rollups
+
+    if not await _lock(db):
+        await db.rollback()
+        return None
+    start = datetime.combine(month, time.min)
+    end = datetime.combine(add_months(month, 1), time.min)
+    sessions_table = ARCHIVED_TABLES['parking_sessions']
+    payments_table = ARCHIVED_TABLES['payments']
+    closed = [sessions_table.c.time_in >= start, sessions_table.c.time_in < end, sessions_table.c.time_out.isnot(None)]
+    # Вклад в роллапы - до удаления: rollups.rebuild добавит его к пересчёту по БД
+    revenue, started = await rollups.contributions(db, closed)
+    revenue = [(day, tariff_id, vehicle_type_id, amount.quantize(REVENUE_SCALE))
+               for day, tariff_id, vehicle_type_id, amount in revenue]
+    sessions = (await db.execute(
+        delete(sessions_table).where(*closed).returning(*sessions_table.c))).all()
+    payments = (await db.execute(
+        delete(payments_table).where(payments_table.c.time >= start, payments_table.c.time < end)
+        .returning(*payments_table.c))).all()
+    if sessions:
+        # Триггер удаления снял id с реестра; они возвращаются: сессия есть в архиве, и платежи
+        # следующих, ещё не перенесённых месяцев продолжают на неё ссылаться
+        await db.execute(insert(ParkingSessionId).from_select(
+            ['id'], select(func.unnest(literal([row.id for row in sessions], ARRAY(Integer))))))
+    sessions.sort(key=lambda row: (row.time_in, row.id))
+    payments.sort(key=lambda row: (row.time, row.id))
+
+    written = []
+
+    async def register(table_name: str, rows: list, min_time: datetime, max_time: datetime) -> None:
+        path = await asyncio.to_thread(write_parquet, table_name, month, rows)
+        written.append(path)
+        db.add(ArchiveFile(path=path, table_name=table_name, month=month, rows=len(rows),
+                           min_time=min_time, max_time=max_time))
+
+    def days(rows: list) -> Tuple[datetime, datetime]:
+        return (datetime.combine(min(row[0] for row in rows), time.min),
+                datetime.combine(max(row[0] for row in rows), time.min))
+
+    try:
+        if sessions:
+            await register('parking_sessions', sessions, sessions[0].time_in, max(row.time_out for row in sessions))
+        if payments:
+            await register('payments', payments, payments[0].time, payments[-1].time)
+        if revenue:
+            await register('daily_revenue', revenue, *days(revenue))
+        if started:
+            await register('daily_sessions', started, *days(started))
+        if written:
+            await table_versions.bump(db, 'archive_files')
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        remove_files(written)
+        raise
+    return len(sessions), len(payments), written
+
+
+async def drop_empty_partitions(before: date) -> List[str]:
+    connection = await asyncpg.connect(settings.LISTEN_DATABASE_URL)
+    dropped = []
+    try:
+        # Вместе с обслуживанием секций не выполняется
+        if not await connection.fetchval('SELECT pg_try_advisory_lock($1)', MAINTENANCE_LOCK):
+            return dropped
+        try:
+            for table in PARTITIONED_TABLES:
+                try:
+                    dropped += await detach_expired(connection, table, before, drop=True, empty_only=True)
+                except asyncpg.exceptions.LockNotAvailableError:
+                    logger.warning("Секции %s не удалены: таблица занята, повтор при следующем запуске", table)
+        finally:
+            await connection.execute('SELECT pg_advisory_unlock($1)', MAINTENANCE_LOCK)
+    finally:
+        await connection.close()
+    return dropped
+
+
+async def archive(before: date) -> ArchiveResult:
+    """
+        Переносит в архив закрытые сессии и платежи всех месяцев раньше before.
+    """
+    result = ArchiveResult()
+    async with AsyncSessionLocal() as db:
+        if not await _lock(db):
+            result.skipped = True
+            return result
+        result.removed = await remove_orphans(db)
+        first = await db.scalar(select(func.least(
+            select(func.min(ParkingSession.time_in)).where(
+                ParkingSession.time_in < before, ParkingSession.time_out.isnot(None)).scalar_subquery(),
+            select(func.min(Payment.time)).where(Payment.time < before).scalar_subquery())))
+        await db.commit()
+        month = month_start(first.date()) if first else before
+        while month < before:
+            archived = await archive_month(db, month)
+            if archived is None:
+                result.skipped = True
+                return result
+            sessions, payments, files = archived
+            if files:
+                result.months.append((month, sessions, payments))
+                result.files += files
+                logger.info("Архив %s: %d сессий, %d платежей", f'{month:%Y-%m}', sessions, payments)
+            month = add_months(month, 1)
+    result.dropped = await drop_empty_partitions(before)
+    return result
+
+
+def parse_month(value: str) -> date:
+    return date.fromisoformat(f'{value}-01')
+
+
+async def main() -> None:
+    from app.core.db import engine
+
+    parser = argparse.ArgumentParser(description="Перенос закрытых сессий и платежей в архив Parquet")
+    parser.add_argument('--before', type=parse_month, default=None,
+                        help="Первый месяц, остающийся в БД (ГГГГ-ММ); по умолчанию - ARCHIVE_AFTER_MONTHS назад")
+    args = parser.parse_args()
+    before = args.before or add_months(month_start(datetime.utcnow().date()), -settings.ARCHIVE_AFTER_MONTHS)
+    result = await archive(before)
+    await engine.dispose()
+    if result.skipped:
+        print("Архивация выполняется другим процессом")
+    for month, sessions, payments in result.months:
+        print(f"{month:%Y-%m}: сессий {sessions}, платежей {payments}")
+    if result.removed:
+        print(f"удалены незарегистрированные файлы: {', '.join(result.removed)}")
+    print(f"файлов: {len(result.files)}; удалены секции: {', '.join(result.dropped) or '-'}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+import asyncpg
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Триггеры таблиц, которые читает дашборд, отправляют его при каждой записи
+DASHBOARD_CHANNEL = 'dashboard_changed'
+
+
+class DashboardCache:
+    """
+        Кэш данных дашборда по периоду (day/week/month) с TTL.
+        Сбрасывается явно из операций записи через invalidate(), а в остальных процессах -
+        по NOTIFY dashboard_changed (listen_for_invalidations); поколение защищает
+        от сохранения результата, посчитанного до сброса.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._entries: Dict[str, Tuple[float, dict]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lookup(self, period: str):
+        entry = self._entries.get(period)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def get_or_compute(self, period: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        data = self._lookup(period)
+        if data is not None:
+            self.hits += 1
+            return data
+        lock = self._locks.setdefault(period, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, данные мог посчитать другой запрос
+            data = self._lookup(period)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            generation = self._generation
+            data = await compute()
+            if generation == self._generation:
+                self._entries[period] = (time.monotonic() + self.ttl, data)
+            return data
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'ttl': self.ttl,
+        }
+
+
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_TTL)
+
+
+async def listen_for_invalidations(dsn: str, retry_interval: float = 5.0) -> None:
+    """
+        LISTEN dashboard_changed на отдельном соединении: кэш сбрасывается после commit
+        записей любого процесса. После переподключения кэш тоже сбрасывается, так как
+        уведомления за время разрыва потеряны.
+    """
+    def on_notify(connection, pid, channel, payload):
+        dashboard_cache.invalidate()
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(DASHBOARD_CHANNEL, on_notify)
+            dashboard_cache.invalidate()
+            while not connection.is_closed():
+                await asyncio.sleep(retry_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Соединение LISTEN для кэша дашборда потеряно")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_interval)
@@ -0,0 +1,152 @@
+"""
+    Суточные роллапы выручки и количества сессий в разрезе тарифа и типа ТС.
+    Поддерживаются инкрементально при записи сессий и пересобираются командой
+    python -m app.modules.reports.rollups [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    Вклад сессий, перенесённых в архив (reports.archive), пересборка берёт из архива.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, cast, Date
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.parking_session import ParkingSession
+from app.models.vehicles import Vehicle
+from app.models.rollups import DailyRevenue, DailySessions
+from app.modules.reports import archive
+from app.modules.reports.utils import prorated_shares
+
+# Строк архивных роллапов на один INSERT: 4 параметра на строку
+ARCHIVED_ROWS_CHUNK = 5000
+
+
+def _upsert_revenue(rows):
+    stmt = insert(DailyRevenue).from_select(['day', 'tariff_id', 'vehicle_type_id', 'revenue'], rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['day', 'tariff_id', 'vehicle_type_id'],
+        set_={'revenue': DailyRevenue.revenue + stmt.excluded.revenue})
+
+
+def _upsert_sessions(rows):
+    stmt = insert(DailySessions).from_select(['day', 'tariff_id', 'vehicle_type_id', 'sessions_count'], rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['day', 'tariff_id', 'vehicle_type_id'],
+        set_={'sessions_count': DailySessions.sessions_count + stmt.excluded.sessions_count})
+
+
+def _revenue_rows(conditions: list, sign: int = 1, start: Optional[date] = None, end: Optional[date] = None):
+    shares = prorated_shares('day', conditions, with_dimensions=True).subquery()
+    day = cast(shares.c.bucket_start, Date)
+    query = select(
+        day, shares.c.tariff_id, shares.c.vehicle_type_id, func.sum(shares.c.share) * sign
+    ).group_by(day, shares.c.tariff_id, shares.c.vehicle_type_id)
+    if start:
+        query = query.where(day >= start)
+    if end:
+        query = query.where(day < end)
+    return query
+
+
+def _sessions_rows(conditions: list, sign: int = 1):
+    day = cast(ParkingSession.time_in, Date)
+    return select(
+        day, ParkingSession.tariff_id, Vehicle.type_id, func.count(ParkingSession.id) * sign
+    ).join(
+        Vehicle, Vehicle.id == ParkingSession.vehicle_id
+    ).where(*conditions).group_by(day, ParkingSession.tariff_id, Vehicle.type_id)
+
+
+async def apply_session(db: AsyncSession, session_id: int, sign: int = 1) -> None:
+    """
+        Добавляет (sign=1) или вычитает (sign=-1) вклад сессии в роллапы по её текущему
+        состоянию в БД. Вызывается в той же транзакции, что и запись сессии.
+    """
+    await apply_sessions(db, [session_id], sign)
+
+
+async def apply_sessions(db: AsyncSession, session_ids: List[int], sign: int = 1) -> None:
+    if not session_ids:
+        return
+    await db.flush()
+    condition = [ParkingSession.id == session_ids[0]] if len(session_ids) == 1 else [ParkingSession.id.in_(session_ids)]
+    await db.execute(_upsert_sessions(_sessions_rows(condition, sign)))
+    await db.execute(_upsert_revenue(_revenue_rows(condition, sign)))
+
+
+async def apply_revenue(db: AsyncSession, session_ids: List[int], sign: int = 1) -> None:
+    """
+        Только вклад в daily_revenue: для закрытия открытой сессии, у которой до закрытия
+        не было выручки, а счётчик сессий по дню въезда не меняется.
+    """
+    if not session_ids:
+        return
+    condition = [ParkingSession.id == session_ids[0]] if len(session_ids) == 1 else [ParkingSession.id.in_(session_ids)]
+    await db.execute(_upsert_revenue(_revenue_rows(condition, sign)))
+
+
+async def contributions(db: AsyncSession, conditions: list) -> Tuple[list, list]:
+    """
+        Вклад сессий под условиями в daily_revenue и daily_sessions: строки
+        (day, tariff_id, vehicle_type_id, значение). Для архивации (reports.archive).
+    """
+    revenue = (await db.execute(_revenue_rows(conditions))).all()
+    sessions = (await db.execute(_sessions_rows(conditions))).all()
+    return [tuple(row) for row in revenue], [tuple(row) for row in sessions]
+
+
+async def _restore_archived(db: AsyncSession, start: Optional[date], end: Optional[date]) -> None:
+    # Сессий из архива в parking_sessions нет: их вклад возвращается из архивных роллапов
+    for model, value in ((DailyRevenue, 'revenue'), (DailySessions, 'sessions_count')):
+        rows = await archive.rollup_rows(db, model.__tablename__, start, end)
+        for offset in range(0, len(rows), ARCHIVED_ROWS_CHUNK):
+            stmt = insert(model).values(rows[offset:offset + ARCHIVED_ROWS_CHUNK])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=['day', 'tariff_id', 'vehicle_type_id'],
+                set_={value: getattr(model, value) + stmt.excluded[value]}))
+
+
+async def rebuild(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """
+        Пересчитывает роллапы за дни [start, end) из parking_sessions и архива.
+    """
+    for model in (DailyRevenue, DailySessions):
+        query = delete(model)
+        if start:
+            query = query.where(model.day >= start)
+        if end:
+            query = query.where(model.day < end)
+        await db.execute(query)
+
+    revenue_conditions = []
+    sessions_conditions = []
+    if start:
+        start_dt = datetime.combine(start, datetime.min.time())
+        revenue_conditions.append(ParkingSession.time_out >= start_dt)
+        sessions_conditions.append(ParkingSession.time_in >= start_dt)
+    if end:
+        end_dt = datetime.combine(end, datetime.min.time())
+        revenue_conditions.append(ParkingSession.time_in < end_dt)
+        sessions_conditions.append(ParkingSession.time_in < end_dt)
+    await db.execute(_upsert_sessions(_sessions_rows(sessions_conditions)))
+    await db.execute(_upsert_revenue(_revenue_rows(revenue_conditions, start=start, end=end)))
+    await _restore_archived(db, start, end)
+    await db.commit()
+
+
+async def main() -> None:
+    from app.core.db import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Пересборка суточных роллапов отчетов")
+    parser.add_argument('--start', type=date.fromisoformat, default=None, help="Первый день (включительно)")
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help="Последний день (не включительно)")
+    args = parser.parse_args()
+    async with AsyncSessionLocal() as db:
+        await rebuild(db, args.start, args.end)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
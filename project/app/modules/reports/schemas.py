@@ -27,3 +27,9 @@ class DashboardData(BaseModel):
     revenue_by_period: List[dict]
     sessions_by_period: List[dict]
 
+
+class DashboardCacheStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
+    ttl: float
@@ -1,76 +1,96 @@
+import asyncio
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, cast, Date
-from datetime import datetime, timedelta, date
+from sqlalchemy import Select, select, func, cast, extract, column, literal_column, true, Date, DateTime, Numeric
+from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
+from app.core.db import AsyncSessionLocal
 from app.models.parking_session import ParkingSession
 from app.models.parking_space import ParkingSpace
 from app.models.payments import Payment
+from app.models.vehicles import Vehicle
+from app.models.rollups import DailyRevenue, DailySessions
+from app.modules.parking.occupancy import occupancy
+from app.modules.reports import archive
 
+logger = logging.getLogger(__name__)
 
-async def get_revenue(start_date: Optional[datetime], end_date: Optional[datetime], db: AsyncSession) -> Decimal:
-    query = select(ParkingSession).where(
+
+def earliest_time_in_closed_after(start_date: datetime):
+    """
+        Нижняя граница time_in сессий, закрытых не раньше start_date. Раньше start_date
+        начались только сессии, которые его пересекают, - их немного, и ищутся они в секциях
+        до start_date. Условие по ключу секционирования отсекает более старые секции
+        parking_sessions при выполнении запроса.
+    """
+    # FILTER отключает замену min() на LIMIT 1 по индексу time_in: такой план читает старые
+    # секции целиком. С ним каждая секция проверяется по индексу закрытых сессий по time_out
+    crossing = select(func.min(ParkingSession.time_in).filter(ParkingSession.time_out >= start_date)).where(
+        ParkingSession.time_in < start_date,
+        ParkingSession.time_out >= start_date,
+        ParkingSession.total_cost.isnot(None)).scalar_subquery()
+    return func.coalesce(crossing, start_date)
+
+
+def closed_sessions_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    """
+        Закрытые сессии с рассчитанной стоимостью, пересекающиеся с периодом [start_date, end_date].
+    """
+    conditions = [
         ParkingSession.time_out.isnot(None),
-        ParkingSession.total_cost.isnot(None))
+        ParkingSession.total_cost.isnot(None)]
     if start_date:
-        query = query.where(
-            (ParkingSession.time_in <= end_date if end_date else True) &
-            (ParkingSession.time_out >= start_date if start_date else True)
-        )
+        conditions.append(ParkingSession.time_out >= start_date)
+        conditions.append(ParkingSession.time_in >= earliest_time_in_closed_after(start_date))
     if end_date:
-        query = query.where(ParkingSession.time_in <= end_date)
+        conditions.append(ParkingSession.time_in <= end_date)
+    return conditions
+
+
+def with_archived(total: Decimal, count: int, average: Decimal,
+                  archived_total: Decimal, archived_count: int) -> Tuple[Decimal, int, Decimal]:
+    """
+        Добавляет к выручке, числу сессий и среднему чеку из БД сессии из архива.
+    """
+    if not archived_count:
+        return total, count, average
+    total += archived_total
+    count += archived_count
+    return total, count, total / count
+
+
+async def get_revenue_summary(start_date: Optional[datetime], end_date: Optional[datetime], db: AsyncSession) -> Tuple[Decimal, int, Decimal]:
+    """
+        Выручка, количество оплаченных сессий и средний чек одним агрегирующим запросом
+        плюс архивные сессии, если период заходит в архивные месяцы.
+    """
+    query = select(
+        func.coalesce(func.sum(ParkingSession.total_cost), 0),
+        func.count(ParkingSession.id),
+        func.coalesce(func.avg(ParkingSession.total_cost), 0)
+    ).where(*closed_sessions_filter(start_date, end_date))
     result = await db.execute(query)
-    sessions = result.scalars().all()
-    total_revenue = Decimal('0')
-    for session in sessions:
-        session_start = session.time_in
-        session_end = session.time_out
-        if start_date and session_end < start_date:
-            continue
-        if end_date and session_start > end_date:
-            continue
-        if session.total_cost:
-            total_revenue += Decimal(str(session.total_cost))
-    
+    total, count, average = result.one()
+    return with_archived(Decimal(total), count, Decimal(average),
+                         *await archive.revenue_summary(db, start_date, end_date))
+
+
+async def get_revenue(start_date: Optional[datetime], end_date: Optional[datetime], db: AsyncSession) -> Decimal:
+    total_revenue, _, _ = await get_revenue_summary(start_date, end_date, db)
     return total_revenue
 
 
 async def get_sessions_count(start_date: Optional[datetime], end_date: Optional[datetime], db: AsyncSession) -> int:
-    query = select(func.count(ParkingSession.id))
-    
-    if start_date:
-        query = query.where(ParkingSession.time_in >= start_date)
-    if end_date:
-        query = query.where(ParkingSession.time_in <= end_date)
-    
+    query = select(func.count(ParkingSession.id)).where(*sessions_started_filter(start_date, end_date))
     result = await db.execute(query)
-    return result.scalar() or 0
+    return (result.scalar() or 0) + await archive.sessions_count(db, start_date, end_date)
 
 
 async def get_average_check(start_date: Optional[datetime], end_date: Optional[datetime], db: AsyncSession) -> Decimal:
-    query = select(ParkingSession).where(
-        ParkingSession.time_out.isnot(None),
-        ParkingSession.total_cost.isnot(None))
-    
-    if start_date:
-        query = query.where(
-            (ParkingSession.time_in <= end_date if end_date else True) &
-            (ParkingSession.time_out >= start_date if start_date else True)
-        )
-    if end_date:
-        query = query.where(ParkingSession.time_in <= end_date)
-    
-    result = await db.execute(query)
-    sessions = result.scalars().all()
-    
-    if not sessions:
-        return Decimal('0')
-    
-    total_cost = sum(Decimal(str(s.total_cost)) for s in sessions if s.total_cost)
-    avg = total_cost / len(sessions) if sessions else Decimal('0')
-    
-    return avg
+    _, _, average_check = await get_revenue_summary(start_date, end_date, db)
+    return average_check
 
 
 async def get_active_sessions_count(db: AsyncSession) -> int:
@@ -80,6 +100,8 @@ async def get_active_sessions_count(db: AsyncSession) -> int:
 
 
 async def get_free_spaces_count(db: AsyncSession) -> int:
+    if occupancy.loaded:
+        return occupancy.free_total()
     all_spaces_query = select(func.count(ParkingSpace.id))
     all_spaces_result = await db.execute(all_spaces_query)
     total_spaces = all_spaces_result.scalar() or 0
@@ -91,179 +113,162 @@ async def get_free_spaces_count(db: AsyncSession) -> int:
     return total_spaces - occupied_spaces
 
 
+PERIOD_WINDOWS = {
+    'day': timedelta(days=7),
+    'week': timedelta(weeks=12),
+    'month': timedelta(days=365),
+}
+
+
+def period_unit(period: str) -> str:
+    return period if period in ('day', 'week') else 'month'
+
+
+def period_key(period: str, bucket_start: datetime) -> str:
+    if period == 'day':
+        return bucket_start.date().isoformat()
+    return bucket_start.isoformat()
+
+
+def prorated_shares(unit: str, conditions: list, with_dimensions: bool = False) -> Select:
+    """
+        Распределяет стоимость каждой сессии по интервалам day/week/month пропорционально
+        времени стоянки внутри интервала. Интервалы строятся в БД через generate_series,
+        доли считаются в numeric без округления.
+    """
+    step = literal_column(f"interval '1 {unit}'")
+    columns = [ParkingSession.time_in, ParkingSession.time_out, ParkingSession.total_cost]
+    if with_dimensions:
+        columns += [ParkingSession.tariff_id, Vehicle.type_id.label('vehicle_type_id')]
+    sessions = select(*columns).where(
+        ParkingSession.time_out.isnot(None),
+        ParkingSession.total_cost.isnot(None),
+        ParkingSession.time_out > ParkingSession.time_in,
+        *conditions)
+    if with_dimensions:
+        sessions = sessions.join(Vehicle, Vehicle.id == ParkingSession.vehicle_id)
+    sessions = sessions.cte('prorated_sessions')
+    buckets = func.generate_series(
+        func.date_trunc(unit, sessions.c.time_in),
+        sessions.c.time_out,
+        step
+    ).table_valued(column('bucket_start', DateTime)).render_derived(name='buckets')
+    bucket_start = buckets.c.bucket_start
+    overlap_start = func.greatest(sessions.c.time_in, bucket_start)
+    overlap_end = func.least(sessions.c.time_out, bucket_start + step)
+    share = (
+        sessions.c.total_cost
+        * cast(extract('epoch', overlap_end - overlap_start), Numeric)
+        / cast(extract('epoch', sessions.c.time_out - sessions.c.time_in), Numeric)
+    )
+    columns = [bucket_start.label('bucket_start'), share.label('share')]
+    if with_dimensions:
+        columns += [sessions.c.tariff_id, sessions.c.vehicle_type_id]
+    return select(*columns).select_from(
+        sessions.join(buckets, true())
+    ).where(overlap_end > overlap_start)
+
+
 async def get_revenue_by_period(period: str, db: AsyncSession) -> List[dict]:
+    """
+        Выручка по интервалам из суточного роллапа daily_revenue (см. reports.rollups).
+        Вклад архивных сессий роллап сохраняет (см. reports.archive). Доли сессий,
+        закрытых будущим временем, приходятся на будущие дни и в ряд не попадают.
+    """
     now = datetime.utcnow()
+    unit = period_unit(period)
+    filter_start = now - PERIOD_WINDOWS.get(period, PERIOD_WINDOWS['month'])
+    bucket = func.date_trunc(unit, cast(DailyRevenue.day, DateTime))
+    query = select(
+        bucket.label('bucket_start'),
+        func.round(func.sum(DailyRevenue.revenue), 2).label('revenue')
+    ).where(
+        DailyRevenue.day >= cast(func.date_trunc(unit, filter_start), Date),
+        DailyRevenue.day <= now.date()
+    ).group_by(bucket).order_by(bucket)
     try:
-        if period == 'day':
-            filter_start = now - timedelta(days=7)
-        elif period == 'week':
-            filter_start = now - timedelta(weeks=12)
-        else:
-            filter_start = now - timedelta(days=365)
-
-        query = select(ParkingSession).where(
-            ParkingSession.time_out.isnot(None),
-            ParkingSession.total_cost.isnot(None),
-            (ParkingSession.time_in <= now) &
-            (ParkingSession.time_out >= filter_start))
-        
         result = await db.execute(query)
-        sessions = result.scalars().all()
-        revenue_by_period = {}
-        
-        for session in sessions:
-            if not session.time_out or not session.total_cost:
-                continue
-            
-            session_start = session.time_in
-            session_end = session.time_out
-            total_cost = float(session.total_cost)
-            if period == 'day':
-                current_date = session_start.date()
-                end_date = session_end.date()
-                while current_date <= end_date:
-                    period_key = current_date.isoformat()
-                    day_start_dt = datetime.combine(current_date, datetime.min.time())
-                    day_end_dt = datetime.combine(current_date, datetime.max.time().replace(hour=23, minute=59, second=59, microsecond=999999))
-                    period_start = max(session_start, day_start_dt)
-                    period_end = min(session_end, day_end_dt)
-                    
-                    if period_start < period_end:
-                        day_duration = (period_end - period_start).total_seconds()
-                        total_duration = (session_end - session_start).total_seconds()
-                        day_cost = total_cost * (day_duration / total_duration) if total_duration > 0 else 0
-                        if period_key not in revenue_by_period:
-                            revenue_by_period[period_key] = 0
-                        revenue_by_period[period_key] += day_cost
-                    current_date += timedelta(days=1)
-
-            elif period == 'week':
-                current = session_start
-                while current <= session_end:
-                    week_start = current - timedelta(days=current.weekday())
-                    week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                    week_end = week_start + timedelta(days=7)
-                    period_start = max(session_start, week_start)
-                    period_end = min(session_end, week_end)
-                    if period_start < period_end:
-                        period_duration = (period_end - period_start).total_seconds()
-                        total_duration = (session_end - session_start).total_seconds()
-                        period_cost = total_cost * (period_duration / total_duration) if total_duration > 0 else 0
-                        period_key = week_start.isoformat()
-                        if period_key not in revenue_by_period:
-                            revenue_by_period[period_key] = 0
-                        revenue_by_period[period_key] += period_cost
-                    current = week_end
-                    
-            else:
-                current = session_start
-                while current <= session_end:
-                    month_start = current.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                    if month_start.month == 12:
-                        month_end = month_start.replace(year=month_start.year + 1, month=1)
-                    else:
-                        month_end = month_start.replace(month=month_start.month + 1)
-                    period_start = max(session_start, month_start)
-                    period_end = min(session_end, month_end)
-                    if period_start < period_end:
-                        period_duration = (period_end - period_start).total_seconds()
-                        total_duration = (session_end - session_start).total_seconds()
-                        period_cost = total_cost * (period_duration / total_duration) if total_duration > 0 else 0
-                        period_key = month_start.isoformat()
-                        if period_key not in revenue_by_period:
-                            revenue_by_period[period_key] = 0
-                        revenue_by_period[period_key] += period_cost
-                    current = month_end
-        data = [{'period': k, 'revenue': round(v, 2)} for k, v in revenue_by_period.items()]
-        data.sort(key=lambda x: x['period'])
-
-        return data
-    except Exception as e:
-        import traceback
-        print(f"Ошибка в get_revenue_by_period: {e}")
-        print(traceback.format_exc())
+        return [
+            {'period': period_key(period, row.bucket_start), 'revenue': float(row.revenue)}
+            for row in result.all()
+        ]
+    except Exception:
+        logger.exception("Ошибка в get_revenue_by_period")
         return []
 
 
 async def get_sessions_by_period(period: str, db: AsyncSession) -> List[dict]:
+    """
+        Количество сессий по дате въезда из суточного роллапа daily_sessions (до текущего
+        дня включительно).
+    """
     now = datetime.utcnow()
+    unit = period_unit(period)
+    filter_start = now - PERIOD_WINDOWS.get(period, PERIOD_WINDOWS['month'])
+    bucket = func.date_trunc(unit, cast(DailySessions.day, DateTime))
+    query = select(
+        bucket.label('bucket_start'),
+        func.sum(DailySessions.sessions_count).label('count')
+    ).where(
+        DailySessions.day >= cast(func.date_trunc(unit, filter_start), Date),
+        DailySessions.day <= now.date()
+    ).group_by(bucket).having(
+        func.sum(DailySessions.sessions_count) > 0
+    ).order_by(bucket)
     try:
-        if period == 'day':
-            start_date = now - timedelta(days=7)
-            query = select(
-                cast(ParkingSession.time_in, Date).label('date'),
-                func.count(ParkingSession.id).label('count')
-            ).where(
-                ParkingSession.time_in >= start_date
-            ).group_by(cast(ParkingSession.time_in, Date)).order_by(cast(ParkingSession.time_in, Date))
-        elif period == 'week':
-            start_date = now - timedelta(weeks=12)
-            query = select(
-                func.date_trunc('week', ParkingSession.time_in).label('week'),
-                func.count(ParkingSession.id).label('count')
-            ).where(
-                ParkingSession.time_in >= start_date
-            ).group_by(func.date_trunc('week', ParkingSession.time_in)).order_by(func.date_trunc('week', ParkingSession.time_in))
-        else:  # month
-            start_date = now - timedelta(days=365)
-            query = select(
-                func.date_trunc('month', ParkingSession.time_in).label('month'),
-                func.count(ParkingSession.id).label('count')
-            ).where(
-                ParkingSession.time_in >= start_date
-            ).group_by(func.date_trunc('month', ParkingSession.time_in)).order_by(func.date_trunc('month', ParkingSession.time_in))
-        
         result = await db.execute(query)
-        rows = result.all()
-        
-        data = []
-        for row in rows:
-            if period == 'day':
-                period_value = row.date
-                if period_value:
-                    if isinstance(period_value, (datetime, date)):
-                        period_str = period_value.isoformat()
-                    else:
-                        period_str = str(period_value)
-                else:
-                    period_str = None
-                data.append({
-                    'period': period_str,
-                    'count': row.count or 0
-                })
-            elif period == 'week':
-                period_value = row.week
-                if period_value:
-                    if isinstance(period_value, (datetime, date)):
-                        period_str = period_value.isoformat()
-                    else:
-                        period_str = str(period_value)
-                else:
-                    period_str = None
-                data.append({
-                    'period': period_str,
-                    'count': row.count or 0
-                })
-            else:
-                period_value = row.month
-                if period_value:
-                    if isinstance(period_value, (datetime, date)):
-                        period_str = period_value.isoformat()
-                    else:
-                        period_str = str(period_value)
-                else:
-                    period_str = None
-                data.append({
-                    'period': period_str,
-                    'count': row.count or 0
-                })
-        
-        return data
-    except Exception as e:
+        return [
+            {'period': period_key(period, row.bucket_start), 'count': row.count or 0}
+            for row in result.all()
+        ]
+    except Exception:
         # В случае ошибки возвращаем пустой список
         return []
 
 
+def sessions_started_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    conditions = []
+    if start_date:
+        conditions.append(ParkingSession.time_in >= start_date)
+    if end_date:
+        conditions.append(ParkingSession.time_in <= end_date)
+    return conditions
+
+
+def dashboard_metrics_query(start_date: datetime, end_date: datetime) -> Select:
+    """
+        Все скалярные метрики дашборда одним запросом: выручка и средний чек считаются
+        за один проход по закрытым сессиям, активные сессии и занятые места - за один
+        проход по открытым.
+    """
+    revenue = select(
+        func.coalesce(func.sum(ParkingSession.total_cost), 0).label('total_revenue'),
+        func.count(ParkingSession.id).label('paid_sessions'),
+        func.coalesce(func.avg(ParkingSession.total_cost), 0).label('average_check')
+    ).where(*closed_sessions_filter(start_date, end_date)).cte('revenue')
+    active = select(
+        func.count(ParkingSession.id).label('active_sessions'),
+        func.count(func.distinct(ParkingSession.space_id)).label('occupied_spaces')
+    ).where(ParkingSession.time_out.is_(None)).cte('active')
+    total_sessions = select(func.count(ParkingSession.id)).where(
+        *sessions_started_filter(start_date, end_date)).scalar_subquery()
+    total_spaces = select(func.count(ParkingSpace.id)).scalar_subquery()
+    return select(
+        revenue.c.total_revenue,
+        revenue.c.paid_sessions,
+        revenue.c.average_check,
+        total_sessions.label('total_sessions'),
+        active.c.active_sessions,
+        (total_spaces - active.c.occupied_spaces).label('free_spaces')
+    ).select_from(revenue.join(active, true()))
+
+
+async def _with_own_session(fn, *args):
+    # Отдельная сессия = отдельное соединение из пула, запросы идут параллельно
+    async with AsyncSessionLocal() as session:
+        return await fn(*args, session)
+
+
 async def get_dashboard_data(period: str, db: AsyncSession) -> dict:
     now = datetime.utcnow()
     
@@ -274,22 +279,24 @@ async def get_dashboard_data(period: str, db: AsyncSession) -> dict:
         start_date = now - timedelta(days=7)
     else:  # month
         start_date = now - timedelta(days=30)
-    
-    total_revenue = await get_revenue(start_date, now, db)
-    total_sessions = await get_sessions_count(start_date, now, db)
-    average_check = await get_average_check(start_date, now, db)
-    active_sessions = await get_active_sessions_count(db)
-    free_spaces = await get_free_spaces_count(db)
-    revenue_by_period = await get_revenue_by_period(period, db)
-    sessions_by_period = await get_sessions_by_period(period, db)
+
+    metrics, revenue_by_period, sessions_by_period = await asyncio.gather(
+        db.execute(dashboard_metrics_query(start_date, now)),
+        _with_own_session(get_revenue_by_period, period),
+        _with_own_session(get_sessions_by_period, period))
+    row = metrics.one()
+    # Файлы архива читаются, только если их сессии пересекаются с периодом дашборда
+    archived_revenue, archived_paid, archived_sessions = await archive.period_summary(db, start_date, now)
+    total_revenue, _, average_check = with_archived(
+        row.total_revenue, row.paid_sessions, row.average_check, archived_revenue, archived_paid)
+    total_sessions = row.total_sessions + archived_sessions
     
     return {
         'total_revenue': float(total_revenue),
         'total_sessions': total_sessions,
         'average_check': float(average_check),
-        'active_sessions': active_sessions,
-        'free_spaces': free_spaces,
+        'active_sessions': row.active_sessions,
+        'free_spaces': row.free_spaces,
         'revenue_by_period': revenue_by_period,
         'sessions_by_period': sessions_by_period
     }
-
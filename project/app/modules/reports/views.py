@@ -4,8 +4,10 @@ from datetime import datetime
 from typing import Optional
 
 from app.core.db import get_db
-from app.modules.reports.schemas import RevenueReport, SessionsReport, AverageCheckReport, DashboardData
+from app.core.query_budget import query_budget
+from app.modules.reports.schemas import RevenueReport, SessionsReport, AverageCheckReport, DashboardData, DashboardCacheStats
 from app.modules.reports import utils
+from app.modules.reports.cache import dashboard_cache
 
 router = APIRouter(prefix='/reports', tags=['Reports'])
 
@@ -49,13 +51,14 @@ async def get_average_check(
     )
 
 @router.get('/dashboard', response_model=DashboardData)
+@query_budget(3)
 async def get_dashboard(
     period: str = Query('day', description="Период: day, week, month"),
     db: AsyncSession = Depends(get_db)):
     try:
         if period not in ['day', 'week', 'month']:
             period = 'day'
-        data = await utils.get_dashboard_data(period, db)
+        data = await dashboard_cache.get_or_compute(period, lambda: utils.get_dashboard_data(period, db))
 
         return DashboardData(**data)
 
@@ -66,3 +69,7 @@ async def get_dashboard(
             detail=f"Ошибка при получении данных дашборда: {str(e)}"
         )
 
+
+@router.get('/dashboard/cache', response_model=DashboardCacheStats)
+async def get_dashboard_cache_stats():
+    return dashboard_cache.stats()
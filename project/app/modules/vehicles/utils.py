@@ -1,23 +1,28 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
+from sqlalchemy import select, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.vehicles import Vehicle
+from app.models.clients import Client
+from app.core.crud import changed_fields, insert_returning, update_returning, delete_returning
+from app.core.versions import table_versions
+from app.modules.references.cache import references
+from app.core.bulk import BulkImportResult, iter_chunks
 from app.modules.vehicles.schemas import VehicleCreate, VehicleUpdate
 from typing import Optional
 
 async def create_vehicle(data: VehicleCreate, db: AsyncSession) -> Optional[Vehicle]:
     try:
-        db_vehicle = Vehicle(
+        db_vehicle = await insert_returning(db, Vehicle, dict(
             brand=data.brand,
             model=data.model,
             license_plate=data.license_plate,
             color=data.color,
             type_id=data.type_id,
             client_id=data.client_id
-        )
-        db.add(db_vehicle)
+        ))
+        await table_versions.bump(db, 'vehicles')
         await db.commit()
-        await db.refresh(db_vehicle)
         return db_vehicle
     except Exception as e:
         await db.rollback()
@@ -31,31 +36,58 @@ async def get_vehicle_id(db: AsyncSession, vehicle_id: int) -> Optional[Vehicle]
     return vehicle
 
 async def update_vehicle(db: AsyncSession, vehicle_id: int, data: VehicleUpdate) -> Optional[Vehicle]:
-    vehicle = await get_vehicle_id(db, vehicle_id)
+    vehicle = await update_returning(db, Vehicle, vehicle_id, changed_fields(data))
     if not vehicle:
         return None
-    if data.brand is not None:
-        vehicle.brand = data.brand
-    if data.model is not None:
-        vehicle.model = data.model
-    if data.license_plate is not None:
-        vehicle.license_plate = data.license_plate
-    if data.color is not None:
-        vehicle.color = data.color
-    if data.type_id is not None:
-        vehicle.type_id = data.type_id
-    if data.client_id is not None:
-        vehicle.client_id = data.client_id
-    db.add(vehicle)
+    await table_versions.bump(db, 'vehicles')
     await db.commit()
-    await db.refresh(vehicle)
     return vehicle
 
 async def delete_vehicle(db: AsyncSession, vehicle_id: int) -> bool:
-    vehicle = await get_vehicle_id(db, vehicle_id)
-    if not vehicle:
+    if not await delete_returning(db, Vehicle, vehicle_id):
         return False
-    await db.delete(vehicle)
+    await table_versions.bump(db, 'vehicles')
     await db.commit()
     return True
 
+async def bulk_create_vehicles(request: Request, db: AsyncSession) -> BulkImportResult:
+    """
+        Массовая загрузка транспортных средств из NDJSON/CSV. Дубликаты госномеров
+        отклоняются построчно - и внутри загрузки, и относительно уже существующих.
+    """
+    result = BulkImportResult()
+    await references.ensure_loaded(db)
+    async for chunk in iter_chunks(request, VehicleCreate, result):
+        plates = {data.license_plate for _, data in chunk}
+        taken = set((await db.execute(
+            select(Vehicle.license_plate).where(Vehicle.license_plate.in_(plates)))).scalars().all())
+        client_ids = set((await db.execute(
+            select(Client.id).where(Client.id.in_({data.client_id for _, data in chunk})))).scalars().all())
+
+        rows, row_numbers = [], []
+        for row, data in chunk:
+            if data.license_plate in taken:
+                result.add_error(row, f"Госномер {data.license_plate} уже зарегистрирован")
+                continue
+            if data.type_id not in references.vehicle_types:
+                result.add_error(row, "Тип транспортного средства не найден")
+                continue
+            if data.client_id not in client_ids:
+                result.add_error(row, "Клиент не найден")
+                continue
+            taken.add(data.license_plate)
+            rows.append(data.model_dump())
+            row_numbers.append(row)
+        if not rows:
+            continue
+        try:
+            await db.execute(insert(Vehicle.__table__), rows)
+            await table_versions.bump(db, 'vehicles')
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for row in row_numbers:
+                result.add_error(row, f"Ошибка при вставке пачки: {str(e)}")
+            continue
+        result.inserted += len(rows)
+    return result
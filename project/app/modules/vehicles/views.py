@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Literal
 
 from app.core.db import get_db
+from app.core.http_cache import etag_matches, not_modified, set_etag
+from app.core.versions import table_versions, VERSIONED_CACHE_CONTROL
+from app.core.bulk import BulkImportResult
+from app.core.query_budget import query_budget
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, split_page
+from app.core.responses import columns_of, rows_response
 from app.modules.vehicles.schemas import VehicleCreate, VehicleUpdate, VehicleOut
 from app.modules.vehicles import utils
 
@@ -13,19 +20,43 @@ router = APIRouter(prefix='/vehicles', tags=['Vehicles'])
 @router.post('/', response_model=VehicleOut, status_code=status.HTTP_200_OK)
 async def create_vehicle(data: VehicleCreate, db: AsyncSession = Depends(get_db)):
     vehicle = await utils.create_vehicle(data, db)
-    return VehicleOut.model_validate(vehicle)
+    return vehicle
 
 @router.get('/', response_model=list[VehicleOut])
-async def get_vehicles(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Vehicle))
-    vehicles = result.scalars().all()
-    return vehicles
+async def get_vehicles(
+    request: Request,
+    response: Response,
+    client_id: Optional[int] = Query(None, description="Владелец"),
+    type_id: Optional[int] = Query(None, description="Тип транспортного средства"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    order: Literal['asc', 'desc'] = Query('asc', description="Направление сортировки"),
+    db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('vehicles', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
+    query = select(*columns_of(Vehicle, VehicleOut))
+    if client_id is not None:
+        query = query.where(Vehicle.client_id == client_id)
+    if type_id is not None:
+        query = query.where(Vehicle.type_id == type_id)
+    keys = [Vehicle.id]
+    result = await db.execute(paginate(query, keys, cursor, limit, order == 'desc'))
+    vehicles, next_cursor = split_page(result.mappings().all(), keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
+    return rows_response(vehicles, response)
 
 @router.get('/{vehicle_id}', response_model=VehicleOut)
-async def get_vehicle(vehicle_id: int, db: AsyncSession = Depends(get_db)):
+async def get_vehicle(vehicle_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    etag = table_versions.etag('vehicles', request)
+    if etag_matches(request, etag):
+        return not_modified(etag, VERSIONED_CACHE_CONTROL)
     vehicle = await utils.get_vehicle_id(db, vehicle_id)
     if not vehicle:
         raise HTTPException(404, 'Vehicle not found')
+    set_etag(response, etag, VERSIONED_CACHE_CONTROL)
     return vehicle
 
 @router.put('/{vehicle_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -42,3 +73,10 @@ async def delete_vehicle(vehicle_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(404, 'Vehicle not found')
     return None
 
+@router.post('/bulk', response_model=BulkImportResult)
+@query_budget(None)
+async def bulk_create_vehicles(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+        Тело запроса - NDJSON (по строке JSON на запись) или CSV с заголовком (Content-Type: text/csv).
+    """
+    return await utils.bulk_create_vehicles(request, db)
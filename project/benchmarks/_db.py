@@ -0,0 +1,33 @@
+"""
+    Обвязка проверок, которые создают свои данные в транзакции и откатывают её:
+    в базе после прогона ничего не остаётся.
+"""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import engine
+
+
+@asynccontextmanager
+async def rolled_back() -> AsyncIterator[AsyncSession]:
+    """
+        Сессия на соединении с открытой транзакцией, которая откатывается на выходе;
+        commit в проверяемом коде фиксирует только точку сохранения. Соединение сессии -
+        await db.connection(). После отката пул соединений закрывается.
+    """
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        db = AsyncSession(bind=conn, join_transaction_mode='create_savepoint', expire_on_commit=False)
+        try:
+            yield db
+        finally:
+            await db.close()
+            await transaction.rollback()
+    await engine.dispose()
+
+
+async def insert_id(db: AsyncSession, entity, values: dict) -> int:
+    return (await db.execute(insert(entity).values(values).returning(entity.id))).scalar_one()
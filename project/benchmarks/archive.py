@@ -0,0 +1,78 @@
+"""
+    Отчёты и объём хранения до и после переноса старых месяцев в архив Parquet.
+
+    Печатает размер parking_sessions и payments в БД (с индексами), размер ARCHIVE_DIR и
+    p50 get_revenue_summary / get_sessions_count для периодов относительно последнего
+    въезда: свежих (только БД), заходящих в архивные месяцы и за всё время. Значения
+    отчётов печатаются, чтобы сравнить запуск до архивации с запуском после:
+
+    python -m benchmarks.archive > before.txt
+    python -m app.modules.reports.archive
+    python -m benchmarks.archive > after.txt
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, select, text
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine
+from app.models import ParkingSession
+from app.modules.reports import utils
+
+
+def periods(end: datetime) -> dict:
+    return {
+        'week': (end - timedelta(days=7), end),
+        'month': (end - timedelta(days=30), end),
+        'month_year_ago': (end - timedelta(days=395), end - timedelta(days=365)),
+        'month_18_months_ago': (end - timedelta(days=578), end - timedelta(days=548)),
+        'year_to_year_ago': (end - timedelta(days=730), end - timedelta(days=365)),
+        'all_time': (None, None),
+    }
+
+
+async def p50(repeat: int, call) -> tuple[float, object]:
+    samples = []
+    value = None
+    for attempt in range(repeat + 1):
+        started = time.perf_counter()
+        value = await call()
+        # Первый прогон - прогрев (в том числе список файлов архива)
+        if attempt:
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), value
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Отчёты и объём хранения с архивом Parquet")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        end = await db.scalar(select(func.max(ParkingSession.time_in)))
+        if end is None:
+            raise SystemExit("parking_sessions пуста: сначала python -m benchmarks.dataset")
+        sizes = (await db.execute(text(
+            "SELECT pg_total_relation_size('parking_sessions'::regclass) + coalesce(sum(pg_total_relation_size(inhrelid)), 0)"
+            " FROM pg_inherits WHERE inhparent = 'parking_sessions'::regclass"
+            " UNION ALL SELECT pg_total_relation_size('payments'::regclass) + coalesce(sum(pg_total_relation_size(inhrelid)), 0)"
+            " FROM pg_inherits WHERE inhparent = 'payments'::regclass"))).scalars().all()
+        archive_size = sum(path.stat().st_size for path in Path(settings.ARCHIVE_DIR).rglob('*.parquet'))
+        print(f"БД: parking_sessions {sizes[0] / 2**20:.0f} МБ, payments {sizes[1] / 2**20:.0f} МБ; "
+              f"архив {settings.ARCHIVE_DIR}: {archive_size / 2**20:.0f} МБ")
+
+        print(f"{'период':<22} {'выручка p50':>12} {'сессии p50':>11}  значения")
+        for name, (start, finish) in periods(end).items():
+            revenue_ms, (total, paid, _) = await p50(args.repeat, lambda: utils.get_revenue_summary(start, finish, db))
+            count_ms, count = await p50(args.repeat, lambda: utils.get_sessions_count(start, finish, db))
+            print(f"{name:<22} {revenue_ms:>10.1f}мс {count_ms:>9.1f}мс  {total} / {paid} / {count}")
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
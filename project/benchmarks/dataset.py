@@ -0,0 +1,466 @@
+"""
+    Генератор синтетических данных для проверки отчётов и списков на объёмах продакшена.
+
+    Заполняет clients, vehicles, parking_spaces, tariffs, parking_sessions и payments:
+    - поток въездов по дням с недельным и сезонным циклом и ростом к концу периода,
+      внутри суток - утренний и вечерний пики;
+    - длительность стоянки - смесь логнормальных: короткие визиты, рабочий день, сутки и более;
+    - часть ТС - постоянные клиенты и паркуются заметно чаще остальных;
+    - место выбирается под тип ТС; сессии, не закончившиеся к --end, остаются открытыми;
+    - стоимость - по правилу calculate_parking_cost (каждый начатый час по price_per_hour);
+    - закрытые сессии в основном оплачены одним платежом, часть - двумя, часть не оплачена.
+
+    Результат детерминирован для одинаковых --seed, --end, размеров и --chunk-size: идентификаторы
+    задаются генератором, у каждого чанка свой поток случайных чисел, поэтому --jobs на данные
+    не влияет.
+    Чанки грузятся через COPY параллельно в --jobs процессах, таблицы - в порядке внешних ключей.
+    Госномера и номера мест уникальны по построению, поэтому таблицы должны быть пусты
+    (или очищены через --truncate). Вторичные индексы vehicles, parking_sessions и payments
+    на время загрузки удаляются и строятся заново после неё, помесячные секции parking_sessions
+    и payments на весь период создаются заранее. После загрузки выставляются
+    последовательности, пересобираются роллапы и выполняется ANALYZE.
+
+    Балансировка мест не моделируется: у одного места возможны пересекающиеся сессии.
+
+    python -m benchmarks.dataset --sessions 10000000 --truncate [--seed 42] [--jobs 8] [--skip-fk-checks]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import asyncpg
+import numpy as np
+
+from app.core.config import settings
+from app.core.partitions import PARTITIONED_TABLES, ensure_partitions
+from app.modules.parking.repricing import compute_costs
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+MICROSECONDS_PER_HOUR = 3_600_000_000
+EPOCH = np.datetime64('1970-01-01T00:00:00', 'us')
+
+TABLES = ('clients', 'vehicles', 'parking_spaces', 'tariffs', 'parking_sessions', 'payments')
+# Таблицы, вторичные индексы которых перестраиваются после загрузки
+INDEXED_TABLES = ('vehicles', 'parking_sessions', 'payments')
+# Коды таблиц для потоков случайных чисел чанков
+CLIENTS, VEHICLES, SPACES, SESSIONS = range(4)
+
+# id типа ТС (миграция seed_vehicle_types) -> доля парка и доля мест
+VEHICLE_TYPES = {1: 0.88, 2: 0.07, 3: 0.05}
+SPACE_TYPES = {1: 0.85, 2: 0.09, 3: 0.06}
+# id, название, цена за час, цена за сутки; тариф сессии выбирается по типу ТС
+TARIFFS = [
+    (1, 'Стандарт', Decimal('100.00'), Decimal('1200.00')),
+    (2, 'Мото', Decimal('50.00'), Decimal('600.00')),
+    (3, 'Грузовой', Decimal('250.00'), Decimal('3000.00')),
+    (4, 'Постоянный клиент', Decimal('80.00'), Decimal('900.00')),
+]
+REGULAR_TARIFF_SHARE = 0.12
+# id способа оплаты (миграция seed_payment_methods): наличные, карта, онлайн
+PAYMENT_METHODS = ([1, 2, 3], [0.22, 0.58, 0.20])
+UNPAID_SHARE = 0.03
+SPLIT_PAYMENT_SHARE = 0.02
+
+# Профиль въездов по часам суток и по дням недели (пн..вс)
+HOURLY_PROFILE = np.array([
+    0.4, 0.25, 0.2, 0.2, 0.3, 0.8, 2.0, 4.5, 6.5, 5.5, 4.5, 4.2,
+    4.5, 4.6, 4.4, 4.5, 5.2, 6.2, 6.0, 4.6, 3.2, 2.2, 1.4, 0.8,
+])
+WEEKDAY_PROFILE = np.array([1.0, 1.02, 1.03, 1.04, 1.08, 0.75, 0.55])
+# Смесь длительностей: доля, медиана в часах, sigma логнормального
+DURATIONS = [(0.72, 1.5, 0.85), (0.22, 9.0, 0.2), (0.06, 30.0, 0.6)]
+MIN_DURATION_US = 10 * 60 * 1_000_000
+MAX_DURATION_US = 21 * MICROSECONDS_PER_DAY
+
+FIRST_NAMES = ['Александр', 'Алексей', 'Анна', 'Дмитрий', 'Екатерина', 'Елена', 'Иван', 'Ирина', 'Максим',
+               'Мария', 'Михаил', 'Наталья', 'Никита', 'Ольга', 'Сергей', 'Светлана', 'Татьяна', 'Юлия']
+SURNAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+            'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов']
+MODELS = [('Lada', 'Vesta'), ('Lada', 'Granta'), ('Kia', 'Rio'), ('Hyundai', 'Solaris'), ('Toyota', 'Camry'),
+          ('Volkswagen', 'Polo'), ('Skoda', 'Octavia'), ('Renault', 'Logan'), ('Haval', 'Jolion'), ('Chery', 'Tiggo 7')]
+MOTO_MODELS = [('Honda', 'CB500'), ('Yamaha', 'MT-07'), ('BMW', 'R1250GS')]
+TRUCK_MODELS = [('GAZ', 'Gazelle Next'), ('KAMAZ', '5490'), ('Ford', 'Transit')]
+COLORS = ['белый', 'чёрный', 'серый', 'серебристый', 'синий', 'красный', 'зелёный', 'коричневый']
+# Буквы, допустимые в российских госномерах
+PLATE_LETTERS = 'АВЕКМНОРСТУХ'
+
+
+class Plan:
+    """
+        Размеры и глобальные параметры, общие для всех чанков.
+    """
+
+    def __init__(self, args):
+        self.seed = args.seed
+        self.sessions = args.sessions
+        self.clients = args.clients or max(self.sessions // 40, 100)
+        self.vehicles = args.vehicles or self.clients * 5 // 4
+        self.spaces = args.spaces
+        self.chunk_size = args.chunk_size
+        self.end_us = _to_us(datetime.combine(args.end, datetime.min.time()))
+        self.days = args.days
+        self.start_us = self.end_us - self.days * MICROSECONDS_PER_DAY
+        self.dsn = settings.LISTEN_DATABASE_URL
+        self.skip_fk_checks = args.skip_fk_checks
+
+    def rng(self, table: int, chunk: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, table, chunk])
+
+    def chunks(self, total: int) -> list[tuple[int, int, int]]:
+        # (номер чанка, первый индекс, число строк)
+        return [(i, start, min(self.chunk_size, total - start))
+                for i, start in enumerate(range(0, total, self.chunk_size))]
+
+    def space_ranges(self) -> dict[int, tuple[int, int]]:
+        # Места одного типа идут подряд: тип -> (первый id, число мест)
+        ranges, first = {}, 1
+        counts = _split(self.spaces, SPACE_TYPES)
+        for type_id, count in counts.items():
+            ranges[type_id] = (first, count)
+            first += count
+        return ranges
+
+    def daily_cumulative(self) -> np.ndarray:
+        """
+            Накопленное число сессий на конец каждого дня периода: день сессии с индексом i -
+            searchsorted(cumulative, i, 'right'). Считается одинаково во всех процессах.
+        """
+        days = np.arange(self.days)
+        first_day = np.datetime64(self.start_us, 'us').astype('datetime64[D]')
+        weekday = ((first_day.astype(np.int64) + days + 3) % 7)  # 1970-01-01 - четверг
+        day_of_year = (first_day + days).astype('datetime64[D]') - (first_day + days).astype('datetime64[Y]')
+        seasonal = 1 + 0.12 * np.sin(2 * np.pi * (day_of_year.astype(np.int64) - 80) / 365)
+        growth = 1 + 0.3 * days / max(self.days - 1, 1)
+        weights = WEEKDAY_PROFILE[weekday] * seasonal * growth
+        return np.rint(np.cumsum(weights) / weights.sum() * self.sessions).astype(np.int64)
+
+
+def _to_us(value: datetime) -> int:
+    return int((np.datetime64(value, 'us') - EPOCH).astype(np.int64))
+
+
+def _datetimes(us: np.ndarray, present: np.ndarray = None) -> list:
+    values = EPOCH + us.astype('timedelta64[us]')
+    if present is not None:
+        # NaT превращается в None - NULL в COPY
+        values[~present] = np.datetime64('NaT')
+    return values.tolist()
+
+
+def _split(total: int, shares: dict) -> dict:
+    counts = {key: int(total * share) for key, share in shares.items()}
+    first = next(iter(counts))
+    counts[first] += total - sum(counts.values())
+    return counts
+
+
+def vehicle_types(vehicle_ids: np.ndarray) -> np.ndarray:
+    """
+        Тип ТС - детерминированная функция id: сессиям не нужно читать таблицу vehicles.
+    """
+    bucket = (vehicle_ids.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) / 2 ** 32
+    bounds = np.cumsum(list(VEHICLE_TYPES.values()))[:-1]
+    return np.array(list(VEHICLE_TYPES))[np.searchsorted(bounds, bucket, side='right')]
+
+
+def license_plates(indexes: np.ndarray) -> list[str]:
+    # Взаимно однозначно по индексу: буква, три цифры, две буквы, регион
+    letters = len(PLATE_LETTERS)
+    digits = indexes % 1000
+    rest = indexes // 1000
+    series = rest % letters ** 3
+    region = 1 + rest // letters ** 3
+    return [
+        f'{PLATE_LETTERS[s // (letters * letters)]}{d:03d}{PLATE_LETTERS[s // letters % letters]}'
+        f'{PLATE_LETTERS[s % letters]}{r:02d}'
+        for d, s, r in zip(digits.tolist(), series.tolist(), region.tolist())
+    ]
+
+
+def clients_chunk(plan: Plan, chunk: int, start: int, count: int) -> list[tuple]:
+    rng = plan.rng(CLIENTS, chunk)
+    ids = np.arange(start + 1, start + count + 1)
+    names = rng.integers(0, len(FIRST_NAMES), count)
+    surnames = rng.integers(0, len(SURNAMES), count)
+    phones = (ids * 7919 + 1_000_003) % 10 ** 9
+    created = plan.start_us - rng.integers(0, 3 * 365, count) * MICROSECONDS_PER_DAY
+    return list(zip(
+        ids.tolist(),
+        [FIRST_NAMES[i] for i in names.tolist()],
+        [SURNAMES[i] for i in surnames.tolist()],
+        [f'+79{p:09d}' for p in phones.tolist()],
+        _datetimes(created),
+    ))
+
+
+def vehicles_chunk(plan: Plan, chunk: int, start: int, count: int) -> list[tuple]:
+    rng = plan.rng(VEHICLES, chunk)
+    ids = np.arange(start + 1, start + count + 1)
+    types = vehicle_types(ids)
+    # У каждого клиента есть хотя бы одно ТС, остальные распределены случайно
+    owners = np.where(ids <= plan.clients, ids, rng.integers(1, plan.clients + 1, count))
+    catalog = {1: MODELS, 2: MOTO_MODELS, 3: TRUCK_MODELS}
+    picks = rng.integers(0, 1 << 30, count)
+    models = [catalog[t][p % len(catalog[t])] for t, p in zip(types.tolist(), picks.tolist())]
+    colors = rng.integers(0, len(COLORS), count)
+    return list(zip(
+        ids.tolist(),
+        [brand for brand, _ in models],
+        [model for _, model in models],
+        license_plates(ids - 1),
+        [COLORS[i] for i in colors.tolist()],
+        types.tolist(),
+        owners.tolist(),
+    ))
+
+
+def spaces_rows(plan: Plan) -> list[tuple]:
+    rows = []
+    zones = {1: 'A', 2: 'M', 3: 'T'}
+    created = _datetimes(np.array([plan.start_us]))[0]
+    for type_id, (first, count) in plan.space_ranges().items():
+        for i in range(count):
+            rows.append((first + i, f'{zones[type_id]}-{i + 1:05d}', type_id, created))
+    return rows
+
+
+def sessions_chunk(plan: Plan, chunk: int, start: int, count: int) -> tuple[list[tuple], list[tuple]]:
+    rng = plan.rng(SESSIONS, chunk)
+    indexes = np.arange(start, start + count)
+    day = np.searchsorted(plan.daily_cumulative(), indexes, side='right')
+    hour = rng.choice(24, count, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    time_in = (plan.start_us + day * MICROSECONDS_PER_DAY + hour * MICROSECONDS_PER_HOUR
+               + rng.integers(0, MICROSECONDS_PER_HOUR, count))
+    # id растут вместе со временем въезда, как у живых данных
+    time_in.sort()
+    ids = indexes + 1
+
+    component = rng.choice(len(DURATIONS), count, p=[share for share, _, _ in DURATIONS])
+    medians = np.array([median for _, median, _ in DURATIONS])[component]
+    sigmas = np.array([sigma for _, _, sigma in DURATIONS])[component]
+    duration = np.exp(rng.normal(np.log(medians * MICROSECONDS_PER_HOUR), sigmas)).astype(np.int64)
+    duration = np.clip(duration, MIN_DURATION_US, MAX_DURATION_US)
+    time_out = time_in + duration
+    closed = time_out <= plan.end_us
+
+    # Постоянные клиенты паркуются чаще: степенное распределение по перемешанным id
+    rank = (plan.vehicles * rng.random(count) ** 2.5).astype(np.int64)
+    vehicle = rank * 48271 % plan.vehicles + 1
+    types = vehicle_types(vehicle)
+    space = np.empty(count, dtype=np.int64)
+    for type_id, (first, spaces) in plan.space_ranges().items():
+        mask = types == type_id
+        space[mask] = first + rng.integers(0, spaces, int(mask.sum()))
+    tariff = types.copy()
+    tariff[(types == 1) & (rng.random(count) < REGULAR_TARIFF_SHARE)] = 4
+
+    hour_cents = np.array([0] + [int(t[2] * 100) for t in TARIFFS])[tariff]
+    day_cents = np.array([0] + [int(t[3] * 100) for t in TARIFFS])[tariff]
+    cost = compute_costs(duration, hour_cents, day_cents)
+
+    sessions = list(zip(
+        ids.tolist(),
+        vehicle.tolist(),
+        space.tolist(),
+        tariff.tolist(),
+        _datetimes(time_in),
+        _datetimes(time_out, closed),
+        [Decimal(c).scaleb(-2) if is_closed else None for c, is_closed in zip(cost.tolist(), closed.tolist())],
+        _datetimes(time_in),
+    ))
+
+    # Платежи: id выводится из id сессии (2n-1, 2n), чтобы не зависеть от порядка загрузки чанков
+    outcome = rng.random(count)
+    paid = closed & (outcome >= UNPAID_SHARE)
+    split = paid & (outcome < UNPAID_SHARE + SPLIT_PAYMENT_SHARE)
+    paid_at = time_out + rng.integers(0, 10 * 60 * 1_000_000, count)
+    methods = rng.choice(PAYMENT_METHODS[0], count, p=PAYMENT_METHODS[1])
+    first_part = np.where(split, cost // 2, cost)
+    payments = []
+    for sid, amount, rest, method, at, is_paid, is_split in zip(
+            ids.tolist(), first_part.tolist(), (cost - first_part).tolist(), methods.tolist(),
+            _datetimes(paid_at), paid.tolist(), split.tolist()):
+        if not is_paid:
+            continue
+        payments.append((2 * sid - 1, sid, Decimal(amount).scaleb(-2), method, at, at))
+        if is_split:
+            later = at + timedelta(hours=1)
+            payments.append((2 * sid, sid, Decimal(rest).scaleb(-2), 3 - method % 3, later, later))
+    return sessions, payments
+
+
+COLUMNS = {
+    'clients': ['id', 'name', 'surname', 'phone', 'created_at'],
+    'vehicles': ['id', 'brand', 'model', 'license_plate', 'color', 'type_id', 'client_id'],
+    'parking_spaces': ['id', 'number', 'type_id', 'created_at'],
+    'tariffs': ['id', 'name', 'price_per_hour', 'price_per_day', 'created_at'],
+    'parking_sessions': ['id', 'vehicle_id', 'space_id', 'tariff_id', 'time_in', 'time_out', 'total_cost', 'created_at'],
+    'payments': ['id', 'session_id', 'amount', 'method_id', 'time', 'created_at'],
+}
+
+
+async def _copy(dsn: str, batches: list[tuple[str, list[tuple]]], skip_fk_checks: bool) -> int:
+    connection = await asyncpg.connect(dsn)
+    try:
+        if skip_fk_checks:
+            # Триггеры внешних ключей не срабатывают; ссылки корректны по построению
+            await connection.execute("SET session_replication_role = replica")
+        for table, records in batches:
+            await connection.copy_records_to_table(table, records=records, columns=COLUMNS[table])
+            if skip_fk_checks and table == 'parking_sessions':
+                # В режиме replica триггеры реестра id тоже не срабатывают
+                await connection.execute(
+                    'INSERT INTO parking_session_ids (id) SELECT unnest($1::int[])', [record[0] for record in records])
+    finally:
+        await connection.close()
+    return sum(len(records) for _, records in batches)
+
+
+def load_chunk(plan: Plan, table: str, chunk: int, start: int, count: int) -> int:
+    # Выполняется в процессе пула: генерация чанка и COPY на собственном соединении
+    if table == 'clients':
+        batches = [('clients', clients_chunk(plan, chunk, start, count))]
+    elif table == 'vehicles':
+        batches = [('vehicles', vehicles_chunk(plan, chunk, start, count))]
+    else:
+        sessions, payments = sessions_chunk(plan, chunk, start, count)
+        # Платежи чанка - после его сессий
+        batches = [('parking_sessions', sessions), ('payments', payments)]
+    return asyncio.run(_copy(plan.dsn, batches, plan.skip_fk_checks))
+
+
+async def prepare(plan: Plan, truncate: bool) -> None:
+    connection = await asyncpg.connect(plan.dsn)
+    try:
+        if truncate:
+            await connection.execute(
+                f"TRUNCATE {', '.join(TABLES)}, parking_session_ids, daily_revenue, daily_sessions RESTART IDENTITY CASCADE")
+        else:
+            for table in TABLES:
+                if await connection.fetchval(f'SELECT EXISTS (SELECT 1 FROM {table})'):
+                    raise SystemExit(f"Таблица {table} не пуста: запустите с --truncate или на пустой БД")
+        # Помесячные секции периода: иначе строки уйдут в default-секцию
+        first, last = _datetimes(np.array([plan.start_us, plan.end_us]))
+        for table in PARTITIONED_TABLES:
+            await ensure_partitions(connection, table, first.date(), last.date())
+        created = _datetimes(np.array([plan.start_us]))[0]
+        await connection.copy_records_to_table(
+            'tariffs', records=[(*tariff, created) for tariff in TARIFFS], columns=COLUMNS['tariffs'])
+        await connection.copy_records_to_table('parking_spaces', records=spaces_rows(plan), columns=COLUMNS['parking_spaces'])
+    finally:
+        await connection.close()
+
+
+async def drop_indexes(dsn: str) -> list[str]:
+    """
+        Вторичные индексы больших таблиц удаляются на время загрузки: построить индекс
+        заново после COPY быстрее, чем обновлять его на каждой строке. Возвращает их DDL.
+    """
+    connection = await asyncpg.connect(dsn)
+    try:
+        rows = await connection.fetch("""
+            SELECT i.indexname, i.indexdef FROM pg_indexes i
+            WHERE i.schemaname = current_schema() AND i.tablename = ANY($1::text[])
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)
+        """, list(INDEXED_TABLES))
+        for row in rows:
+            await connection.execute(f'DROP INDEX {row["indexname"]}')
+        # Для секционированной таблицы DDL содержит ON ONLY: такой индекс не строится на секциях
+        return [row['indexdef'].replace(' ON ONLY ', ' ON ') for row in rows]
+    finally:
+        await connection.close()
+
+
+async def create_indexes(dsn: str, definitions: list[str], jobs: int) -> None:
+    # Индексы строятся параллельно на нескольких соединениях
+    queue = list(definitions)
+
+    async def worker():
+        connection = await asyncpg.connect(dsn)
+        try:
+            while queue:
+                await connection.execute(queue.pop())
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(jobs, len(definitions))))))
+
+
+async def finish() -> None:
+    from app.core.db import AsyncSessionLocal, engine
+    from app.core.versions import table_versions
+    from app.modules.reports import rollups
+
+    connection = await asyncpg.connect(settings.LISTEN_DATABASE_URL)
+    try:
+        for table in TABLES:
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}")
+    finally:
+        await connection.close()
+    async with AsyncSessionLocal() as db:
+        await rollups.rebuild(db)
+        # Запущенные процессы API сбросят ETag списков
+        for table in ('clients', 'vehicles', 'tariffs', 'parking_spaces'):
+            await table_versions.bump(db, table)
+        await db.commit()
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql(f"ANALYZE {', '.join(TABLES)}, daily_revenue, daily_sessions")
+    await engine.dispose()
+
+
+def run_phase(pool: ProcessPoolExecutor, plan: Plan, table: str, total: int) -> None:
+    started = time.perf_counter()
+    futures = [pool.submit(load_chunk, plan, table, chunk, start, count) for chunk, start, count in plan.chunks(total)]
+    rows = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - started
+    print(f'{table:<18} {rows:>11,} строк  {elapsed:>7.1f} c  {rows / elapsed:>10,.0f} строк/с', file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных")
+    parser.add_argument('--sessions', type=int, default=1_000_000)
+    parser.add_argument('--clients', type=int, default=None, help="По умолчанию sessions / 40")
+    parser.add_argument('--vehicles', type=int, default=None, help="По умолчанию clients * 1.25")
+    parser.add_argument('--spaces', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365, help="Длина периода, дней до --end")
+    parser.add_argument('--end', type=date.fromisoformat, default=date.today(), help="Конец периода (не включительно)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=200_000)
+    parser.add_argument('--truncate', action='store_true', help="Очистить таблицы перед загрузкой")
+    parser.add_argument('--keep-indexes', action='store_true', help="Не перестраивать индексы после загрузки")
+    parser.add_argument('--skip-fk-checks', action='store_true',
+                        help="Не проверять внешние ключи при COPY (нужны права суперпользователя)")
+    args = parser.parse_args()
+
+    plan = Plan(args)
+    print(f'seed={plan.seed} end={args.end} days={plan.days}: {plan.clients:,} клиентов, {plan.vehicles:,} ТС, '
+          f'{plan.spaces:,} мест, {plan.sessions:,} сессий', file=sys.stderr)
+    started = time.perf_counter()
+    asyncio.run(prepare(plan, args.truncate))
+    indexes = [] if args.keep_indexes else asyncio.run(drop_indexes(plan.dsn))
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            run_phase(pool, plan, 'clients', plan.clients)
+            run_phase(pool, plan, 'vehicles', plan.vehicles)
+            run_phase(pool, plan, 'parking_sessions', plan.sessions)
+    finally:
+        # Индексы возвращаются и при ошибке загрузки
+        if indexes:
+            index_started = time.perf_counter()
+            asyncio.run(create_indexes(plan.dsn, indexes, args.jobs))
+            print(f'индексы ({len(indexes)}) {time.perf_counter() - index_started:.1f} c', file=sys.stderr)
+    finish_started = time.perf_counter()
+    asyncio.run(finish())
+    print(f'роллапы и ANALYZE {time.perf_counter() - finish_started:.1f} c, всего {time.perf_counter() - started:.1f} c',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+    Нагрузочный прогон по сценариям с JSON-отчётом и сравнением с базовой линией.
+
+    Сценарии:
+        gate_storm      - въезд (POST /parking-sessions) и выезд (POST /parking-sessions/check-out)
+        payment_burst   - поток платежей POST /payments по закрытым сессиям
+        dashboard_poll  - опрос GET /reports/dashboard
+        large_lists     - списки по 1000 строк с переходом по курсору (сессии, платежи, ТС)
+
+    Каждая корутина нагрузки работает со своими ТС, местом и сессией, созданными через API
+    перед прогоном, поэтому сценарии записи не упираются в конфликты за одно место.
+    Результат - JSON (stdout или --output): запросы/с, p50/p95/p99 по сценарию и по операции,
+    считаются по успешным запросам; ошибки (HTTP >= 400 и сбои соединения) - отдельно.
+    С --baseline результат сравнивается с сохранённым: падение пропускной способности или рост
+    p95 больше --threshold, а также любые ошибки считаются регрессией, код возврата 1.
+
+    Прогон идёт против отдельной БД, данные сценариев записи в ней остаются:
+        docker compose --profile bench up -d bench-db
+        export POSTGRES_HOST=127.0.0.1 POSTGRES_PORT=5433 POSTGRES_DB=parking_bench
+        alembic upgrade head
+        python -m benchmarks.load --output result.json --baseline benchmarks/baseline.json
+        python -m benchmarks.load --save-baseline benchmarks/baseline.json
+
+    Без --base-url сервер запускается через serve.py (WEB_WORKERS из окружения).
+"""
+import abc
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+
+from benchmarks.server import running_server
+
+API = '/api/v1'
+
+
+def _utcnow() -> str:
+    return datetime.utcnow().isoformat()
+
+
+async def _timed(client: httpx.AsyncClient, op: str, samples: list, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    samples.append((op, started, time.perf_counter() - started, ok))
+    return response if ok else None
+
+
+class Scenario(abc.ABC):
+    name = ''
+
+    async def setup(self, client: httpx.AsyncClient, workers: int, run_id: str) -> list[dict]:
+        # Данные для каждой корутины нагрузки
+        return [{} for _ in range(workers)]
+
+    @abc.abstractmethod
+    async def step(self, client: httpx.AsyncClient, fixture: dict, samples: list) -> None:
+        # Одна итерация корутины нагрузки; замеры операций добавляются в samples через _timed
+        ...
+
+
+async def _post(client: httpx.AsyncClient, url: str, payload: dict) -> dict:
+    response = await client.post(url, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def _gate_fixtures(client: httpx.AsyncClient, workers: int, run_id: str) -> list[dict]:
+    tariffs = (await client.get(f'{API}/tariffs/')).json()
+    tariff = tariffs[0] if tariffs else await _post(client, f'{API}/tariffs/', {
+        'name': 'Бенчмарк', 'price_per_hour': '100.00', 'price_per_day': '1000.00'})
+    owner = await _post(client, f'{API}/clients/', {'name': 'Бенчмарк', 'surname': run_id, 'phone': '+70000000000'})
+    fixtures = []
+    for i in range(workers):
+        space = await _post(client, f'{API}/parking-spaces/', {'number': f'L{run_id}{i:04d}', 'type_id': 1})
+        vehicle = await _post(client, f'{API}/vehicles/', {
+            'brand': 'Bench', 'model': 'Load', 'license_plate': f'LOAD{run_id}{i:05d}',
+            'color': 'white', 'type_id': 1, 'client_id': owner['id']})
+        fixtures.append({'tariff_id': tariff['id'], 'space_id': space['id'],
+                         'vehicle_id': vehicle['id'], 'license_plate': vehicle['license_plate']})
+    return fixtures
+
+
+class GateStorm(Scenario):
+    name = 'gate_storm'
+
+    async def setup(self, client, workers, run_id):
+        return await _gate_fixtures(client, workers, f'g{run_id}')
+
+    async def step(self, client, fixture, samples):
+        # time_in с запасом на расхождение часов клиента и сервера: выезд берёт время сервера
+        session = await _timed(client, 'check_in', samples, 'POST', f'{API}/parking-sessions/', json={
+            'vehicle_id': fixture['vehicle_id'], 'space_id': fixture['space_id'], 'tariff_id': fixture['tariff_id'],
+            'time_in': (datetime.utcnow() - timedelta(minutes=5)).isoformat()})
+        if session is not None:
+            await _timed(client, 'check_out', samples, 'POST', f'{API}/parking-sessions/check-out',
+                         json={'license_plate': fixture['license_plate']})
+
+
+class PaymentBurst(Scenario):
+    name = 'payment_burst'
+
+    async def setup(self, client, workers, run_id):
+        fixtures = await _gate_fixtures(client, workers, f'p{run_id}')
+        time_out = datetime.utcnow()
+        for fixture in fixtures:
+            session = await _post(client, f'{API}/parking-sessions/', {
+                'vehicle_id': fixture['vehicle_id'], 'space_id': fixture['space_id'], 'tariff_id': fixture['tariff_id'],
+                'time_in': (time_out - timedelta(hours=2)).isoformat(), 'time_out': time_out.isoformat()})
+            fixture['session_id'] = session['id']
+        return fixtures
+
+    async def step(self, client, fixture, samples):
+        # Сумма не передаётся - берётся total_cost сессии
+        await _timed(client, 'payment', samples, 'POST', f'{API}/payments/', json={
+            'session_id': fixture['session_id'], 'method_id': 1, 'time': _utcnow()})
+
+
+class DashboardPoll(Scenario):
+    name = 'dashboard_poll'
+
+    async def step(self, client, fixture, samples):
+        await _timed(client, 'dashboard', samples, 'GET', f'{API}/reports/dashboard')
+
+
+class LargeLists(Scenario):
+    name = 'large_lists'
+    paths = ('/parking-sessions/', '/payments/', '/vehicles/')
+    pages = 3
+
+    async def step(self, client, fixture, samples):
+        path = self.paths[fixture.setdefault('i', 0) % len(self.paths)]
+        fixture['i'] += 1
+        params = {'limit': 1000}
+        for _ in range(self.pages):
+            response = await _timed(client, f'list {path}', samples, 'GET', API + path, params=params)
+            cursor = response.headers.get('x-next-cursor') if response is not None else None
+            if not cursor:
+                break
+            params['cursor'] = cursor
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (GateStorm(), PaymentBurst(), DashboardPoll(), LargeLists())}
+
+
+async def _drive(base_url: str, scenario_name: str, fixtures: list[dict], duration: float) -> list:
+    scenario = SCENARIOS[scenario_name]
+    samples = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=len(fixtures), max_keepalive_connections=len(fixtures))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker(fixture):
+            while time.perf_counter() < deadline:
+                await scenario.step(client, fixture, samples)
+
+        await asyncio.gather(*(worker(fixture) for fixture in fixtures))
+    return samples
+
+
+def _client_process(base_url: str, scenario_name: str, fixtures: list[dict], duration: float, queue) -> None:
+    queue.put(asyncio.run(_drive(base_url, scenario_name, fixtures, duration)))
+
+
+def percentile(values: list[float], q: float) -> float:
+    # values отсортированы; ближайший ранг
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def summarize(samples: list, started: float, duration: float) -> dict:
+    def stats(items):
+        # Быстрый ответ 500 не должен улучшать задержки и пропускную способность
+        latencies = sorted(latency for _, _, latency, ok in items if ok)
+        errors = sum(1 for *_, ok in items if not ok)
+        return {
+            'requests': len(items),
+            'errors': errors,
+            'error_rate': round(errors / len(items), 4) if items else 0.0,
+            'throughput': round(len(latencies) / duration, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
+
+    # Запросы прогрева не учитываются
+    measured = [sample for sample in samples if sample[1] >= started]
+    result = stats(measured)
+    result['operations'] = {op: stats([s for s in measured if s[0] == op]) for op in sorted({s[0] for s in measured})}
+    return result
+
+
+def run_scenario(base_url: str, scenario_name: str, args, run_id: str) -> dict:
+    workers = args.clients * args.concurrency
+
+    async def setup():
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            return await SCENARIOS[scenario_name].setup(client, workers, run_id)
+
+    fixtures = asyncio.run(setup())
+    queue = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=_client_process, args=(
+            base_url, scenario_name, fixtures[i * args.concurrency:(i + 1) * args.concurrency],
+            args.warmup + args.duration, queue))
+        for i in range(args.clients)
+    ]
+    # perf_counter - монотонные часы системы, отметки дочерних процессов с ними сравнимы
+    started = time.perf_counter() + args.warmup
+    for client in clients:
+        client.start()
+    samples = []
+    for _ in clients:
+        samples += queue.get()
+    for client in clients:
+        client.join()
+    return summarize(samples, started, args.duration)
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, current in result['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['throughput'] < previous['throughput'] * (1 - threshold):
+            regressions.append(f"{name}: пропускная способность {current['throughput']} < {previous['throughput']} req/s")
+        if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']} > {previous['p95_ms']} мс")
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{name}: ошибок {current['errors']} > {previous.get('errors', 0)} в базовой линии")
+        elif current['errors']:
+            regressions.append(f"{name}: ошибок {current['errors']} ({current['error_rate']:.2%} запросов)")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон по сценариям")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="По умолчанию - все")
+    parser.add_argument('--base-url', help="Уже запущенный сервер; без него запускается serve.py")
+    parser.add_argument('--port', type=int, default=8300)
+    parser.add_argument('--duration', type=float, default=20.0, help="Секунд замера на сценарий")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Секунд прогрева на сценарий")
+    parser.add_argument('--clients', type=int, default=2, help="Процессов-генераторов нагрузки")
+    parser.add_argument('--concurrency', type=int, default=16, help="Корутин на процесс")
+    parser.add_argument('--output', help="Файл для JSON-результата (по умолчанию stdout)")
+    parser.add_argument('--baseline', help="JSON базовой линии для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Допустимое ухудшение, доля")
+    parser.add_argument('--save-baseline', help="Сохранить результат как базовую линию")
+    args = parser.parse_args()
+
+    run_id = secrets.token_hex(2)
+    result = {
+        'meta': {
+            'started_at': _utcnow(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'duration': args.duration,
+            'clients': args.clients,
+            'concurrency': args.concurrency,
+        },
+        'scenarios': {},
+    }
+
+    def run_all(base_url: str) -> None:
+        for name in args.scenario or SCENARIOS:
+            summary = run_scenario(base_url, name, args, run_id)
+            result['scenarios'][name] = summary
+            print(f"{name:<15} {summary['throughput']:>8.1f} req/s  p50 {summary['p50_ms']:>7.1f}  "
+                  f"p95 {summary['p95_ms']:>7.1f}  p99 {summary['p99_ms']:>7.1f} мс  ошибок {summary['errors']}",
+                  file=sys.stderr)
+
+    if args.base_url:
+        run_all(args.base_url)
+    else:
+        env = dict(os.environ, WEB_HOST='127.0.0.1', WEB_PORT=str(args.port))
+        with running_server([sys.executable, 'serve.py'], args.port, env) as base_url:
+            run_all(base_url)
+
+    body = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(body + '\n')
+    else:
+        print(body)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(body + '\n')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'РЕГРЕССИЯ {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
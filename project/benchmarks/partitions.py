@@ -0,0 +1,172 @@
+"""
+    Латентность отчётных запросов на секционированных и обычных parking_sessions и payments.
+
+    Строки секционированных таблиц копируются в схему bench_unpartitioned в обычные таблицы
+    с прежними индексами (как до секционирования). Одни и те же запросы из reports.utils и
+    списков выполняются через соединение с search_path на эту схему (до, с прежним фильтром
+    закрытых сессий) и на public (после).
+    Для каждого запроса печатаются p50/p95, время планирования и число секций, к которым
+    обращался план (по EXPLAIN ANALYZE, без отсечённых при выполнении).
+
+    Данные - например, за два года из генератора:
+    python -m benchmarks.dataset --sessions 2000000 --days 730 --truncate
+    python -m benchmarks.partitions [--repeat 20] [--keep]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import asyncpg
+from sqlalchemy import Select, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pagination import paginate
+from app.core.partitions import PARTITIONED_TABLES, parent_table
+from app.models import ParkingSession, Payment
+from app.modules.reports import utils
+from benchmarks.query_plans import executed_relations
+
+UNPARTITIONED_SCHEMA = 'bench_unpartitioned'
+
+
+def closed_filter_before(start: datetime, finish: datetime) -> list:
+    # closed_sessions_filter до секционирования: без нижней границы time_in
+    return [ParkingSession.time_out.isnot(None), ParkingSession.total_cost.isnot(None),
+            ParkingSession.time_out >= start, ParkingSession.time_in <= finish]
+
+
+def report_queries(end: datetime, session_id: int, closed_filter) -> dict[str, Select]:
+    def revenue(start: datetime, finish: datetime) -> Select:
+        return select(
+            func.coalesce(func.sum(ParkingSession.total_cost), 0),
+            func.count(ParkingSession.id),
+            func.coalesce(func.avg(ParkingSession.total_cost), 0)
+        ).where(*closed_filter(start, finish))
+
+    month_ago = end - timedelta(days=30)
+    shares = utils.prorated_shares('day', closed_filter(month_ago, end)).subquery()
+    return {
+        'revenue_week': revenue(end - timedelta(days=7), end),
+        'revenue_month': revenue(month_ago, end),
+        'revenue_month_year_ago': revenue(end - timedelta(days=395), end - timedelta(days=365)),
+        'revenue_quarter': revenue(end - timedelta(days=91), end),
+        'sessions_count_month': select(func.count(ParkingSession.id)).where(
+            *utils.sessions_started_filter(month_ago, end)),
+        # Фильтр закрытых сессий дашборд строит сам: в обоих вариантах - текущий
+        'dashboard_month': utils.dashboard_metrics_query(month_ago, end),
+        'revenue_by_day_month': select(shares.c.bucket_start, func.sum(shares.c.share)).group_by(shares.c.bucket_start),
+        'payments_page_day': paginate(select(Payment).where(
+            Payment.time >= end - timedelta(days=1), Payment.time < end), [Payment.id], None, 100),
+        'session_by_id': select(ParkingSession).where(ParkingSession.id == session_id),
+        'active_sessions': select(func.count(ParkingSession.id)).where(ParkingSession.time_out.is_(None)),
+    }
+
+
+async def build_unpartitioned(connection: asyncpg.Connection) -> None:
+    await connection.execute(f'DROP SCHEMA IF EXISTS {UNPARTITIONED_SCHEMA} CASCADE')
+    await connection.execute(f'CREATE SCHEMA {UNPARTITIONED_SCHEMA}')
+    for table in PARTITIONED_TABLES:
+        started = time.perf_counter()
+        definitions = await connection.fetch("""
+            SELECT i.indexdef FROM pg_indexes i
+            WHERE i.schemaname = 'public' AND i.tablename = $1
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)
+        """, table)
+        await connection.execute(f'CREATE TABLE {UNPARTITIONED_SCHEMA}.{table} AS SELECT * FROM public.{table}')
+        await connection.execute(f'ALTER TABLE {UNPARTITIONED_SCHEMA}.{table} ADD PRIMARY KEY (id)')
+        for row in definitions:
+            await connection.execute(row['indexdef'].replace(
+                f' ON ONLY public.{table} ', f' ON {UNPARTITIONED_SCHEMA}.{table} '))
+        # Обе стороны с картой видимости: иначе index-only scan ходит в heap только на одной
+        await connection.execute(f'VACUUM ANALYZE {UNPARTITIONED_SCHEMA}.{table}')
+        await connection.execute(f'VACUUM ANALYZE public.{table}')
+        print(f'{UNPARTITIONED_SCHEMA}.{table}: {time.perf_counter() - started:.1f} c')
+
+
+def compile_query(query: Select) -> tuple[str, list]:
+    compiled = query.compile(dialect=engine.dialect)
+    return compiled.string, [compiled.params[key] for key in compiled.positiontup]
+
+
+async def measure(connection: asyncpg.Connection, sql: str, params: list) -> float:
+    started = time.perf_counter()
+    await connection.fetch(sql, *params)
+    return (time.perf_counter() - started) * 1000
+
+
+async def explain(connection: asyncpg.Connection, sql: str, params: list) -> tuple[float, int]:
+    plan = json.loads(await connection.fetchval(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', *params))[0]
+    partitions = sum(1 for relation in executed_relations(plan['Plan'])
+                     if parent_table(relation) in PARTITIONED_TABLES and relation not in PARTITIONED_TABLES)
+    return plan['Planning Time'], partitions
+
+
+def summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {'p50_ms': statistics.median(samples), 'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))]}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Отчёты до и после секционирования")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help=f"Не удалять схему {UNPARTITIONED_SCHEMA}")
+    parser.add_argument('--reuse', action='store_true', help=f"Использовать уже созданную схему {UNPARTITIONED_SCHEMA}")
+    args = parser.parse_args()
+
+    dsn = settings.LISTEN_DATABASE_URL
+    connection = await asyncpg.connect(dsn)
+    try:
+        end, session_id, sessions, months = await connection.fetchrow("""
+            SELECT max(time_in), (min(id) + max(id)) / 2, count(*),
+                   (SELECT count(*) FROM pg_inherits WHERE inhparent = 'parking_sessions'::regclass)
+            FROM parking_sessions
+        """)
+        if not sessions:
+            raise SystemExit("parking_sessions пуста: сначала python -m benchmarks.dataset")
+        if not args.reuse:
+            await build_unpartitioned(connection)
+    finally:
+        await connection.close()
+
+    print(f'{sessions:,} сессий до {end:%Y-%m-%d}, секций parking_sessions: {months}')
+    # Отдельное соединение на вариант: подготовленные выражения привязаны к таблицам search_path
+    before = await asyncpg.connect(dsn, server_settings={'search_path': f'{UNPARTITIONED_SCHEMA}, public'})
+    after = await asyncpg.connect(dsn, server_settings={'search_path': 'public'})
+    try:
+        variants = [
+            (before, report_queries(end, session_id, closed_filter_before)),
+            (after, report_queries(end, session_id, utils.closed_sessions_filter)),
+        ]
+        print(f"{'запрос':<24} {'до p50':>9} {'p95':>8} {'после p50':>10} {'p95':>8} {'план':>7} {'секций':>7} {'ускорение':>10}")
+        for name in variants[0][1]:
+            compiled = [(connection, *compile_query(queries[name])) for connection, queries in variants]
+            planning, partitions = await explain(*compiled[1])
+            samples = [[], []]
+            # Варианты чередуются, чтобы фон машины влиял на оба одинаково; первые прогоны - прогрев
+            for attempt in range(args.repeat + 2):
+                for index, (connection, sql, params) in enumerate(compiled):
+                    elapsed = await measure(connection, sql, params)
+                    if attempt >= 2:
+                        samples[index].append(elapsed)
+            b, a = summary(samples[0]), summary(samples[1])
+            print(f"{name:<24} {b['p50_ms']:>7.1f}мс {b['p95_ms']:>6.1f}мс {a['p50_ms']:>8.1f}мс {a['p95_ms']:>6.1f}мс "
+                  f"{planning:>5.1f}мс {partitions:>7} {b['p50_ms'] / a['p50_ms']:>9.1f}x")
+    finally:
+        await before.close()
+        await after.close()
+
+    if not args.keep:
+        connection = await asyncpg.connect(dsn)
+        try:
+            await connection.execute(f'DROP SCHEMA {UNPARTITIONED_SCHEMA} CASCADE')
+        finally:
+            await connection.close()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""
+    Сверка распределения выручки по интервалам с прежней реализацией на Python.
+
+    Создаёт сессии, пересекающие границы суток, недель (понедельник) и месяцев, в том числе
+    длинную через несколько месяцев, сессии, начинающиеся и заканчивающиеся ровно на
+    границе, и сессию, закрытую будущим временем. Для day/week/month сравнивает с прежним
+    построчным расчётом (до переноса в SQL):
+    - суммы reports.utils.prorated_shares по интервалам;
+    - get_revenue_by_period поверх daily_revenue, в котором оставлен только вклад этих
+      сессий (интервалы до начала окна отчёта не сравниваются, доли дней после текущих
+      суток в ряд не входят).
+    Ключи интервалов должны совпасть, суммы - с точностью до копейки (прежний расчёт во float).
+    Всё выполняется в транзакции, которая откатывается.
+
+    python -m benchmarks.prorating
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, select
+
+from app.models import Client, DailyRevenue, ParkingSession, ParkingSpace, Tariff, Vehicle
+from app.modules.reports import rollups, utils
+from benchmarks._db import insert_id, rolled_back
+
+CENT = Decimal('0.01')
+
+
+def python_prorated(period: str, sessions: list) -> dict:
+    """
+        Прежний get_revenue_by_period без запроса к БД: sessions - (time_in, time_out, total_cost).
+    """
+    revenue_by_period = {}
+    for session_start, session_end, total_cost in sessions:
+        total_cost = float(total_cost)
+        if period == 'day':
+            current_date = session_start.date()
+            end_date = session_end.date()
+            while current_date <= end_date:
+                period_key = current_date.isoformat()
+                day_start_dt = datetime.combine(current_date, datetime.min.time())
+                day_end_dt = datetime.combine(current_date, datetime.max.time().replace(hour=23, minute=59, second=59, microsecond=999999))
+                period_start = max(session_start, day_start_dt)
+                period_end = min(session_end, day_end_dt)
+                if period_start < period_end:
+                    day_duration = (period_end - period_start).total_seconds()
+                    total_duration = (session_end - session_start).total_seconds()
+                    day_cost = total_cost * (day_duration / total_duration) if total_duration > 0 else 0
+                    revenue_by_period[period_key] = revenue_by_period.get(period_key, 0) + day_cost
+                current_date += timedelta(days=1)
+        elif period == 'week':
+            current = session_start
+            while current <= session_end:
+                week_start = current - timedelta(days=current.weekday())
+                week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+                week_end = week_start + timedelta(days=7)
+                period_start = max(session_start, week_start)
+                period_end = min(session_end, week_end)
+                if period_start < period_end:
+                    period_duration = (period_end - period_start).total_seconds()
+                    total_duration = (session_end - session_start).total_seconds()
+                    period_cost = total_cost * (period_duration / total_duration) if total_duration > 0 else 0
+                    period_key = week_start.isoformat()
+                    revenue_by_period[period_key] = revenue_by_period.get(period_key, 0) + period_cost
+                current = week_end
+        else:
+            current = session_start
+            while current <= session_end:
+                month_start = current.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                if month_start.month == 12:
+                    month_end = month_start.replace(year=month_start.year + 1, month=1)
+                else:
+                    month_end = month_start.replace(month=month_start.month + 1)
+                period_start = max(session_start, month_start)
+                period_end = min(session_end, month_end)
+                if period_start < period_end:
+                    period_duration = (period_end - period_start).total_seconds()
+                    total_duration = (session_end - session_start).total_seconds()
+                    period_cost = total_cost * (period_duration / total_duration) if total_duration > 0 else 0
+                    period_key = month_start.isoformat()
+                    revenue_by_period[period_key] = revenue_by_period.get(period_key, 0) + period_cost
+                current = month_end
+    return {key: round(value, 2) for key, value in revenue_by_period.items()}
+
+
+def boundary_sessions(now: datetime) -> list:
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    monday = day - timedelta(days=day.weekday() + 7)
+    month = (now.replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return [
+        # через полночь
+        (day - timedelta(hours=3), day + timedelta(hours=2), Decimal('123.45')),
+        # через понедельник 00:00
+        (monday - timedelta(hours=5, minutes=17), monday + timedelta(hours=7), Decimal('777.77')),
+        # через 1-е число
+        (month - timedelta(days=2), month + timedelta(days=1, hours=3), Decimal('1000.00')),
+        # несколько месяцев, недель и суток
+        (month - timedelta(days=40, minutes=11), month + timedelta(days=10, hours=5), Decimal('9999.99')),
+        # ровно одни сутки, ровно одна неделя: интервалы полуоткрытые
+        (day, day + timedelta(days=1), Decimal('50.00')),
+        (monday, monday + timedelta(days=7), Decimal('350.00')),
+        # заканчивается ровно в полночь и начинается ровно 1-го числа
+        (day - timedelta(hours=5), day, Decimal('10.01')),
+        (month, month + timedelta(hours=1), Decimal('0.03')),
+        # внутри одних суток
+        (day + timedelta(hours=10), day + timedelta(hours=10, minutes=45), Decimal('99.99')),
+        # закрыта будущим временем: доли будущих дней не попадают в ряд отчёта
+        (now - timedelta(hours=1), now + timedelta(days=40), Decimal('4100.00')),
+    ]
+
+
+def window_start(period: str, now: datetime) -> str:
+    """
+        Первый интервал окна get_revenue_by_period в формате utils.period_key.
+    """
+    start = now - utils.PERIOD_WINDOWS[period]
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        start -= timedelta(days=start.weekday())
+    elif period == 'month':
+        start = start.replace(day=1)
+    return utils.period_key(period, start)
+
+
+def until(sessions: list, end: datetime) -> list:
+    """
+        Сессии, обрезанные по end, со стоимостью пропорционально оставшейся длительности.
+    """
+    clipped = []
+    for time_in, time_out, cost in sessions:
+        if time_out > end:
+            cost = float(cost) * (end - time_in).total_seconds() / (time_out - time_in).total_seconds()
+            time_out = end
+        clipped.append((time_in, time_out, cost))
+    return clipped
+
+
+def compare(name: str, actual: dict, expected: dict) -> bool:
+    mismatched = sorted(
+        key for key in actual.keys() | expected.keys()
+        if key not in actual or key not in expected
+        or abs(Decimal(str(actual[key])) - Decimal(str(expected[key]))) > CENT)
+    print(f"{'OK  ' if not mismatched else 'FAIL'} {name}: {len(expected)} интервалов")
+    for key in mismatched:
+        print(f"     {key}: SQL {actual.get(key)}, Python {expected.get(key)}")
+    return not mismatched
+
+
+async def main() -> int:
+    failures = 0
+    async with rolled_back() as db:
+        now = datetime.utcnow()
+        sessions = boundary_sessions(now)
+        tariff_id = await insert_id(db, Tariff, dict(
+            name='Сверка', price_per_hour=Decimal('100.00'), price_per_day=Decimal('1000.00')))
+        client_id = await insert_id(db, Client, dict(name='Имя', surname='Фамилия', phone='+70000000000'))
+        vehicle_id = await insert_id(db, Vehicle, dict(
+            brand='Марка', model='Модель', license_plate='PR-CHECK', color='белый', type_id=1, client_id=client_id))
+        space_id = await insert_id(db, ParkingSpace, dict(number='PR-1', type_id=1))
+        ids = [
+            await insert_id(db, ParkingSession, dict(
+                vehicle_id=vehicle_id, space_id=space_id, tariff_id=tariff_id,
+                time_in=time_in, time_out=time_out, total_cost=cost))
+            for time_in, time_out, cost in sessions
+        ]
+
+        for period in ('day', 'week', 'month'):
+            shares = utils.prorated_shares(period, [ParkingSession.id.in_(ids)]).subquery()
+            rows = await db.execute(select(
+                shares.c.bucket_start, func.round(func.sum(shares.c.share), 2)
+            ).group_by(shares.c.bucket_start))
+            actual = {utils.period_key(period, bucket_start): revenue for bucket_start, revenue in rows.all()}
+            failures += not compare(f'prorated_shares {period}', actual, python_prorated(period, sessions))
+
+        # Роллап только из этих сессий: остальное содержимое daily_revenue удаляется в транзакции
+        await db.execute(delete(DailyRevenue))
+        await rollups.apply_sessions(db, ids)
+        for period in ('day', 'week', 'month'):
+            first = window_start(period, now)
+            actual = {row['period']: row['revenue'] for row in await utils.get_revenue_by_period(period, db)}
+            # Ряд заканчивается текущими сутками
+            tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            expected = {key: value for key, value in python_prorated(period, until(sessions, tomorrow)).items()
+                        if key >= first}
+            failures += not compare(f'get_revenue_by_period {period}', actual, expected)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
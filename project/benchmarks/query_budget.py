@@ -0,0 +1,156 @@
+"""
+    Проверка бюджета SQL-выражений в тестовом режиме (QUERY_BUDGET_STRICT=true).
+
+    Приложение запускается со своим lifespan (индекс занятости, кэши, версии таблиц), как
+    в работе. Первым запросом процесса вызывается дашборд за каждый период, затем он же
+    после смены версии archive_files (как после запуска архиватора) - список файлов архива
+    должен обновиться по NOTIFY, а не в запросе. Дальше вызываются все GET-эндпоинты /api
+    без обязательных параметров, затем на созданных здесь же записях (клиент, ТС, место,
+    тариф, сессия, платёж) - создание, въезд, выезд (сначала с временем раньше въезда,
+    ожидается 400), оплата, чтение, изменение и удаление по id. Печатается число выражений
+    из заголовка Server-Timing. Код возврата 1, если какой-то вызов завершился не так, как
+    ожидалось: в строгом режиме выражение сверх объявленного бюджета даёт 500. Созданные
+    записи удаляются в конце вместе с их вкладом в роллапы.
+
+    python -m benchmarks.query_budget
+"""
+import asyncio
+import os
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+os.environ['QUERY_BUDGET_STRICT'] = 'true'
+
+import httpx  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+from app.core.db import AsyncSessionLocal  # noqa: E402
+from app.core.versions import table_versions  # noqa: E402
+from app.models import Client, ParkingSession, Payment  # noqa: E402
+from app.modules.reports import rollups  # noqa: E402
+from app.modules.reports.archive import manifest  # noqa: E402
+from app.modules.reports.cache import dashboard_cache  # noqa: E402
+from main import app  # noqa: E402
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Harness:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.failed = 0
+
+    async def call(self, method: str, path: str, expected_status: int = None, **kwargs) -> httpx.Response:
+        response = await self.client.request(method, path, **kwargs)
+        match = SERVER_TIMING_QUERIES.search(response.headers.get('server-timing', ''))
+        queries = match.group(1) if match else '?'
+        ok = response.status_code == expected_status if expected_status else response.is_success
+        self.failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {response.status_code} {method:<6} {path:<48} {queries:>3} SQL")
+        return response
+
+    async def created_id(self, path: str, data: dict) -> int:
+        response = await self.call('POST', path, json=data)
+        if not response.is_success:
+            raise SystemExit(f"Не удалось создать запись {path}: {response.text}")
+        return response.json()['id']
+
+
+async def dashboard_cold(harness: Harness) -> None:
+    dashboard = '/api/v1/reports/dashboard'
+    for period in ('day', 'week', 'month'):
+        await harness.call('GET', dashboard, params=dict(period=period))
+    # Новая версия archive_files без новых файлов: процессы получают тот же NOTIFY, что от архиватора
+    async with AsyncSessionLocal() as db:
+        await table_versions.bump(db, 'archive_files')
+        await db.commit()
+    for _ in range(50):
+        if manifest.version == table_versions.get('archive_files'):
+            break
+        await asyncio.sleep(0.1)
+    else:
+        print("FAIL список файлов архива не обновился по NOTIFY")
+        harness.failed += 1
+    dashboard_cache.invalidate()
+    await harness.call('GET', dashboard, params=dict(period='day'))
+
+
+async def exercise_by_id(harness: Harness, fixtures: dict) -> None:
+    api = '/api/v1'
+    now = datetime.utcnow().replace(microsecond=0)
+    fixtures['client'] = await harness.created_id(f'{api}/clients/', dict(name='Бюджет', surname='Проверка', phone='+70000000000'))
+    type_id = (await harness.call('GET', f'{api}/references/vehicle-types')).json()[0]['id']
+    method_id = (await harness.call('GET', f'{api}/references/payment-methods')).json()[0]['id']
+    plate = f'QB-{uuid.uuid4().hex[:8]}'
+    fixtures['vehicle'] = await harness.created_id(f'{api}/vehicles/', dict(
+        brand='Марка', model='Модель', license_plate=plate, color='белый', type_id=type_id, client_id=fixtures['client']))
+    fixtures['space'] = await harness.created_id(f'{api}/parking-spaces/', dict(number=plate[:10], type_id=type_id))
+    await harness.call('GET', f'{api}/parking-spaces/free/next', params=dict(type_id=type_id))
+    fixtures['tariff'] = await harness.created_id(f'{api}/tariffs/', dict(
+        name='Бюджет', price_per_hour='100.00', price_per_day='1000.00'))
+    fixtures['session'] = await harness.created_id(f'{api}/parking-sessions/', dict(
+        vehicle_id=fixtures['vehicle'], space_id=fixtures['space'], tariff_id=fixtures['tariff'],
+        time_in=(now - timedelta(hours=2)).isoformat()))
+    # Время выхода раньше въезда - 400, сессия остаётся открытой
+    await harness.call('POST', f'{api}/parking-sessions/check-out', expected_status=400, json=dict(
+        license_plate=plate, time_out=(now - timedelta(hours=3)).isoformat()))
+    await harness.call('POST', f'{api}/parking-sessions/check-out', json=dict(license_plate=plate, time_out=now.isoformat()))
+    fixtures['payment'] = await harness.created_id(f'{api}/payments/', dict(
+        session_id=fixtures['session'], method_id=method_id, time=now.isoformat()))
+
+    item_paths = {
+        f"{api}/clients/{fixtures['client']}": dict(phone='+70000000001'),
+        f"{api}/vehicles/{fixtures['vehicle']}": dict(color='чёрный'),
+        f"{api}/parking-spaces/{fixtures['space']}": dict(number=plate[-10:]),
+        f"{api}/tariffs/{fixtures['tariff']}": dict(name='Бюджет 2'),
+        f"{api}/parking-sessions/{fixtures['session']}": dict(total_cost='250.00'),
+        f"{api}/payments/{fixtures['payment']}": dict(amount='250.00'),
+    }
+    for path, update in item_paths.items():
+        await harness.call('GET', path)
+        await harness.call('PUT', path, json=update)
+
+
+async def cleanup(harness: Harness, fixtures: dict) -> None:
+    # Сессии и платежи удаляются только напрямую (в API нет DELETE), вместе с вкладом в роллапы;
+    # ТС, место и тариф после этого - через API
+    api = '/api/v1'
+    async with AsyncSessionLocal() as db:
+        if 'payment' in fixtures:
+            await db.execute(delete(Payment).where(Payment.id == fixtures['payment']))
+        if 'session' in fixtures:
+            await rollups.apply_session(db, fixtures['session'], -1)
+            await db.execute(delete(ParkingSession).where(ParkingSession.id == fixtures['session']))
+        await db.commit()
+    for name, path in (('vehicle', 'vehicles'), ('space', 'parking-spaces'), ('tariff', 'tariffs')):
+        if name in fixtures:
+            await harness.call('DELETE', f'{api}/{path}/{fixtures[name]}')
+    if 'client' in fixtures:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Client).where(Client.id == fixtures['client']))
+            await db.commit()
+
+
+async def main() -> int:
+    paths = [path for path, operations in app.openapi()['paths'].items()
+             if path.startswith('/api/') and 'get' in operations and '{' not in path
+             and not any(parameter['required'] for parameter in operations['get'].get('parameters', []))]
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://budget') as client:
+            harness = Harness(client)
+            await dashboard_cold(harness)
+            for path in paths:
+                await harness.call('GET', path)
+            fixtures = {}
+            try:
+                await exercise_by_id(harness, fixtures)
+            finally:
+                await cleanup(harness, fixtures)
+    return 1 if harness.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
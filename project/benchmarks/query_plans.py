@@ -0,0 +1,161 @@
+"""
+    Регрессионная проверка планов горячих запросов.
+
+    Наполняет таблицы синтетическими данными внутри транзакции, выполняет ANALYZE
+    и проверяет через EXPLAIN ANALYZE, что запросы из reports.utils и списков не используют
+    последовательное сканирование больших таблиц. Секции, отсечённые при выполнении
+    (never executed), не учитываются. Транзакция откатывается.
+
+    python -m benchmarks.query_plans [--sessions 500000]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import Select, select, text
+
+from app.core.db import engine
+from app.core.pagination import paginate
+from app.core.partitions import PARTITIONED_TABLES, ensure_partitions, parent_table
+from app.models import ParkingSession, Payment, Vehicle
+from app.modules.reports import rollups, utils
+from benchmarks._db import rolled_back
+
+LARGE_TABLES = {'parking_sessions', 'payments', 'vehicles'}
+# Секцию в несколько страниц дешевле прочитать целиком, чем через индекс
+SMALL_PARTITION_PAGES = 64
+
+SEED_SQL = [
+    "INSERT INTO clients (name, surname, phone, created_at) "
+    "SELECT 'Имя', 'Фамилия', '+7' || g, now() FROM generate_series(1, :sessions / 20) g",
+    "INSERT INTO tariffs (name, price_per_hour, price_per_day, created_at) "
+    "SELECT 'Тариф ' || g, 50 + g * 10, 500 + g * 100, now() FROM generate_series(1, 5) g",
+    "INSERT INTO vehicles (brand, model, license_plate, color, type_id, client_id) "
+    "SELECT 'Марка', 'Модель', 'QP-' || g, 'белый', 1 + g % 3, c.first_id + g % (:sessions / 20) "
+    "FROM generate_series(1, :sessions / 10) g, (SELECT max(id) - :sessions / 20 + 1 AS first_id FROM clients) c",
+    "INSERT INTO parking_spaces (number, type_id, created_at) "
+    "SELECT 'QP-' || g, 1 + g % 3, now() FROM generate_series(1, 500) g",
+    "INSERT INTO parking_sessions (vehicle_id, space_id, tariff_id, time_in, time_out, total_cost, created_at) "
+    "SELECT v.first_id + g % (:sessions / 10), s.first_id + g % 500, t.first_id + g % 5, "
+    "       now() - (g || ' minutes')::interval, "
+    "       CASE WHEN g % 100 = 0 THEN NULL ELSE now() - (g || ' minutes')::interval + interval '3 hours' END, "
+    "       CASE WHEN g % 100 = 0 THEN NULL ELSE 300 END, now() "
+    "FROM generate_series(1, :sessions) g, "
+    "     (SELECT max(id) - :sessions / 10 + 1 AS first_id FROM vehicles) v, "
+    "     (SELECT max(id) - 499 AS first_id FROM parking_spaces) s, "
+    "     (SELECT max(id) - 4 AS first_id FROM tariffs) t",
+    "INSERT INTO payments (session_id, amount, method_id, time, created_at) "
+    "SELECT id, total_cost, 1 + id % 3, time_out, now() FROM parking_sessions "
+    "WHERE total_cost IS NOT NULL AND id > (SELECT max(id) - :sessions FROM parking_sessions)",
+]
+
+
+def hot_queries() -> dict[str, Select]:
+    now = datetime.utcnow()
+    day_ago = now - timedelta(days=1)
+    return {
+        'dashboard_metrics': utils.dashboard_metrics_query(day_ago, now),
+        'sessions_count': select(ParkingSession.id).where(*utils.sessions_started_filter(day_ago, now)),
+        'revenue_week': utils.prorated_shares('day', utils.closed_sessions_filter(now - timedelta(days=7), now)),
+        'rollup_session_revenue': rollups._revenue_rows([ParkingSession.id == 42]),
+        'open_sessions_by_space': select(ParkingSession.space_id).where(ParkingSession.time_out.is_(None)),
+        'sessions_page_time_in': paginate(select(ParkingSession), [ParkingSession.time_in, ParkingSession.id],
+                                          None, 100, descending=True),
+        'sessions_by_vehicle': paginate(select(ParkingSession).where(ParkingSession.vehicle_id == 42),
+                                        [ParkingSession.id], None, 100),
+        'sessions_by_space': paginate(select(ParkingSession).where(ParkingSession.space_id == 42),
+                                      [ParkingSession.id], None, 100),
+        'open_session_by_vehicle': select(ParkingSession).where(
+            ParkingSession.vehicle_id == 42, ParkingSession.time_out.is_(None)),
+        'payments_by_session': select(Payment).where(Payment.session_id == 42),
+        'payments_by_time': paginate(select(Payment).where(Payment.time >= day_ago), [Payment.id], None, 100),
+        'vehicles_by_client': select(Vehicle).where(Vehicle.client_id == 42),
+    }
+
+
+def plan_root(plan) -> dict:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def executed_relations(plan: dict) -> set[str]:
+    if plan.get('Actual Loops') == 0:
+        return set()
+    found = {plan['Relation Name']} if 'Relation Name' in plan else set()
+    for child in plan.get('Plans', []):
+        found |= executed_relations(child)
+    return found
+
+
+def prunes_partitions(append: dict, partition_pages: dict[str, int]) -> bool:
+    """
+        Append по секциям прочитал не все непустые секции своей таблицы: при планировании
+        или при выполнении (never executed) отсечена часть диапазона.
+    """
+    executed = {relation for relation in executed_relations(append) if partition_pages.get(relation, 0) > 0}
+    tables = {parent_table(relation) for relation in executed}
+    non_empty = {relation for relation, pages in partition_pages.items() if parent_table(relation) in tables and pages > 0}
+    return bool(tables) and len(executed) < len(non_empty)
+
+
+def seq_scans(plan: dict, partition_pages: dict[str, int]) -> list[str]:
+    """
+        Последовательные сканирования больших таблиц. Секции (parking_sessions_2026_01)
+        проверяются на уровне Append: пустые и мелкие не учитываются, сканирование одной секции
+        допустимо (граничный месяц диапазона), нескольких - только если Append отсёк часть
+        непустых секций и читает лишь нужный запросу диапазон.
+    """
+    if plan.get('Actual Loops') == 0:
+        return []
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in LARGE_TABLES:
+        found.append(plan['Relation Name'])
+    if plan.get('Node Type') in ('Append', 'Merge Append'):
+        scans = [child['Relation Name'] for child in plan.get('Plans', [])
+                 if child.get('Node Type') == 'Seq Scan' and child.get('Actual Loops') != 0
+                 and parent_table(child.get('Relation Name', '')) in LARGE_TABLES
+                 and partition_pages.get(child['Relation Name'], 0) > SMALL_PARTITION_PAGES]
+        if len(scans) > 1 and not prunes_partitions(plan, partition_pages):
+            found.extend(scans)
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child, partition_pages))
+    return found
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов")
+    parser.add_argument('--sessions', type=int, default=500_000)
+    args = parser.parse_args()
+
+    failures = 0
+    async with rolled_back() as db:
+        conn = await db.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        # Секции под синтетические данные (до :sessions минут назад) создаются в той же транзакции
+        now = datetime.utcnow()
+        for table in PARTITIONED_TABLES:
+            await ensure_partitions(raw, table, (now - timedelta(minutes=args.sessions)).date(), now.date())
+        for statement in SEED_SQL:
+            await conn.execute(text(statement), {'sessions': args.sessions})
+        for table in ('clients', 'vehicles', 'parking_spaces', 'tariffs', 'parking_sessions', 'payments'):
+            await conn.execute(text(f'ANALYZE {table}'))
+        partition_pages = dict(await raw.fetch("""
+            SELECT c.relname, c.relpages FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = ANY($1::regclass[])
+        """, list(PARTITIONED_TABLES)))
+        for name, query in hot_queries().items():
+            compiled = query.compile(dialect=engine.dialect)
+            params = [compiled.params[key] for key in compiled.positiontup]
+            plan = await raw.fetchval(f'EXPLAIN (ANALYZE, FORMAT JSON) {compiled.string}', *params)
+            scans = seq_scans(plan_root(plan), partition_pages)
+            status = 'OK' if not scans else f"SEQ SCAN on {', '.join(sorted(set(scans)))}"
+            failures += bool(scans)
+            print(f'{name:<28} {status}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,59 @@
+"""
+    Проверка пакетного пересчёта стоимости (app.modules.parking.repricing --apply).
+
+    Создаёт тариф и три закрытые сессии: обычную с неверной стоимостью и две с
+    time_out <= time_in (такие API не тарифицирует). Пересчёт должен исправить первую и не
+    читать и не переписывать остальные. Всё выполняется в транзакции, commit чанков
+    пересчёта - точки сохранения внутри неё; транзакция откатывается.
+
+    python -m benchmarks.repricing
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.models import Client, ParkingSession, ParkingSpace, Tariff, Vehicle
+from app.modules.parking.repricing import reprice_sessions
+from benchmarks._db import insert_id, rolled_back
+
+
+async def main() -> int:
+    failures = 0
+    async with rolled_back() as db:
+        now = datetime.utcnow().replace(microsecond=0)
+        tariff_id = await insert_id(db, Tariff, dict(
+            name='Пересчёт', price_per_hour=Decimal('100.00'), price_per_day=Decimal('1000.00')))
+        client_id = await insert_id(db, Client, dict(name='Имя', surname='Фамилия', phone='+70000000000'))
+        vehicle_id = await insert_id(db, Vehicle, dict(
+            brand='Марка', model='Модель', license_plate='RP-CHECK', color='белый', type_id=1, client_id=client_id))
+        space_id = await insert_id(db, ParkingSpace, dict(number='RP-1', type_id=1))
+        common = dict(vehicle_id=vehicle_id, space_id=space_id, tariff_id=tariff_id)
+        # 3 начатых часа по 100 = 300.00, записано 1.00
+        valid = await insert_id(db, ParkingSession, dict(
+            common, time_in=now - timedelta(hours=3), time_out=now - timedelta(minutes=5), total_cost=Decimal('1.00')))
+        invalid = {}
+        for time_out, cost in ((now - timedelta(hours=1), Decimal('100.00')), (now - timedelta(hours=2), Decimal('200.00'))):
+            session_id = await insert_id(db, ParkingSession, dict(
+                common, time_in=now - timedelta(hours=1), time_out=time_out, total_cost=cost))
+            invalid[session_id] = cost
+
+        report = await reprice_sessions(db, tariff_id=tariff_id, dry_run=False)
+        costs = dict((await db.execute(select(ParkingSession.id, ParkingSession.total_cost).where(
+            ParkingSession.id.in_([valid, *invalid])))).all())
+        checks = {
+            'scanned only the valid session': report.scanned == 1,
+            'changes exclude time_out <= time_in': {c.session_id for c in report.changes} == {valid},
+            'valid session repriced': costs[valid] == Decimal('300.00'),
+            'time_out <= time_in costs kept': all(costs[i] == cost for i, cost in invalid.items()),
+        }
+        for name, ok in checks.items():
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
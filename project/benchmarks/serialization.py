@@ -0,0 +1,117 @@
+"""
+    Сериализация списка из 10k парковочных сессий.
+
+    orm      - ORM-объекты, валидация response_model и стандартный JSONResponse (прежний путь)
+    orjson   - ORM-объекты, response_model, ORJSONResponse
+    mappings - строки Result.mappings() через rows_response, без Pydantic
+
+    Данные собираются в памяти, замеряется только обработка запроса FastAPI (ASGI без сети).
+    С --fetch дополнительно сравнивается выборка тех же строк из БД ORM-объектами и mappings.
+
+    python -m benchmarks.serialization [--rows 10000] [--repeat 20] [--fetch]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.core.responses import ORJSONResponse, columns_of, rows_response
+from app.models import ParkingSession
+from app.modules.parking.schemas import ParkingSessionOut
+
+
+def make_rows(count: int) -> list[dict]:
+    started = datetime(2025, 1, 1, 8, 0, 0, 123456)
+    rows = []
+    for i in range(count):
+        time_in = started + timedelta(minutes=7 * i)
+        closed = i % 4 != 0
+        rows.append({
+            'vehicle_id': i % 500 + 1,
+            'space_id': i % 120 + 1,
+            'tariff_id': i % 3 + 1,
+            'time_in': time_in,
+            'time_out': time_in + timedelta(hours=2, minutes=i % 60) if closed else None,
+            'total_cost': Decimal(150 * (i % 5 + 1)).quantize(Decimal('0.01')) if closed else None,
+            'id': i + 1,
+            'created_at': time_in,
+        })
+    return rows
+
+
+def build_app(rows: list[dict]) -> FastAPI:
+    sessions = [ParkingSession(**row) for row in rows]
+    app = FastAPI()
+
+    @app.get('/orm', response_model=list[ParkingSessionOut], response_class=JSONResponse)
+    async def orm():
+        return sessions
+
+    @app.get('/orjson', response_model=list[ParkingSessionOut], response_class=ORJSONResponse)
+    async def orjson():
+        return sessions
+
+    @app.get('/mappings', response_model=list[ParkingSessionOut])
+    async def mappings(response: Response):
+        return rows_response(rows, response)
+
+    return app
+
+
+async def serialize(rows: list[dict], repeat: int) -> None:
+    app = build_app(rows)
+    bodies = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        for path in ('/orm', '/orjson', '/mappings'):
+            await client.get(path)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                response = await client.get(path)
+            elapsed = (time.perf_counter() - started) / repeat
+            bodies[path] = response.content
+            print(f'{path[1:]:<10} {elapsed * 1000:>8.1f} ms/response  {len(response.content) / 1024:>7.0f} KiB')
+    print('тела ответов совпадают' if len(set(bodies.values())) == 1 else 'ВНИМАНИЕ: тела ответов различаются')
+
+
+async def fetch(count: int, repeat: int) -> None:
+    from app.core.db import AsyncSessionLocal, engine
+
+    queries = {
+        'orm': (select(ParkingSession).order_by(ParkingSession.id).limit(count), lambda r: r.scalars().all()),
+        'mappings': (select(*columns_of(ParkingSession, ParkingSessionOut)).order_by(ParkingSession.id).limit(count),
+                     lambda r: r.mappings().all()),
+    }
+    try:
+        for name, (query, materialize) in queries.items():
+            timings = []
+            for _ in range(repeat + 1):
+                async with AsyncSessionLocal() as db:
+                    started = time.perf_counter()
+                    fetched = materialize(await db.execute(query))
+                    timings.append(time.perf_counter() - started)
+            # Первый прогон - прогрев кэша запросов
+            print(f'fetch {name:<10} {sum(timings[1:]) / repeat * 1000:>8.1f} ms  ({len(fetched)} строк)')
+    finally:
+        await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Сериализация списка парковочных сессий")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--fetch', action='store_true', help="Сравнить и выборку из БД")
+    args = parser.parse_args()
+
+    await serialize(make_rows(args.rows), args.repeat)
+    if args.fetch:
+        await fetch(args.rows, max(args.repeat // 4, 1))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
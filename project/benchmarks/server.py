@@ -0,0 +1,134 @@
+"""
+    Пропускная способность dev-сервера (fastapi dev: один процесс, reload, asyncio + h11)
+    и production-запуска (serve.py: воркеры, uvloop, httptools).
+
+    Каждый сервер запускается подпроцессом на своём порту. Нагрузку дают --clients процессов,
+    в каждом --concurrency корутин с keep-alive соединениями; за --duration секунд
+    печатаются запросы/с, p50/p99 и число ошибок. Без --workers production-сервер
+    берёт WEB_WORKERS из настроек (0 - по числу CPU).
+
+    python -m benchmarks.server [--duration 15] [--clients 2] [--concurrency 32] [--workers N]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+
+PATHS = (
+    '/health',
+    '/api/v1/tariffs/',
+    '/api/v1/parking-spaces/?limit=50',
+    '/api/v1/parking-sessions/?limit=50',
+)
+
+
+async def _load(base_url: str, duration: float, concurrency: int) -> tuple[list[float], int]:
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(PATHS[i % len(PATHS)])
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                i += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(base_url: str, duration: float, concurrency: int, queue) -> None:
+    queue.put(asyncio.run(_load(base_url, duration, concurrency)))
+
+
+def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + '/health', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"Сервер {base_url} не поднялся за {timeout:.0f} c")
+
+
+def run_load(base_url: str, args) -> None:
+    queue = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=_client_process, args=(base_url, args.duration, args.concurrency, queue))
+               for _ in range(args.clients)]
+    for client in clients:
+        client.start()
+    latencies, errors = [], 0
+    for _ in clients:
+        client_latencies, client_errors = queue.get()
+        latencies += client_latencies
+        errors += client_errors
+    for client in clients:
+        client.join()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f'  {len(latencies) / args.duration:>8.0f} req/s  p50 {p50:>6.1f} ms  p99 {p99:>6.1f} ms  ошибок {errors}')
+
+
+@contextmanager
+def running_server(command: list[str], port: int, env: dict):
+    """
+        Запускает сервер подпроцессом, ждёт /health и по выходе останавливает его SIGTERM.
+    """
+    # Своя группа процессов: dev-сервер с reload порождает дочерний процесс
+    server = subprocess.Popen(command, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_ready(base_url)
+        yield base_url
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def bench(name: str, command: list[str], port: int, args, env: dict) -> None:
+    print(f'{name}: {" ".join(command)}')
+    with running_server(command, port, env) as base_url:
+        run_load(base_url, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пропускная способность dev- и production-сервера")
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--clients', type=int, default=2, help="Процессов-генераторов нагрузки")
+    parser.add_argument('--concurrency', type=int, default=32, help="Одновременных запросов на процесс")
+    parser.add_argument('--workers', type=int, default=None, help="WEB_WORKERS для serve.py")
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    bench('dev', ['fastapi', 'dev', 'main.py', '--host', '127.0.0.1', '--port', str(args.port)], args.port, args, env)
+
+    prod_env = dict(env, WEB_HOST='127.0.0.1', WEB_PORT=str(args.port + 1))
+    if args.workers is not None:
+        prod_env['WEB_WORKERS'] = str(args.workers)
+    bench('production', [sys.executable, 'serve.py'], args.port + 1, args, prod_env)
+
+
+if __name__ == '__main__':
+    main()
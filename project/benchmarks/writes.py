@@ -0,0 +1,99 @@
+"""
+    Сравнение пути записи: прежний ORM (add + commit + refresh, get + setattr + commit + refresh)
+    и INSERT/UPDATE ... RETURNING из app.core.crud.
+
+    Для каждого варианта создаётся и обновляется --count клиентов с commit на каждую запись,
+    печатаются записи/с и число SQL-запросов на запись (без COMMIT). Созданные строки удаляются.
+
+    python -m benchmarks.writes [--count 2000]
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete, event
+
+from app.core.crud import changed_fields, insert_returning, update_returning
+from app.core.db import AsyncSessionLocal, engine
+from app.models import Client
+from app.modules.clients.schemas import ClientsCreate, ClientsUpdate
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, 'before_cursor_execute', self)
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+async def legacy_create(db, data: ClientsCreate) -> Client:
+    client = Client(name=data.name, surname=data.surname, phone=data.phone)
+    db.add(client)
+    await db.commit()
+    await db.refresh(client)
+    return client
+
+
+async def legacy_update(db, client_id: int, data: ClientsUpdate) -> Client:
+    client = await db.get(Client, client_id)
+    if data.phone is not None:
+        client.phone = data.phone
+    db.add(client)
+    await db.commit()
+    await db.refresh(client)
+    return client
+
+
+async def returning_create(db, data: ClientsCreate) -> Client:
+    client = await insert_returning(db, Client, data.model_dump())
+    await db.commit()
+    return client
+
+
+async def returning_update(db, client_id: int, data: ClientsUpdate) -> Client:
+    client = await update_returning(db, Client, client_id, changed_fields(data))
+    await db.commit()
+    return client
+
+
+async def run(name: str, create, update, count: int, counter: StatementCounter) -> list[int]:
+    ids = []
+    for op, label in ((create, 'create'), (update, 'update')):
+        counter.count = 0
+        started = time.perf_counter()
+        for i in range(count):
+            # Новая сессия на каждую запись, как на запрос в get_db
+            async with AsyncSessionLocal() as db:
+                if op is create:
+                    client = await create(db, ClientsCreate(name='Bench', surname=name, phone=str(i)))
+                    ids.append(client.id)
+                else:
+                    await update(db, ids[i], ClientsUpdate(phone=f'+{i}'))
+        elapsed = time.perf_counter() - started
+        print(f'{name:<10} {label:<7} {count / elapsed:>9.0f} writes/s  {counter.count / count:.1f} stmts/write')
+    return ids
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение пути записи ORM и RETURNING")
+    parser.add_argument('--count', type=int, default=2000)
+    args = parser.parse_args()
+
+    counter = StatementCounter()
+    created = []
+    try:
+        # Прогрев пула соединений и кэша запросов
+        created += await run('warmup', returning_create, returning_update, 50, counter)
+        created += await run('legacy', legacy_create, legacy_update, args.count, counter)
+        created += await run('returning', returning_create, returning_update, args.count, counter)
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Client).where(Client.id.in_(created)))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
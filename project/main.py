@@ -1,13 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.db import get_db
+from app.core.config import settings
+from app.core.db import get_db, AsyncSessionLocal, engine
+from app.core.pool import pool_stats
+from app.core.metrics import MetricsMiddleware, instrument_engine, metrics_response, mark_process_dead
+from app.core import query_budget
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.partitions import maintain_forever
+from app.core.responses import ORJSONResponse
+from app.core.versions import table_versions, listen_for_versions
 from app.api.v1 import api_router
+from app.modules.parking.occupancy import occupancy, reconcile_forever, listen_for_occupancy
+from app.modules.parking.tariff_cache import tariff_cache, listen_for_changes
+from app.modules.references.cache import references
+from app.modules.reports.archive import manifest as archive_manifest
+from app.modules.reports.cache import listen_for_invalidations
 
-app = FastAPI(title="Parking Management System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Справочники, индекс занятости мест, кэш тарифов, версии таблиц и список файлов архива
+    # загружаются при старте; индекс занятости, кэш тарифов, версии и список файлов архива
+    # обновляются по NOTIFY, индекс, кроме того, периодически сверяется с БД; кэш дашборда
+    # сбрасывается по NOTIFY после записей любого процесса;
+    # секции parking_sessions и payments досоздаются заранее
+    async with AsyncSessionLocal() as db:
+        await occupancy.load(db)
+        await tariff_cache.load(db)
+        await references.load(db)
+        await table_versions.load(db)
+        await archive_manifest.load(db)
+    background_tasks = [
+        asyncio.create_task(reconcile_forever(AsyncSessionLocal, settings.OCCUPANCY_RECONCILE_INTERVAL)),
+        asyncio.create_task(listen_for_occupancy(settings.LISTEN_DATABASE_URL, AsyncSessionLocal)),
+        asyncio.create_task(listen_for_changes(settings.LISTEN_DATABASE_URL, AsyncSessionLocal)),
+        asyncio.create_task(listen_for_versions(settings.LISTEN_DATABASE_URL, AsyncSessionLocal)),
+        asyncio.create_task(listen_for_invalidations(settings.LISTEN_DATABASE_URL)),
+        asyncio.create_task(maintain_forever(settings.LISTEN_DATABASE_URL, settings.PARTITION_MAINTENANCE_INTERVAL)),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    # Закрыть соединения пула сразу, не дожидаясь их обрыва при выходе процесса
+    await engine.dispose()
+    mark_process_dead()
+
+app = FastAPI(title="Parking Management System", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -16,8 +59,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Число SQL-выражений на запрос, Server-Timing и поиск N+1
+app.add_middleware(query_budget.QueryBudgetMiddleware)
+query_budget.instrument_engine(engine)
+
+# Метрики Prometheus: латентность маршрутов и SQL с меткой модуля
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
 # Статические файлы и шаблоны
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -30,4 +82,13 @@ async def root(request: Request):
 
 @app.get("/health")
 async def health_check(db: AsyncSession = Depends(get_db)):
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    return {"status": "healthy", "database": "connected"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    # Текущее состояние пула соединений этого процесса
+    return pool_stats(engine.pool)
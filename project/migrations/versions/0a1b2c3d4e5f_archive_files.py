@@ -0,0 +1,41 @@
+"""Manifest of Parquet archive files
+
+Revision ID: 0a1b2c3d4e5f
+Revises: 9f0a1b2c3d4e
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a1b2c3d4e5f'
+down_revision = '9f0a1b2c3d4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Файлы холодного архива (см. app.modules.reports.archive): отчёты читают только
+    # перечисленные здесь, строка добавляется в транзакции удаления строк из БД
+    op.create_table('archive_files',
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('min_time', sa.DateTime(), nullable=False),
+        sa.Column('max_time', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('path')
+    )
+    op.create_index('ix_archive_files_table_name_month', 'archive_files', ['table_name', 'month'])
+
+    # Процессы API кэшируют список файлов до изменения версии
+    op.execute("INSERT INTO table_versions (table_name, version) VALUES ('archive_files', 1)")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM table_versions WHERE table_name = 'archive_files'")
+    op.drop_index('ix_archive_files_table_name_month', table_name='archive_files')
+    op.drop_table('archive_files')
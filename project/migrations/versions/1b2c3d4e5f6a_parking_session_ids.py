@@ -0,0 +1,90 @@
+"""Registry of parking session ids: unique id and payments foreign key
+
+Revision ID: 1b2c3d4e5f6a
+Revises: 0a1b2c3d4e5f
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b2c3d4e5f6a'
+down_revision = '0a1b2c3d4e5f'
+branch_labels = None
+depends_on = None
+
+# Триггеры уровня оператора с таблицами переходов: один INSERT/DELETE в реестр на оператор,
+# в том числе для COPY и многострочных INSERT; перенос строки между секциями - UPDATE
+TRIGGERS_SQL = [
+    """
+    CREATE FUNCTION parking_session_ids_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO parking_session_ids (id) SELECT id FROM new_rows;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE FUNCTION parking_session_ids_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        DELETE FROM parking_session_ids WHERE id IN (SELECT id FROM old_rows EXCEPT SELECT id FROM new_rows);
+        INSERT INTO parking_session_ids (id) SELECT id FROM new_rows EXCEPT SELECT id FROM old_rows;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE FUNCTION parking_session_ids_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        DELETE FROM parking_session_ids WHERE id IN (SELECT id FROM old_rows);
+        RETURN NULL;
+    END $$
+    """,
+    "CREATE TRIGGER parking_session_ids_insert AFTER INSERT ON parking_sessions "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION parking_session_ids_insert()",
+    "CREATE TRIGGER parking_session_ids_update AFTER UPDATE ON parking_sessions "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION parking_session_ids_update()",
+    "CREATE TRIGGER parking_session_ids_delete AFTER DELETE ON parking_sessions "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION parking_session_ids_delete()",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Запись в сессии и платежи ждёт миграцию: реестр заполняется и проверяется на одном снимке
+    op.execute('LOCK TABLE parking_sessions, payments IN SHARE ROW EXCLUSIVE MODE')
+
+    # Первичный ключ секционированной parking_sessions - (id, time_in): уникальность id
+    # и внешний ключ платежей держит отдельная несекционированная таблица
+    op.create_table('parking_session_ids',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    duplicates = bind.execute(sa.text(
+        "SELECT id FROM parking_sessions GROUP BY id HAVING count(*) > 1 ORDER BY id LIMIT 10")).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"id сессий парковки не уникальны, например: {duplicates}")
+    op.execute('INSERT INTO parking_session_ids (id) SELECT id FROM parking_sessions')
+
+    orphans = bind.execute(sa.text(
+        "SELECT count(*), array_agg(DISTINCT session_id ORDER BY session_id) FILTER (WHERE session_id IS NOT NULL) "
+        "FROM payments p WHERE NOT EXISTS (SELECT 1 FROM parking_session_ids s WHERE s.id = p.session_id)")).one()
+    if orphans[0]:
+        raise RuntimeError(
+            f"{orphans[0]} платежей ссылаются на отсутствующие сессии (session_id {orphans[1][:10]}); "
+            f"исправьте или удалите их до миграции")
+
+    for statement in TRIGGERS_SQL:
+        op.execute(statement)
+    # Отложенная проверка: архиватор и удаление секций снимают и возвращают id в одной транзакции
+    op.create_foreign_key('payments_session_id_fkey', 'payments', 'parking_session_ids',
+                          ['session_id'], ['id'], deferrable=True, initially='DEFERRED')
+
+
+def downgrade() -> None:
+    op.drop_constraint('payments_session_id_fkey', 'payments', type_='foreignkey')
+    for action in ('insert', 'update', 'delete'):
+        op.execute(f'DROP TRIGGER parking_session_ids_{action} ON parking_sessions')
+        op.execute(f'DROP FUNCTION parking_session_ids_{action}()')
+    op.drop_table('parking_session_ids')
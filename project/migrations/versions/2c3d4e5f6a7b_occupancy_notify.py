@@ -0,0 +1,85 @@
+"""NOTIFY occupancy on parking session and parking space changes
+
+Revision ID: 2c3d4e5f6a7b
+Revises: 1b2c3d4e5f6a
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2c3d4e5f6a7b'
+down_revision = '1b2c3d4e5f6a'
+branch_labels = None
+depends_on = None
+
+# Индекс занятости (app.modules.parking.occupancy) каждого процесса API применяет эти
+# изменения по LISTEN occupancy. Payload - JSON-массив [метод индекса, аргументы...].
+# Рассылает база, а не приложение: запросы API не получают лишних выражений, а записи
+# массовой загрузки, архиватора и других процессов доходят до всех индексов одинаково.
+# Уведомления доставляются после commit в порядке commit транзакций.
+FUNCTIONS_SQL = [
+    """
+    CREATE FUNCTION parking_sessions_occupancy_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('occupancy', json_build_array('occupy', space_id, id)::text)
+            FROM new_rows WHERE time_out IS NULL;
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('occupancy', json_build_array('release', space_id, id)::text)
+            FROM old_rows WHERE time_out IS NULL;
+        ELSE
+            -- Только сессии, у которых изменились место или признак открытой
+            PERFORM pg_notify('occupancy', json_build_array('release', space_id, id)::text)
+            FROM (SELECT space_id, id FROM old_rows WHERE time_out IS NULL
+                  EXCEPT SELECT space_id, id FROM new_rows WHERE time_out IS NULL) released;
+            PERFORM pg_notify('occupancy', json_build_array('occupy', space_id, id)::text)
+            FROM (SELECT space_id, id FROM new_rows WHERE time_out IS NULL
+                  EXCEPT SELECT space_id, id FROM old_rows WHERE time_out IS NULL) occupied;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE FUNCTION parking_spaces_occupancy_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('occupancy', json_build_array('add_space', id, type_id, number)::text)
+            FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('occupancy', json_build_array('remove_space', id)::text)
+            FROM old_rows;
+        ELSE
+            PERFORM pg_notify('occupancy', json_build_array('add_space', id, type_id, number)::text)
+            FROM (SELECT id, type_id, number FROM new_rows
+                  EXCEPT SELECT id, type_id, number FROM old_rows) changed;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+]
+
+TRANSITION_TABLES = {
+    'INSERT': 'NEW TABLE AS new_rows',
+    'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'DELETE': 'OLD TABLE AS old_rows',
+}
+
+
+def upgrade() -> None:
+    for statement in FUNCTIONS_SQL:
+        op.execute(statement)
+    # Таблицы переходов допускают одно событие на триггер
+    for table in ('parking_sessions', 'parking_spaces'):
+        for event, tables in TRANSITION_TABLES.items():
+            op.execute(
+                f'CREATE TRIGGER {table}_occupancy_{event.lower()} AFTER {event} ON {table} '
+                f'REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION {table}_occupancy_notify()')
+
+
+def downgrade() -> None:
+    for table in ('parking_sessions', 'parking_spaces'):
+        for event in TRANSITION_TABLES:
+            op.execute(f'DROP TRIGGER {table}_occupancy_{event.lower()} ON {table}')
+        op.execute(f'DROP FUNCTION {table}_occupancy_notify()')
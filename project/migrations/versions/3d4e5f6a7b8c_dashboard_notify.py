@@ -0,0 +1,41 @@
+"""NOTIFY dashboard_changed on writes to the tables behind the dashboard
+
+Revision ID: 3d4e5f6a7b8c
+Revises: 2c3d4e5f6a7b
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3d4e5f6a7b8c'
+down_revision = '2c3d4e5f6a7b'
+branch_labels = None
+depends_on = None
+
+# Дашборд читает сессии, места и суточные роллапы (роллапы меняются вместе с сессиями).
+# Кэш дашборда (app.modules.reports.cache) каждого процесса API сбрасывается по
+# LISTEN dashboard_changed. Одинаковые уведомления транзакции PostgreSQL объединяет,
+# поэтому на транзакцию приходится одно уведомление, сколько бы выражений в ней ни было.
+TABLES = ('parking_sessions', 'parking_spaces')
+
+
+def upgrade() -> None:
+    op.execute("""
+    CREATE FUNCTION dashboard_changed_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('dashboard_changed', '');
+        RETURN NULL;
+    END $$
+    """)
+    for table in TABLES:
+        op.execute(
+            f'CREATE TRIGGER {table}_dashboard_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+            f'FOR EACH STATEMENT EXECUTE FUNCTION dashboard_changed_notify()')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_dashboard_changed ON {table}')
+    op.execute('DROP FUNCTION dashboard_changed_notify()')
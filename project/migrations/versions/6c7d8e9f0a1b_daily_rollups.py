@@ -0,0 +1,63 @@
+"""Daily revenue and sessions rollups
+
+Revision ID: 6c7d8e9f0a1b
+Revises: 5b6c7d8e9f0a
+Create Date: 2025-12-08 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c7d8e9f0a1b'
+down_revision = '5b6c7d8e9f0a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # DailyRevenue table
+    op.create_table('daily_revenue',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tariff_id', sa.Integer(), nullable=False),
+        sa.Column('vehicle_type_id', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'tariff_id', 'vehicle_type_id')
+    )
+
+    # DailySessions table
+    op.create_table('daily_sessions',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tariff_id', sa.Integer(), nullable=False),
+        sa.Column('vehicle_type_id', sa.Integer(), nullable=False),
+        sa.Column('sessions_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'tariff_id', 'vehicle_type_id')
+    )
+
+    # Backfill from existing sessions
+    op.execute("""
+        INSERT INTO daily_sessions (day, tariff_id, vehicle_type_id, sessions_count)
+        SELECT s.time_in::date, s.tariff_id, v.type_id, count(*)
+        FROM parking_sessions s JOIN vehicles v ON v.id = s.vehicle_id
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("""
+        INSERT INTO daily_revenue (day, tariff_id, vehicle_type_id, revenue)
+        SELECT b.bucket_start::date, s.tariff_id, v.type_id,
+               sum(s.total_cost
+                   * extract(epoch FROM least(s.time_out, b.bucket_start + interval '1 day')
+                                      - greatest(s.time_in, b.bucket_start))::numeric
+                   / extract(epoch FROM s.time_out - s.time_in)::numeric)
+        FROM parking_sessions s
+        JOIN vehicles v ON v.id = s.vehicle_id
+        JOIN generate_series(date_trunc('day', s.time_in), s.time_out, interval '1 day') AS b(bucket_start) ON true
+        WHERE s.time_out IS NOT NULL AND s.total_cost IS NOT NULL AND s.time_out > s.time_in
+          AND least(s.time_out, b.bucket_start + interval '1 day') > greatest(s.time_in, b.bucket_start)
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_sessions')
+    op.drop_table('daily_revenue')
@@ -0,0 +1,60 @@
+"""Hot path indexes
+
+Revision ID: 7d8e9f0a1b2c
+Revises: 6c7d8e9f0a1b
+Create Date: 2025-12-10 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d8e9f0a1b2c'
+down_revision = '6c7d8e9f0a1b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в большие таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        # Открытые сессии: активные сессии, занятые места, индекс занятости, выезд по номеру
+        op.create_index('ix_parking_sessions_open_space_id', 'parking_sessions', ['space_id'],
+                        postgresql_where=sa.text('time_out IS NULL'), postgresql_concurrently=True)
+        op.create_index('ix_parking_sessions_open_vehicle_id', 'parking_sessions', ['vehicle_id'],
+                        postgresql_where=sa.text('time_out IS NULL'), postgresql_concurrently=True)
+        # Закрытые сессии по time_out: выручка, средний чек, распределение по периодам
+        op.create_index('ix_parking_sessions_closed_time_out', 'parking_sessions', ['time_out'],
+                        postgresql_include=['time_in', 'total_cost'],
+                        postgresql_where=sa.text('time_out IS NOT NULL AND total_cost IS NOT NULL'),
+                        postgresql_concurrently=True)
+        # Диапазоны по time_in и keyset-пагинация по (time_in, id)
+        op.create_index('ix_parking_sessions_time_in_id', 'parking_sessions', ['time_in', 'id'],
+                        postgresql_concurrently=True)
+        # Фильтры списка сессий с keyset-пагинацией по id
+        op.create_index('ix_parking_sessions_vehicle_id_id', 'parking_sessions', ['vehicle_id', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_parking_sessions_space_id_id', 'parking_sessions', ['space_id', 'id'],
+                        postgresql_concurrently=True)
+        # Платежи
+        op.create_index('ix_payments_session_id', 'payments', ['session_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_payments_time_id', 'payments', ['time', 'id'],
+                        postgresql_concurrently=True)
+        # Транспорт клиента
+        op.create_index('ix_vehicles_client_id', 'vehicles', ['client_id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_vehicles_client_id', table_name='vehicles', postgresql_concurrently=True)
+        op.drop_index('ix_payments_time_id', table_name='payments', postgresql_concurrently=True)
+        op.drop_index('ix_payments_session_id', table_name='payments', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_space_id_id', table_name='parking_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_vehicle_id_id', table_name='parking_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_time_in_id', table_name='parking_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_closed_time_out', table_name='parking_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_open_vehicle_id', table_name='parking_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_parking_sessions_open_space_id', table_name='parking_sessions', postgresql_concurrently=True)
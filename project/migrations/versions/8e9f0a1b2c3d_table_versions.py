@@ -0,0 +1,45 @@
+"""Table versions for conditional GET
+
+Revision ID: 8e9f0a1b2c3d
+Revises: 7d8e9f0a1b2c
+Create Date: 2025-12-14 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e9f0a1b2c3d'
+down_revision = '7d8e9f0a1b2c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Версии таблиц: увеличиваются каждой записью, из них строятся ETag списков и карточек
+    op.create_table('table_versions',
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+
+    table_versions_table = sa.table(
+        'table_versions',
+        sa.column('table_name', sa.String),
+        sa.column('version', sa.BigInteger)
+    )
+
+    op.bulk_insert(
+        table_versions_table,
+        [
+            {'table_name': 'clients', 'version': 1},
+            {'table_name': 'vehicles', 'version': 1},
+            {'table_name': 'tariffs', 'version': 1},
+            {'table_name': 'parking_spaces', 'version': 1},
+        ]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('table_versions')
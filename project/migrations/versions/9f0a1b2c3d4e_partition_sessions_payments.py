@@ -0,0 +1,156 @@
+"""Monthly range partitioning of parking_sessions and payments
+
+Revision ID: 9f0a1b2c3d4e
+Revises: 8e9f0a1b2c3d
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f0a1b2c3d4e'
+down_revision = '8e9f0a1b2c3d'
+branch_labels = None
+depends_on = None
+
+# Таблица -> ключ секционирования
+PARTITIONED = {'parking_sessions': 'time_in', 'payments': 'time'}
+# Секции создаются на столько месяцев вперёд, дальше их досоздаёт app.core.partitions
+MONTHS_AHEAD = 3
+
+SESSION_INDEXES = [
+    ('ix_parking_sessions_open_space_id', ['space_id'], {'postgresql_where': sa.text('time_out IS NULL')}),
+    ('ix_parking_sessions_open_vehicle_id', ['vehicle_id'], {'postgresql_where': sa.text('time_out IS NULL')}),
+    ('ix_parking_sessions_closed_time_out', ['time_out'], {
+        'postgresql_include': ['time_in', 'total_cost'],
+        'postgresql_where': sa.text('time_out IS NOT NULL AND total_cost IS NOT NULL')}),
+    ('ix_parking_sessions_time_in_id', ['time_in', 'id'], {}),
+    ('ix_parking_sessions_vehicle_id_id', ['vehicle_id', 'id'], {}),
+    ('ix_parking_sessions_space_id_id', ['space_id', 'id'], {}),
+]
+PAYMENT_INDEXES = [
+    ('ix_payments_session_id', ['session_id'], {}),
+    ('ix_payments_time_id', ['time', 'id'], {}),
+]
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def session_columns() -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('parking_sessions_id_seq'::regclass)"), nullable=False),
+        sa.Column('vehicle_id', sa.Integer(), nullable=False),
+        sa.Column('space_id', sa.Integer(), nullable=False),
+        sa.Column('tariff_id', sa.Integer(), nullable=False),
+        sa.Column('time_in', sa.DateTime(), nullable=False),
+        sa.Column('time_out', sa.DateTime(), nullable=True),
+        sa.Column('total_cost', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['space_id'], ['parking_spaces.id'], ),
+        sa.ForeignKeyConstraint(['tariff_id'], ['tariffs.id'], ),
+        sa.ForeignKeyConstraint(['vehicle_id'], ['vehicles.id'], ),
+    ]
+
+
+def payment_columns() -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('payments_id_seq'::regclass)"), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('method_id', sa.Integer(), nullable=False),
+        sa.Column('time', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['method_id'], ['payment_methods.id'], ),
+    ]
+
+
+def set_aside(bind, table: str, suffix: str) -> None:
+    """
+        Переименовывает таблицу вместе с индексами и снимает её внешние ключи: имена
+        освобождаются для новой таблицы, строки копируются в неё и старая удаляется.
+    """
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.rename_table(table, f'{table}_{suffix}')
+    for name in bind.execute(sa.text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :table"), {'table': f'{table}_{suffix}'}).scalars():
+        op.execute(f'ALTER INDEX {name} RENAME TO {name}_{suffix}')
+    for name in bind.execute(sa.text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"),
+            {'table': f'{table}_{suffix}'}).scalars():
+        op.drop_constraint(name, f'{table}_{suffix}', type_='foreignkey')
+
+
+def copy_rows(table: str, suffix: str) -> None:
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_{suffix}')
+    op.execute(f'DROP TABLE {table}_{suffix}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+
+
+def create_indexes(table: str, indexes: list) -> None:
+    for name, columns, options in indexes:
+        op.create_index(name, table, columns, **options)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Внешний ключ на секционированную таблицу требует ключ секционирования в ссылке;
+    # целостность платежей восстанавливает 1b2c3d4e5f6a (реестр parking_session_ids)
+    op.drop_constraint('payments_session_id_fkey', 'payments', type_='foreignkey')
+    for table in PARTITIONED:
+        set_aside(bind, table, 'unpartitioned')
+
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования;
+    # id по-прежнему уникален за счёт последовательности
+    op.create_table('parking_sessions', *session_columns(),
+                    sa.PrimaryKeyConstraint('id', 'time_in'),
+                    postgresql_partition_by='RANGE (time_in)')
+    op.create_table('payments', *payment_columns(),
+                    sa.PrimaryKeyConstraint('id', 'time'),
+                    postgresql_partition_by='RANGE (time)')
+
+    # Месяц по UTC, как в app.core.partitions.maintain: time_in хранится в UTC
+    current = datetime.utcnow().date().replace(day=1)
+    for table, column in PARTITIONED.items():
+        first = bind.execute(sa.text(
+            f"SELECT date_trunc('month', min({column}))::date FROM {table}_unpartitioned")).scalar() or current
+        month = min(first, current)
+        while month <= add_months(current, MONTHS_AHEAD):
+            following = add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE {table}_{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{following}')")
+            month = following
+        # Строки вне созданных секций (например, загрузка задним числом) не теряются
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    # Индексы строятся после копирования: так быстрее, чем обновлять их на каждой строке
+    copy_rows('parking_sessions', 'unpartitioned')
+    copy_rows('payments', 'unpartitioned')
+    create_indexes('parking_sessions', SESSION_INDEXES)
+    create_indexes('payments', PAYMENT_INDEXES)
+    op.execute('ANALYZE parking_sessions')
+    op.execute('ANALYZE payments')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for table in PARTITIONED:
+        set_aside(bind, table, 'partitioned')
+
+    op.create_table('parking_sessions', *session_columns(), sa.PrimaryKeyConstraint('id'))
+    op.create_index(op.f('ix_parking_sessions_id'), 'parking_sessions', ['id'], unique=False)
+    op.create_table('payments', *payment_columns(), sa.PrimaryKeyConstraint('id'))
+    op.create_index(op.f('ix_payments_id'), 'payments', ['id'], unique=False)
+    # Секции, уже отсоединённые политикой хранения, - отдельные таблицы, их строки не возвращаются
+    copy_rows('parking_sessions', 'partitioned')
+    copy_rows('payments', 'partitioned')
+    create_indexes('parking_sessions', SESSION_INDEXES)
+    create_indexes('payments', PAYMENT_INDEXES)
+    op.create_foreign_key('payments_session_id_fkey', 'payments', 'parking_sessions', ['session_id'], ['id'])
@@ -0,0 +1,65 @@
+"""
+    Production-запуск: несколько воркеров uvicorn с uvloop и httptools.
+
+    Миграции здесь не выполняются - это отдельная разовая задача (k8s/migrate-job.yaml,
+    alembic upgrade head), чтобы поды не гонялись за блокировку схемы при каждом старте.
+
+    По SIGTERM процесс-супервизор передаёт сигнал воркерам; каждый перестаёт принимать
+    соединения, закрывает простаивающие keep-alive и дожидается запросов в обработке
+    не дольше WEB_GRACEFUL_TIMEOUT, после чего выполняет shutdown lifespan.
+
+    python serve.py
+"""
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def worker_count() -> int:
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    # sched_getaffinity учитывает ограничение CPU через taskset/cpuset, os.cpu_count - нет
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def prepare_metrics_dir(workers: int) -> None:
+    # Метрики Prometheus при нескольких воркерах агрегируются через общий каталог,
+    # который должен быть задан до импорта приложения и пуст на старте
+    if workers == 1:
+        return
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    else:
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-')
+
+
+def main() -> None:
+    workers = worker_count()
+    prepare_metrics_dir(workers)
+    uvicorn.run(
+        'main:app',
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=workers,
+        loop='uvloop',
+        http='httptools',
+        backlog=settings.WEB_BACKLOG,
+        timeout_keep_alive=settings.WEB_KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT,
+        # За балансировщиком: адрес клиента и схема из X-Forwarded-* доверенных адресов
+        proxy_headers=True,
+        forwarded_allow_ips=settings.WEB_FORWARDED_ALLOW_IPS,
+        access_log=False,
+    )
+
+
+if __name__ == '__main__':
+    main()